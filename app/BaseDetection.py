@@ -1,27 +1,47 @@
-from PyQt5.QtCore import Qt, QSize, pyqtSignal
+from PyQt5.QtCore import Qt, QSize, QThread, pyqtSignal
 from PyQt5.QtWidgets import (
     QWidget, QPushButton, QLabel, 
     QVBoxLayout, QFileDialog, QLineEdit,
     QMessageBox
 )
 from PyQt5.QtGui import QIcon, QImage
-# import functions one by one to prevent import whole library (reduce size of .exe)
-from cv2 import (
-    resize as cv2_resize,
-    cvtColor as cv2_cvtColor,
-    COLOR_RGB2BGR as cv2_COLOR_RGB2BGR,
-)
-from numpy import (
-    clip as np_clip,
-    uint8 as np_uint8,
-    array as np_array,
-    expand_dims as np_expand_dims
-)
 from threading import Thread
-### modules lazy-loaded
-# from keras.models import load_model
-# from keras.applications.efficientnet import preprocess_input as efficientnet_preprocess_input
-# from script.preprocess_input_custom import custom_preprocessing
+from os import path as os_path
+from script.ModelRegistry import registry, DEFAULT_MODEL_PATH
+from script.StageTracer import tracer, PREPROCESS
+### modules lazy-loaded - cv2 and numpy are not needed to show the page
+# from cv2 import cvtColor as cv2_cvtColor, imwrite as cv2_imwrite, COLOR_RGB2BGR as cv2_COLOR_RGB2BGR
+# from numpy import clip as np_clip, uint8 as np_uint8, ascontiguousarray as np_ascontiguousarray
+# from script.preprocessing import preprocess_image as preprocess_for_model, preprocess_batch as preprocess_batch_for_model, stack_batch, is_servable
+# from script.ResultCache import get_result_cache, model_fingerprint
+# from script.GradCAM import shared_grad_cam
+# from script.TFLiteModel import convert_cached
+
+
+def as_qimage(image, format_=QImage.Format_BGR888):
+    """
+    Wrap decoded image as QImage. Pixels are not copied when the array is uint8 with contiguous rows
+    (e.g. image from cv2.imread), otherwise one contiguous uint8 copy is made.
+    QImage does not own the pixels - returned array has to be kept alive while QImage is used.
+
+    Args:
+        image (ndarray): Image with shape (height, width, 3) in channel order of format_, or (height, width) grayscale.
+        format_ (QImage.Format, optional): Format of 3-channel image. Defaults to QImage.Format_BGR888.
+
+    Returns:
+        tuple: (QImage, array which holds its pixels)
+    """
+    # lazy-loading
+    from numpy import clip as np_clip, uint8 as np_uint8, ascontiguousarray as np_ascontiguousarray
+    if image.dtype != np_uint8:
+        image = np_clip(image, 0, 255).astype(np_uint8)
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[:, :, 0]
+    # rows can be padded (stride of the row is passed), pixels inside the row cannot
+    if image.strides[-1] != 1 or (image.ndim == 3 and image.strides[1] != 3):
+        image = np_ascontiguousarray(image)
+    format_ = QImage.Format_Grayscale8 if image.ndim == 2 else format_
+    return QImage(image.data, image.shape[1], image.shape[0], image.strides[0], format_), image
 
 
 class BaseDetection(QWidget):
@@ -34,8 +54,12 @@ class BaseDetection(QWidget):
         
         no-ui instances:
             model: instance holds model which classifies images
+            model_path: path to the file of the model, None if model was not loaded from file
             original_image: initialization. holds image displayed
             model_is_default: bool, flag for preprocessing
+            model_is_servable: bool, model resizes and normalizes raw uint8 images in its graph (script/servable.py)
+            backend: 'keras', 'tflite-float16' or 'tflite-int8', inference backend of loaded models
+            use_result_cache: bool, look up results of already classified images first
         
         methods (To Implement!):
             setup_interface: Organize layout of widgets
@@ -47,6 +71,9 @@ class BaseDetection(QWidget):
             load_model_: loads weights of neural network to the application
             save_image: saves image with grad-cam
             preprocess_image: Preprocess image for model predicting
+            preprocess_batch: Preprocess stacked images at once
+            get_grad_cam_alg: Grad-CAM of current model
+            result_cache: Cache of model outputs and fingerprint of current model
     """
     # singals are defined or class level
     update_model_info = pyqtSignal(str)
@@ -105,10 +132,16 @@ class BaseDetection(QWidget):
         
         # grad cam alg
         self.grad_cam_alg = None
+        self.grad_cam_model = None # model for which grad_cam_alg was built
         
         # load CNN model
         self.model_is_default = None
+        self.model_is_servable = False
         self.model = None
+        self.model_path = None
+        self.backend = 'keras'
+        self.loading_thread = None
+        self.use_result_cache = True
         
         # connect buttons
         self.browser.clicked.connect(self.browse_for_img)
@@ -121,59 +154,95 @@ class BaseDetection(QWidget):
         
     def lazy_loading(self):
         """Few modules are time-consuming to load. load them when they are needed.
+        Page keeps its model (default or custom) when user navigates back and forth.
         """
-        def start_loading():
-            # lazy-loading process of loading model
-            from keras.models import load_model
-            self.load_model_()  
-        Thread(target=start_loading, daemon=True).start()        
+        if self.model is not None:
+            return None
+        if self.loading_thread is not None and self.loading_thread.is_alive():
+            return None
+        # lazy-loading process of loading model
+        self.loading_thread = Thread(target=self.load_model_, daemon=True)
+        self.loading_thread.start()
     
-    def load_model_(self, default_model=True):
+    def load_model_(self, default_model=True, backend=None):
         """
-            Load model of cnn to the application as '.h5' or '.keras' file. Additionaly, change model info - name, by taking name of the file.
+            Load model of cnn to the application as '.h5', '.keras' or '.tflite' file. Additionaly, change model info - name, by taking name of the file.
         Args:
-            default_model (bool, optional): Remain True if default model should be loaded. Instead, Opens '.h5' or '.keras' model to be loaded.
+            default_model (bool, optional): Remain True if default model should be loaded. Instead, Opens '.h5', '.keras' or '.tflite' model to be loaded.
+            backend (str, optional): 'keras', 'tflite-float16' or 'tflite-int8'. Keras model is converted 
+                to TFLite for tflite backends. Defaults to self.backend.
 
         Returns:
             NoneType: return None if an error occur.
         """
-        # lazy-loading
-        from keras.models import load_model
+        if backend is None:
+            backend = self.backend
         model_info_func = lambda mt, mn: ("<html><body>"
                                           f"<p style='font-size:12px;margin:0;'>model: {mt},</p>"
                                           f"<p style='margin:0;'>{mn}</p>"
                                           "</body></html>")
         if  default_model:
-            self.model = load_model("models/EfficientNet.keras", compile=False)
+            filepath = DEFAULT_MODEL_PATH
             model_type = 'default'
             model_name = 'EfficientNet'
-            self.model_is_default = True
+            model_is_default = True
         
         else:
             self.model_info.setText("model is loading...")
             options = QFileDialog.Options()
             filepath, _ = QFileDialog.getOpenFileName(self, 
                                                 "Select file", "", 
-                                                "Model Files (*.h5 *.keras);;All Files (*)", 
+                                                "Model Files (*.h5 *.keras *.tflite);;All Files (*)", 
                                                 options=options)
-            if filepath:
-                try:
-                    self.model_is_default = False
-                    self.model = load_model(filepath, compile=False)
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Could not load model: {e}")
-                    return None
-                else:
-                    model_type = 'custom'
-                    model_name = filepath.split('/')[-1].split('.')[0]
-            else:
-                QMessageBox.warning(self, "No file chosen", "Choose '.h5' or '.keras.' file.")
+            if not filepath:
+                QMessageBox.warning(self, "No file chosen", "Choose '.h5', '.keras' or '.tflite' file.")
                 return None
+            model_type = 'custom'
+            model_name = filepath.split('/')[-1].split('.')[0]
+            model_is_default = False
+        try:
+            # lazy-loading
+            from script.preprocessing import is_servable
+            # model is shared with other pages by the registry
+            model = registry.get(filepath)
+            # servable model takes uint8 input, which float TFLite backends do not feed - it stays in keras
+            if backend != 'keras' and not filepath.lower().endswith('.tflite') and not is_servable(model):
+                # lazy-loading
+                from script.TFLiteModel import convert_cached
+                filepath = convert_cached(model, filepath, backend, model_is_default)
+                model = registry.get(filepath)
+                model_name = f"{model_name} ({backend})"
+        except Exception as e:
+            if default_model:
+                raise
+            QMessageBox.critical(self, "Error", f"Could not load model: {e}")
+            return None
+        self.model_is_default = model_is_default
+        self.model_is_servable = is_servable(model)
+        self.model = model
+        self.model_path = filepath
         self.update_model_info.emit(model_info_func(model_type, model_name))
     
+    def result_cache(self):
+        """
+        Returns:
+            tuple: (ResultCache, fingerprint of current model and its preprocessing),
+                (None, None) if caching is off or model was not loaded from file.
+        """
+        if not self.use_result_cache or self.model_path is None:
+            return None, None
+        # lazy-loading
+        from script.ResultCache import get_result_cache, model_fingerprint
+        return get_result_cache(), model_fingerprint(self.model_path, self.model_is_default)
+    
     def update_model_info_label(self, text):
         """Update text in model_info label. Func is required due to model loading"""
         self.model_info.setText(text)
+        # memory report of models shared by all pages
+        lines = [f"{os_path.basename(path)}: {size / 1024 ** 2:.1f} MB" for path, size in registry.summary()]
+        lines.append(f"total: {registry.memory_usage() / 1024 ** 2:.1f} MB"
+                     f" / {registry.memory_budget / 1024 ** 2:.0f} MB")
+        self.model_info.setToolTip("\n".join(lines))
     
     def save_image(self):
         """save image which is currently displayed
@@ -181,10 +250,12 @@ class BaseDetection(QWidget):
         filepath, _ = QFileDialog.getSaveFileName(self, 
                                                 "Choose Directory and filename", 
                                                 "", 
-                                                "Image Files (*.png *.jpg *.jpeg *.svg *.bmp)"
+                                                "Image Files (*.png *.jpg *.jpeg *.bmp)"
                                                 )
         if filepath:
             try: 
+                # lazy-loading
+                from cv2 import cvtColor as cv2_cvtColor, imwrite as cv2_imwrite, COLOR_RGB2BGR as cv2_COLOR_RGB2BGR
                 image_bgr = cv2_cvtColor(self.image_w_grad_original, cv2_COLOR_RGB2BGR)
                 cv2_imwrite(filepath, image_bgr)
                 QMessageBox.information(self, "Success", f"Image saved in {filepath}.")
@@ -215,11 +286,11 @@ class BaseDetection(QWidget):
             ndarray or QImage: Preprocessed image or reversed QImage.
         """
         if reversed_:
+            # lazy-loading
+            from numpy import uint8 as np_uint8
             if len(image.shape) == 3:  # Handle (height, width, channels) format
-                h, w, c = image.shape
-                image = np_clip(image, 0, 255).astype(np_uint8)  # Ensure valid pixel range
-                bytes_per_line = 3 * w
-                q_image = QImage(image.data, w, h, bytes_per_line, QImage.Format_RGB888)
+                # uint8 image (e.g. grad-cam overlay) is wrapped without copy
+                q_image, _ = as_qimage(image, QImage.Format_RGB888)
                 return q_image
             elif len(image.shape) == 4:  # Handle (batch, height, width, channels)
                 _, h, w, c = image.shape
@@ -230,23 +301,60 @@ class BaseDetection(QWidget):
             else:
                 raise ValueError("Unsupported image shape for reversed operation.")
         else:
+            if self.model_is_servable:
+                # model resizes and normalizes in its graph - decoded image of any size is fed as it is
+                return image[None]
+            # lazy-loading
+            from script.preprocessing import preprocess_image as preprocess_for_model
             if self.model_is_default:
-                # lazy-loading of preprocessing
-                from keras.applications.efficientnet import preprocess_input as efficientnet_preprocess_input
-                image_resized = cv2_resize(image, (224, 224))
-                image_as_array = np_array(image_resized)
-                image_preprocessed = efficientnet_preprocess_input(image_as_array)
-                image_preprocessed = np_expand_dims(image_preprocessed, axis=0)  # Add batch dimension
-                return image_preprocessed
+                with tracer.span(PREPROCESS):
+                    return preprocess_for_model(image, model_is_default=True)
             else:
                 try:
-                    # lazy-loading of custom-preprocessing
-                    from script.preprocess_input_custom import custom_preprocessing
-                    image_preprocessed = custom_preprocessing(image)
+                    with tracer.span(PREPROCESS):
+                        image_preprocessed = preprocess_for_model(image, model_is_default=False)
                 except Exception as e:
+                    if QThread.currentThread() is not self.thread():
+                        # message box can be shown only from gui thread - let caller thread report error
+                        raise
                     QMessageBox.critical(self, "Preprocess func error", f"Custom preprocessing failed: {e}")
+                    return None
                 return image_preprocessed
                 
+    def get_grad_cam_alg(self):
+        """Grad-CAM of current model, built once per model and shared with other pages and the warm-up. 
+        
+        Returns:
+            GradCAM or NoneType: None if grad-cam cannot be built for the model.
+        """
+        if self.grad_cam_model is not self.model:
+            self.grad_cam_model = self.model
+            try:
+                # lazy-loading 
+                from script.GradCAM import shared_grad_cam
+                # after loading model, grad-cam alg can be initialized by composition
+                self.grad_cam_alg = shared_grad_cam(self.model)
+            except Exception:
+                self.grad_cam_alg = None
+        return self.grad_cam_alg
+    
+    def preprocess_batch(self, images, out=None):
+        """
+        Prepare batch of images for prediction with one vectorized normalization.
+
+        Args:
+            images (Sequence[ndarray]): Decoded uint8 images, preferably already resized to (224, 224, 3).
+            out (ndarray, optional): Preallocated float32 buffer with shape (>=N, 224, 224, 3).
+
+        Returns:
+            ndarray: Preprocessed batch with shape (N, 224, 224, 3), uint8 images stacked as they are for servable model.
+        """
+        # lazy-loading
+        from script.preprocessing import preprocess_batch as preprocess_batch_for_model, stack_batch
+        if self.model_is_servable:
+            return stack_batch(images)
+        return preprocess_batch_for_model(images, model_is_default=bool(self.model_is_default), out=out)
+    
     def apply_grad_cam(self, checked):
         """Prebuilt method for grad_cam optional
         """
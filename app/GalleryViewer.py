@@ -0,0 +1,222 @@
+from PyQt5.QtCore import Qt, QSize, QAbstractListModel, QModelIndex, pyqtSignal
+from PyQt5.QtWidgets import QMainWindow, QWidget, QListView, QLabel, QHBoxLayout, QVBoxLayout
+from PyQt5.QtGui import QIcon, QImage, QPixmap
+from collections import OrderedDict
+from functools import lru_cache
+from script.ThumbnailCache import ThumbnailCache, THUMBNAIL_SIZE
+
+
+# longer side of the image shown next to the thumbnails
+PREVIEW_SIZE = 500
+
+
+@lru_cache(maxsize=None)
+def read_stylesheet(path):
+    """Stylesheet is read from disk once, gallery can be opened many times."""
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def to_pixmap(image):
+    """uint8 BGR image (e.g. thumbnail) as QPixmap, pixels are copied once - by QPixmap."""
+    q_image = QImage(image.data, image.shape[1], image.shape[0], image.strides[0], QImage.Format_BGR888)
+    return QPixmap.fromImage(q_image)
+
+
+class ThumbnailListModel(QAbstractListModel):
+    """Items of the gallery. Thumbnail is requested when the view paints its row for the first time,
+    so only visible rows are generated. Pixmaps of recently shown thumbnails are kept.
+
+    item:
+        (name shown under thumbnail, path to the file, function decoding the file or None, variant of the thumbnail)
+    """
+    # thumbnail generated by worker thread, received in gui thread
+    thumbnail_ready = pyqtSignal(str, str, object)
+
+    def __init__(self, thumbnails, max_pixmaps=512, parent=None):
+        super().__init__(parent)
+        self.thumbnails = thumbnails
+        self.max_pixmaps = max_pixmaps
+        self.items = []
+        # (path, variant) -> row
+        self.rows = {}
+        # (path, variant) -> QPixmap, least recently used are dropped
+        self.pixmaps = OrderedDict()
+        self.failed = set()
+        self.thumbnail_ready.connect(self.add_thumbnail)
+
+    def set_items(self, items):
+        self.beginResetModel()
+        self.items = list(items)
+        self.rows = {(path, variant): row for row, (_, path, _, variant) in enumerate(self.items)}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        name, path, load_image, variant = self.items[index.row()]
+        if role == Qt.DisplayRole:
+            return name
+        if role == Qt.ToolTipRole:
+            return path
+        if role == Qt.DecorationRole:
+            key = (path, variant)
+            if key in self.pixmaps:
+                self.pixmaps.move_to_end(key)
+                return self.pixmaps[key]
+            if key in self.failed:
+                return None
+            thumbnail = self.thumbnails.get(path, variant)
+            if thumbnail is not None:
+                return self.store_pixmap(key, thumbnail)
+            # view asks again after thumbnail_ready
+            self.thumbnails.request(path, self.thumbnail_loaded, load_image, variant)
+        return None
+
+    def thumbnail_loaded(self, path, variant, thumbnail):
+        """Called by worker thread - thumbnail is handed over to gui thread by signal."""
+        self.thumbnail_ready.emit(path, variant, thumbnail)
+
+    def add_thumbnail(self, path, variant, thumbnail):
+        if thumbnail is None:
+            self.failed.add((path, variant))
+        else:
+            self.store_pixmap((path, variant), thumbnail)
+        row = self.rows.get((path, variant))
+        if row is not None:
+            self.dataChanged.emit(self.index(row), self.index(row), [Qt.DecorationRole])
+
+    def store_pixmap(self, key, thumbnail):
+        pixmap = to_pixmap(thumbnail)
+        self.pixmaps[key] = pixmap
+        while len(self.pixmaps) > self.max_pixmaps:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+
+
+class GalleryViewer(QMainWindow):
+    # preview generated by worker thread, received in gui thread
+    preview_ready = pyqtSignal(str, str, object)
+
+    def __init__(self, thumbnails=None, previews=None, prefetch_radius=2):
+        """
+        One window for browsing images of the folder - grid of thumbnails filled lazily by worker threads
+        and preview of the current image. Previews of neighbours of the current image are prefetched,
+        so moving by arrow keys does not wait for decoding.
+
+        Args:
+            thumbnails (ThumbnailCache, optional): Cache of thumbnails. Defaults to cache in 'cache/thumbnails'.
+            previews (ThumbnailCache, optional): Cache of previews. Defaults to in-memory cache of 32 previews.
+            prefetch_radius (int, optional): Number of neighbours prefetched on both sides. Defaults to 2.
+        """
+        super().__init__()
+        self.thumbnails = ThumbnailCache() if thumbnails is None else thumbnails
+        self.previews = ThumbnailCache(PREVIEW_SIZE, directory=None, max_entries=32) if previews is None else previews
+        self.prefetch_radius = prefetch_radius
+
+        # window settings
+        self.setWindowTitle("Gallery")
+        self.setWindowIcon(QIcon("static/img/icon.png"))
+        self.setProperty("class", "default_widget")
+        self.setStyleSheet(read_stylesheet("static/css/styles.css"))
+
+        # grid of thumbnails - uniform items, view lays out and paints only visible rows
+        self.model = ThumbnailListModel(self.thumbnails, parent=self)
+        self.list_view = QListView()
+        self.list_view.setViewMode(QListView.IconMode)
+        self.list_view.setMovement(QListView.Static)
+        self.list_view.setResizeMode(QListView.Adjust)
+        self.list_view.setLayoutMode(QListView.Batched)
+        self.list_view.setBatchSize(200)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.list_view.setGridSize(QSize(THUMBNAIL_SIZE + 24, THUMBNAIL_SIZE + 36))
+        self.list_view.setModel(self.model)
+
+        # preview of the current image
+        self.preview = QLabel(alignment=Qt.AlignCenter)
+        self.preview.setFixedSize(PREVIEW_SIZE, PREVIEW_SIZE)
+        self.caption = QLabel(alignment=Qt.AlignCenter)
+
+        # layout
+        preview_layout = QVBoxLayout()
+        preview_layout.addWidget(self.preview)
+        preview_layout.addWidget(self.caption)
+        master_layout = QHBoxLayout()
+        master_layout.addWidget(self.list_view)
+        master_layout.addLayout(preview_layout)
+        central = QWidget()
+        central.setLayout(master_layout)
+        self.setCentralWidget(central)
+        self.resize(1100, 600)
+
+        # connect
+        self.list_view.selectionModel().currentChanged.connect(self.show_current)
+        self.preview_ready.connect(self.update_preview)
+
+    def set_items(self, items, current=0):
+        """
+        Show items in the gallery and open it.
+
+        Args:
+            items (Sequence[tuple]): (name, path, load_image or None, variant), see ThumbnailListModel.
+            current (int, optional): Row shown in preview. Defaults to 0.
+        """
+        # requests of previous folder are not needed anymore
+        self.thumbnails.cancel_pending()
+        self.previews.cancel_pending()
+        self.model.set_items(items)
+        self.preview.clear()
+        self.caption.clear()
+        if items:
+            index = self.model.index(min(max(current, 0), len(items) - 1))
+            self.list_view.setCurrentIndex(index)
+            self.list_view.scrollTo(index, QListView.PositionAtCenter)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def show_current(self, index, previous=None):
+        if not index.isValid():
+            return None
+        row = index.row()
+        name, path, load_image, variant = self.model.items[row]
+        self.setWindowTitle(name)
+        self.caption.setText(f"{name}  ({row + 1} / {len(self.model.items)})")
+        # requests are served newest first - farthest neighbours are requested first, current image last
+        for offset in range(self.prefetch_radius, 0, -1):
+            for neighbour in (row + offset, row - offset):
+                if 0 <= neighbour < len(self.model.items):
+                    _, neighbour_path, neighbour_load_image, neighbour_variant = self.model.items[neighbour]
+                    self.previews.request(neighbour_path, None, neighbour_load_image, neighbour_variant)
+        preview = self.previews.get(path, variant)
+        if preview is not None:
+            self.preview.setPixmap(to_pixmap(preview))
+        else:
+            self.preview.setText("loading...")
+            self.previews.request(path, self.preview_loaded, load_image, variant)
+
+    def preview_loaded(self, path, variant, preview):
+        """Called by worker thread - preview is handed over to gui thread by signal."""
+        self.preview_ready.emit(path, variant, preview)
+
+    def update_preview(self, path, variant, preview):
+        index = self.list_view.currentIndex()
+        if not index.isValid():
+            return None
+        _, current_path, _, current_variant = self.model.items[index.row()]
+        # user could move to other image meanwhile
+        if (path, variant) != (current_path, current_variant):
+            return None
+        if preview is None:
+            self.preview.setText("Image cannot be read.")
+        else:
+            self.preview.setPixmap(to_pixmap(preview))
+
+    def closeEvent(self, event):
+        self.thumbnails.cancel_pending()
+        self.previews.cancel_pending()
+        super().closeEvent(event)
@@ -1,64 +1,98 @@
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import QMainWindow, QStackedWidget, QMessageBox
 from PyQt5.QtGui import QIcon
-from app.MultipleDetection import MultipleDetection
+from threading import Thread
 from app.StartPage import StartPage
-from app.SingleDetection import SingleDetection
-from app.BaseDetection import BaseDetection
+### modules lazy-loaded
+# from app.MultipleDetection import MultipleDetection
+# from app.SingleDetection import SingleDetection
+# from script.warmup import warm_up_model
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, warm_up=True):
+        """
+        Args:
+            warm_up (bool, optional): Load and warm up default model in the background while
+                start page is shown. Defaults to True.
+        """
         super().__init__()
-        
+
         # window settings
         self.setFixedSize(1000, 600)
         self.setWindowTitle("Brain Tumor Detection")
         self.setWindowIcon(QIcon("static/img/icon.png"))
-        
+
         # Create stack of widgets
         self.stacked_widget = QStackedWidget()
         self.setCentralWidget(self.stacked_widget)
-        
-        # Initialize widgets
+
+        # Initialize widgets - detection pages are built on first use
         self.start_page = StartPage(self.show_page)
-        self.multi_page = MultipleDetection(self.show_page)
-        self.single_page = SingleDetection(self.show_page)
-        
+        self.multi_page = None
+        self.single_page = None
+        self.warm_up_thread = None
+
         # Add widgets
         self.stacked_widget.addWidget(self.start_page)
-        self.stacked_widget.addWidget(self.multi_page)
-        self.stacked_widget.addWidget(self.single_page)
-        
+
         # set start page
         self.stacked_widget.setCurrentWidget(self.start_page)
         self.setProperty("class", "start_widget")
-        
+
         # load stylesheet
         self.load_stylesheet(path="static/css/styles.css")
-        
+
         self.show()
-        
+
+        if warm_up:
+            # start after the window is painted
+            QTimer.singleShot(0, self.start_warm_up)
+
+    def start_warm_up(self):
+        """Load default model in the background, pages get it from the registry when they are opened."""
+        # lazy-loading
+        from script.warmup import warm_up_model
+        self.warm_up_thread = Thread(target=warm_up_model, daemon=True)
+        self.warm_up_thread.start()
+
+    def get_multi_page(self):
+        if self.multi_page is None:
+            # lazy-loading
+            from app.MultipleDetection import MultipleDetection
+            self.multi_page = MultipleDetection(self.show_page)
+            self.stacked_widget.addWidget(self.multi_page)
+        return self.multi_page
+
+    def get_single_page(self):
+        if self.single_page is None:
+            # lazy-loading
+            from app.SingleDetection import SingleDetection
+            self.single_page = SingleDetection(self.show_page)
+            self.stacked_widget.addWidget(self.single_page)
+        return self.single_page
+
     def show_page(self, page_name):
         """Switch trough different QWidgets in main widget (QStackedWidget) by setting widget button reffering
-        to with its class name (in variable page_name). Then change also css styling of background based on property name
+        to with its class name (in variable page_name). Then change also css styling of background based on property name.
+        Detection pages are built when they are shown for the first time.
         """
         if page_name == "Start":
             self.stacked_widget.setCurrentWidget(self.start_page)
             self.setProperty("class", "start_widget")
         elif page_name == "MultiPage":
-            self.stacked_widget.setCurrentWidget(self.multi_page)
+            self.stacked_widget.setCurrentWidget(self.get_multi_page())
             self.setProperty("class", "default_widget")
             self.multi_page.lazy_loading()
         elif page_name == "SinglePage":
-            self.stacked_widget.setCurrentWidget(self.single_page)
+            self.stacked_widget.setCurrentWidget(self.get_single_page())
             self.setProperty("class", "default_widget")
             self.single_page.lazy_loading()
         else:
             QMessageBox.warning(self, "Redirection Error", "An error during redirection occured.")
             return
         self.style().polish(self)
-    
+
     def load_stylesheet(self, path):
         with open(path, 'r') as f:
             styles = f.read()
@@ -1,49 +1,138 @@
 from app.BaseDetection import BaseDetection
-from app.ImageViewer import ImageViewer
-from PyQt5.QtCore import Qt
+from app.GalleryViewer import GalleryViewer
+from app.ResultsTableModel import (
+    ResultsTableModel,
+    DETECTED,
+    NO_TUMOR,
+    FAILED,
+    NOT_CLASSIFIED
+)
+from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtWidgets import (
     QWidget, QHBoxLayout, 
     QVBoxLayout, QLayout, QLabel,
     QTableView, QMessageBox,
-    QPushButton, QFileDialog
+    QPushButton, QFileDialog,
+    QProgressBar, QComboBox,
+    QHeaderView
 )
-from PyQt5.QtGui import QStandardItemModel, QStandardItem, QFont, QColor
 # import functions one by one to prevent import whole library (reduce size of .exe)
-from numpy import argmax as np_argmax
+from numpy import (
+    argmax as np_argmax,
+    asarray as np_asarray,
+    concatenate as np_concatenate,
+    float32 as np_float32,
+    count_nonzero as np_count_nonzero,
+    isnan as np_isnan,
+    nanargmax as np_nanargmax
+)
+from time import perf_counter
 from cv2 import imread as cv2_imread
 from csv import writer as csv_writer
-from os import (
-    listdir as os_listdir, 
-    path as os_path
-)
+from os import path as os_path
+from threading import Thread, Event
+from script.batch_inference import predict_batches, ProgressMeter, DEFAULT_BATCH_SIZE
+from script.gradcam_export import export_overlays
+from script.preprocessing import resize_image
+from script.CompiledPredictor import compiled_predictor
+from script.folder_watch import FolderIndex, watch_folder
+from script.ResultWriter import ResultWriter
+from script.volumes import Study, find_studies, predict_study, aggregate_scores
+from script.Ensemble import Ensemble, split_outputs
+from script.ModelRegistry import registry, DEFAULT_MODEL_PATH
+from script.StageTracer import tracer, IMREAD, RESIZE, TABLE_UPDATE
+
+
+# options of the filter of the table: (text, label shown)
+RESULT_FILTERS = (("All", None), ("Detected", DETECTED), ("No Tumor", NO_TUMOR),
+                  ("Not classified", NOT_CLASSIFIED), ("Failed", FAILED))
+
+
+def load_image(path):
+    """Decode and resize the image in loading thread. Broken files give None and are reported as failed."""
+    with tracer.span(IMREAD):
+        image = cv2_imread(path)
+    if image is None:
+        return None
+    with tracer.span(RESIZE):
+        return resize_image(image)
 
 
 class MultipleDetection(BaseDetection):
-    def __init__(self, show_page_callback):
+    # signals emitted by detection thread, received in gui thread
+    batch_detected = pyqtSignal(int, object, float)
+    study_detected = pyqtSignal(int, object, float, int, float)
+    detection_progress = pyqtSignal(int, str)
+    detection_finished = pyqtSignal(int, bool)
+    detection_failed = pyqtSignal(str)
+    # signals emitted by grad-cam export thread
+    export_progress = pyqtSignal(int, int, str)
+    export_finished = pyqtSignal(int, int, float, float)
+    export_failed = pyqtSignal(str)
+    # signals emitted by watch thread
+    watch_batch_detected = pyqtSignal(list, object, float)
+    watch_finished = pyqtSignal()
+    
+    def __init__(self, show_page_callback, batch_size=DEFAULT_BATCH_SIZE, watch_interval=2.0):
         super().__init__(show_page_callback)
         
         # no-ui instances
         self.images_path = ""
         self.filenames = []
-        self.image_viewer_refs = [] # handle references to image viewer
+        self.batch_size = batch_size # number of images classified by one forward pass
+        self.gallery = None # one gallery window, built when it is opened first time
+        self.detection_thread = None
+        self.cancel_event = Event()
+        self.num_of_detections = 0
+        self.folder_index = None # images seen in the folder, by mtime and size
+        self.studies = {} # 3D studies of the folder ('.npy' volumes and folders of slices) by name
+        self.detection_rows = None # table rows of images classified by current detection
+        self.watch_interval = watch_interval # seconds between scans of watched folder
+        self.ensemble = None # models classifying the folder together, None for single model
         
         # unique widgets  
         self.result = QLabel("Detection Results", alignment=Qt.AlignCenter)
         self.result.setProperty("class", "tumor_detection")
         self.csv_export = QPushButton("Export to CSV")
         self.show_btn = QPushButton("Show")
+        self.gradcam_export = QPushButton("Export Grad-CAM")
+        self.progress_bar = QProgressBar()
+        self.watch = QPushButton("watch folder")
+        self.watch.setCheckable(True)
+        self.ensemble_btn = QPushButton("ensemble")
+        self.ensemble_btn.setCheckable(True)
+        self.result_filter = QComboBox()
+        for text, _ in RESULT_FILTERS:
+            self.result_filter.addItem(text)
         
-        # create table
-        self.table_model = QStandardItemModel(0, 2)
+        # create table - results are kept in arrays, view asks only for visible rows
+        self.table_model = ResultsTableModel(self)
         self.table = QTableView()
              
         # main layout of this window
         self.master_layout = QVBoxLayout()
-        self.hrows_layout = [QHBoxLayout() for _ in range(3)]
+        self.hrows_layout = [QHBoxLayout() for _ in range(4)]
 
         # connect buttons
         self.csv_export.clicked.connect(self.export_to_csv)
         self.show_btn.clicked.connect(self.show_image)        
+        self.gradcam_export.clicked.connect(self.export_grad_cam)
+        self.watch.toggled.connect(self.toggle_watch)
+        self.ensemble_btn.toggled.connect(self.toggle_ensemble)
+        self.result_filter.currentIndexChanged.connect(
+            lambda idx: self.table_model.set_label_filter(RESULT_FILTERS[idx][1]))
+        
+        # connect detection thread signals
+        self.batch_detected.connect(self.update_detection_table)
+        self.study_detected.connect(self.update_study_result)
+        self.detection_progress.connect(self.update_detection_progress)
+        self.detection_finished.connect(self.finish_detection)
+        self.detection_failed.connect(self.report_detection_error)
+        self.export_progress.connect(self.update_export_progress)
+        self.export_finished.connect(self.finish_export)
+        self.export_failed.connect(self.report_export_error)
+        self.watch_batch_detected.connect(self.update_watch_table)
+        self.watch_finished.connect(self.finish_watch)
 
         # setup interface
         self.setup_interface()
@@ -61,19 +150,32 @@ class MultipleDetection(BaseDetection):
         self.hrows_layout[1].addWidget(self.table)
         
         # setup third row
-        self.hrows_layout[2].addWidget(self.csv_export)
-        self.hrows_layout[2].addWidget(self.show_btn)
-        self.hrows_layout[2].addWidget(self.result)
-        self.hrows_layout[2].addWidget(self.detect)
+        self.hrows_layout[2].addWidget(self.progress_bar)
+        self.hrows_layout[2].addWidget(self.ensemble_btn)
+        self.hrows_layout[2].addWidget(self.watch)
+        self.hrows_layout[2].addWidget(self.result_filter)
+        
+        # setup fourth row
+        self.hrows_layout[3].addWidget(self.csv_export)
+        self.hrows_layout[3].addWidget(self.show_btn)
+        self.hrows_layout[3].addWidget(self.gradcam_export)
+        self.hrows_layout[3].addWidget(self.result)
+        self.hrows_layout[3].addWidget(self.detect)
     
         # add model to the table    
         self.table.setModel(self.table_model)
         self.set_table_view()
     
         # configure widgets position
-        self.table.setFixedSize(1000, 480)
+        self.table.setFixedSize(1000, 455)
+        self.progress_bar.setFixedHeight(20)
+        self.progress_bar.setFormat("")
+        self.watch.setFixedSize(155, 20)
+        self.ensemble_btn.setFixedSize(155, 20)
+        self.result_filter.setFixedSize(155, 20)
         self.csv_export.setFixedSize(155, 50)
         self.show_btn.setFixedSize(155, 50)
+        self.gradcam_export.setFixedSize(155, 50)
                 
         # margins
         self.hrows_layout[0].contentsMargins()
@@ -87,46 +189,55 @@ class MultipleDetection(BaseDetection):
 
     def set_table_view(self):
         "refresh table when anything changes manually"
-        self.table_model.setHorizontalHeaderLabels(["File Name", "Detection Result"])
-        self.table.setColumnWidth(0, 600)
+        self.table.setColumnWidth(0, 400)
+        self.table.setColumnWidth(1, 180)
+        self.table.setColumnWidth(2, 150)
+        self.table.setColumnWidth(3, 110)
+        # time and probabilities of models of the ensemble
+        for column in range(4, self.table_model.columnCount() - 1):
+            self.table.setColumnWidth(column, 150)
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.horizontalHeader().setDefaultAlignment(Qt.AlignLeft)   
+        # rows of equal height - view does not measure every row of large folders
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        # folder order until user clicks a header
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
 
     def browse_for_img(self):
-        """ Open file dialog to point out the path to the folder
+        """ Open file dialog to point out the path to the folder. Images of the folder are listed first,
+        then 3D studies - '.npy' volumes and subfolders of slices.
         """
-        def filter_(files, extensions):
-            "function takes path, extension and look for paths to specified images"
-            results = []
-            for file in files:
-                for ext in extensions:
-                    if file.endswith(ext):
-                        results.append(file)
-            return results
-        
         self.images_path = QFileDialog.getExistingDirectory()
-        extensions = ['.png', '.jpg', '.jpeg', '.svg', '.bmp']
-        # list path names of every image inside the directory
+        # list names of every image inside the directory, index remembers them for watch mode
         try:
-            self.filenames = filter_(os_listdir(self.images_path), extensions)
-        except FileNotFoundError:
+            folder_index = FolderIndex(self.images_path)
+            filenames = folder_index.scan(require_stable=False)
+            studies = {}
+            for name in find_studies(self.images_path):
+                try:
+                    studies[name] = Study(os_path.join(self.images_path, name))
+                except ValueError as e:
+                    QMessageBox.warning(self, "Study Error", f"Study skipped - {e}")
+            filenames += list(studies)
+        except (FileNotFoundError, NotADirectoryError):
             QMessageBox.warning(self, "No path provided", "No path provided")
             return None
-        if not self.filenames:
+        if not filenames:
             QMessageBox.warning(self, "No Images", "No images in directory.")
             return None            
         if self.images_path:
+            self.folder_index = folder_index
+            self.studies = studies
             # set detection results to default
             self.result.setText("Detection Results")
-            # clear table
-            self.table_model.clear()
             # insert path to the qlineedit
             self.path.setText(self.images_path)
-            # insert filenames
-            for image in self.filenames:
-                name = QStandardItem(str(image))
-                default_detection = QStandardItem(" ")
-                self.table_model.appendRow([name, default_detection])
+            # insert filenames, table is cleared
+            self.result_filter.setCurrentIndex(0)
+            self.table_model.set_filenames(filenames)
+            # table and page share the list, images found by watch mode are appended to it
+            self.filenames = self.table_model.filenames
             self.set_table_view()
             self.style().polish(self.table)            
         else:
@@ -134,39 +245,436 @@ class MultipleDetection(BaseDetection):
             return None
 
     def detect_tumor(self):
+        """Start classification of every image of the folder in a background thread, so the window
+        stays responsive. Table is filled batch by batch. Slices of 3D studies are classified after 
+        images, study by study. Clicking the button again cancels detection.
+        """
+        if self.detection_thread is not None and self.detection_thread.is_alive():
+            self.cancel_detection()
+            return None
         if self.model is None:
             QMessageBox.information(self, "Model Loading", "Model are being loaded. When model info will appear, try again.")
             return None
+        if not self.filenames:
+            QMessageBox.warning(self, "Load Images", "Load images to use detect.")
+            return None
         # counter for final result info
-        num_of_detections = 0
-        num_of_files = len(self.filenames)
+        self.num_of_detections = 0
+        self.detection_rows = [row for row, filename in enumerate(self.filenames) if filename not in self.studies]
+        studies = [(self.table_model.rows_by_name[name], study) for name, study in self.studies.items()]
         self.result.setText("Detecting...")
-        for idx in range(num_of_files):
-            curr_directory = os_path.join(self.images_path, self.filenames[idx])
-            curr_image = cv2_imread(curr_directory)
-            # preprocess loaded image
-            prep_curr_image = self.preprocess_image(curr_image)
-            # model classifies image
-            output = self.model.predict(prep_curr_image)
-            if np_argmax(output) == 1:
-                num_of_detections += 1
-                item = QStandardItem("DETECTED")
-                # qstandarditem cannot be modified by css styling, so
-                # it's needed to do it manually
-                item.setForeground(QColor(255, 0, 0))
+        # progress counts images and slices
+        self.progress_bar.setRange(0, len(self.detection_rows) + sum(len(study) for _, study in studies))
+        self.progress_bar.setValue(0)
+        # block changing folder or model during detection
+        self.set_folder_widgets_enabled(False)
+        self.detect.setText("CANCEL")
+        # breakdown and trace describe this run only
+        tracer.reset()
+        paths = [os_path.join(self.images_path, self.filenames[row]) for row in self.detection_rows]
+        self.cancel_event = Event()
+        self.detection_thread = Thread(target=self.run_detection, 
+                                       args=(paths, self.cancel_event, studies), 
+                                       daemon=True)
+        self.detection_thread.start()
+    
+    def run_detection(self, paths, cancel_event, studies=()):
+        """Body of the detection thread. Never touches widgets directly - results are sent by signals.
+
+        Args:
+            paths (list[str]): Paths to the images, in order of self.detection_rows.
+            cancel_event (threading.Event): When set, detection stops after current batch.
+            studies (Sequence[tuple], optional): (table row, Study) of 3D studies.
+        """
+        # loading threads decode and resize (load_image), normalization runs once per batch
+        meter = ProgressMeter(len(paths) + sum(len(study) for _, study in studies))
+        try:
+            cache, fingerprint = self.result_cache()
+            model, preprocess_batch = self.detection_model()
+            batch_start = perf_counter()
+            for start, outputs in predict_batches(model, paths, load_image, self.batch_size,
+                                                  cache=cache, model_fingerprint=fingerprint,
+                                                  preprocess_batch=preprocess_batch):
+                outputs = np_asarray(outputs)
+                meter.update(len(outputs))
+                # time of the batch, including waiting for decoding, split between its images
+                self.batch_detected.emit(start, outputs, (perf_counter() - batch_start) / len(outputs))
+                batch_start = perf_counter()
+                self.detection_progress.emit(meter.done, meter.summary())
+                if cancel_event.is_set():
+                    break
+            for row, study in studies:
+                if cancel_event.is_set():
+                    break
+                self.run_study_detection(row, study, meter, cancel_event)
+        except Exception as e:
+            self.detection_failed.emit(str(e))
+            return None
+        if cache is not None:
+            cache.flush()
+        self.detection_finished.emit(meter.done, cancel_event.is_set())
+    
+    def run_study_detection(self, row, study, meter, cancel_event):
+        """Stream slices of the study through the model and send score of every slice with verdict."""
+        study_start = perf_counter()
+        outputs = []
+        model, preprocess_batch = self.detection_model()
+        for _, batch_outputs in predict_study(model, study, preprocess_batch, self.batch_size):
+            outputs.append(np_asarray(batch_outputs))
+            meter.update(len(batch_outputs))
+            self.detection_progress.emit(meter.done, meter.summary())
+            if cancel_event.is_set():
+                # study is not reported until all slices are classified
+                return None
+        # verdict of ensemble is made from combined scores of slices
+        scores = self.split_results(np_concatenate(outputs))[0][:, 1] if outputs else np_asarray([], dtype=np_float32)
+        score, positive_slices = aggregate_scores(scores)
+        self.study_detected.emit(row, scores, score, positive_slices, perf_counter() - study_start)
+    
+    def cancel_detection(self):
+        """Ask detection thread to stop after current batch."""
+        self.cancel_event.set()
+        self.result.setText("Cancelling...")
+    
+    def update_detection_table(self, start, outputs, seconds_per_image):
+        """Insert results of one batch to the table at once.
+
+        Args:
+            start (int): Row of the first image in the batch (in folder order).
+            outputs (ndarray): Outputs of the model for every image in the batch.
+            seconds_per_image (float): Time of classification of one image.
+        """
+        with tracer.span(TABLE_UPDATE, images=len(outputs)):
+            outputs, member_probabilities = self.split_results(outputs)
+            valid = ~np_isnan(outputs).any(axis=1)
+            self.num_of_detections += int(np_count_nonzero(np_argmax(outputs[valid], axis=1) == DETECTED))
+            rows = (range(start, start + len(outputs)) if self.detection_rows is None else 
+                    self.detection_rows[start:start + len(outputs)])
+            if rows[-1] - rows[0] + 1 == len(rows):
+                # images are consecutive rows - written with one slice
+                self.table_model.update_results(rows[0], outputs, seconds_per_image, member_probabilities)
             else:
-                item = QStandardItem("No Tumor")
-                # qstandarditem cannot be modified by css styling, so
-                # it's needed to do it manually
-                item.setForeground(QColor(0, 187, 0)) 
-            # common styling
-            font = QFont("Courier")
-            font.setPointSize(12)
-            font.setWeight(QFont.Bold)
-            item.setFont(font)
-            # insert item to the column
-            self.table_model.setItem(idx, 1, item)
-        self.result.setText(f"Detected: {num_of_detections} / {num_of_files}")
+                self.table_model.append_results([self.filenames[row] for row in rows], outputs, seconds_per_image,
+                                                member_probabilities)
+    
+    def update_study_result(self, row, scores, score, positive_slices, seconds):
+        """Insert per-slice scores and verdict of 3D study to the table."""
+        with tracer.span(TABLE_UPDATE, images=len(scores)):
+            self.table_model.set_study_result(row, scores, score, positive_slices, seconds)
+        if self.table_model.labels[row] == DETECTED:
+            self.num_of_detections += 1
+    
+    def update_detection_progress(self, done, info):
+        """Move progress bar and show throughput with eta, and share of the slowest stages when tracing."""
+        self.progress_bar.setValue(done)
+        self.progress_bar.setFormat(f"%v / %m  |  {info}{self.stage_breakdown()}")
+    
+    def stage_breakdown(self):
+        """Live breakdown of stages for the progress bar, full table of stages goes to its tooltip."""
+        if not tracer.enabled:
+            return ""
+        self.progress_bar.setToolTip(tracer.report())
+        breakdown = tracer.breakdown(limit=3)
+        return f"  |  {breakdown}" if breakdown else ""
+    
+    def export_trace(self):
+        """Write spans of finished run as Chrome trace, path is shown in tooltip of the result."""
+        if not tracer.enabled:
+            return None
+        try:
+            path = tracer.export_chrome_trace()
+        except OSError as e:
+            QMessageBox.warning(self, "Trace Error", f"Trace could not be written: {e}")
+            return None
+        lines = [line for line in self.result.toolTip().splitlines() if not line.startswith("stage trace:")]
+        self.result.setToolTip("\n".join(lines + [f"stage trace: {path}"]))
+    
+    def finish_detection(self, done, cancelled):
+        """Show final result and unlock widgets blocked during detection."""
+        num_of_files = len(self.filenames)
+        if cancelled:
+            self.result.setText(f"Cancelled. Detected: {self.num_of_detections} / {done} of {num_of_files}")
+        else:
+            self.result.setText(f"Detected: {self.num_of_detections} / {num_of_files}")
+        cache, _ = self.result_cache()
+        if cache is not None:
+            stats = cache.stats()
+            self.result.setToolTip(f"result cache: {stats['hits']} hits, {stats['misses']} misses, "
+                                   f"{stats['entries']} entries")
+        self.export_trace()
+        self.reset_detection_widgets()
+    
+    def report_detection_error(self, message):
+        """Show error raised inside detection thread."""
+        self.result.setText("Detection Results")
+        self.detect.setEnabled(True)
+        self.reset_detection_widgets()
+        QMessageBox.critical(self, "Detection Error", f"Detection failed: {message}")
+    
+    def reset_detection_widgets(self):
+        self.detect.setText("DETECT")
+        self.detect.setEnabled(True)
+        self.uncheck_watch()
+        self.set_folder_widgets_enabled(True)
+    
+    def uncheck_watch(self):
+        """Uncheck watch button without stopping or starting watch."""
+        self.watch.blockSignals(True)
+        self.watch.setChecked(False)
+        self.watch.blockSignals(False)
+    
+    def set_folder_widgets_enabled(self, enabled):
+        """Lock widgets which would change folder or model while background thread works on them."""
+        self.browser.setEnabled(enabled)
+        self.upload_model.setEnabled(enabled)
+        self.gradcam_export.setEnabled(enabled)
+        self.ensemble_btn.setEnabled(enabled)
+    
+    def toggle_ensemble(self, checked):
+        if checked:
+            self.start_ensemble()
+        else:
+            self.stop_ensemble()
+    
+    def start_ensemble(self):
+        """Classify the folder by current model together with chosen models. Images are decoded and resized once
+        for all models, table shows combined result and tumor probability of every model.
+        """
+        if self.model is None:
+            QMessageBox.information(self, "Model Loading", "Model are being loaded. When model info will appear, try again.")
+            self.uncheck_ensemble()
+            return None
+        filepaths, _ = QFileDialog.getOpenFileNames(self, 
+                                                    "Select models of the ensemble", "", 
+                                                    "Model Files (*.h5 *.keras *.tflite);;All Files (*)")
+        if not filepaths:
+            QMessageBox.warning(self, "No file chosen", "Choose '.h5', '.keras' or '.tflite' files.")
+            self.uncheck_ensemble()
+            return None
+        model_name = lambda path: "model" if path is None else os_path.splitext(os_path.basename(path))[0]
+        members = [(model_name(self.model_path), self.model, bool(self.model_is_default), self.model_path)]
+        try:
+            for filepath in filepaths:
+                # models are shared with other pages by the registry, default model keeps its preprocessing
+                members.append((model_name(filepath), registry.get(filepath),
+                                os_path.abspath(filepath) == os_path.abspath(DEFAULT_MODEL_PATH), filepath))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Could not load model: {e}")
+            self.uncheck_ensemble()
+            return None
+        self.ensemble = Ensemble(members)
+        self.table_model.set_members(self.ensemble.names)
+        self.set_table_view()
+        self.result.setText(f"Ensemble of {len(members)} models")
+    
+    def stop_ensemble(self):
+        self.ensemble = None
+        self.table_model.set_members([])
+        self.set_table_view()
+        self.result.setText("Detection Results")
+    
+    def uncheck_ensemble(self):
+        """Uncheck ensemble button without changing models."""
+        self.ensemble_btn.blockSignals(True)
+        self.ensemble_btn.setChecked(False)
+        self.ensemble_btn.blockSignals(False)
+    
+    def detection_model(self):
+        """
+        Returns:
+            tuple: (model or ensemble, function preparing batch of resized images for it)
+        """
+        if self.ensemble is not None:
+            # ensemble preprocesses shared batch once per preprocessing of its models
+            return self.ensemble, self.ensemble.stack
+        return compiled_predictor(self.model), self.preprocess_batch
+    
+    def split_results(self, outputs):
+        """
+        Returns:
+            tuple: (outputs of the model or combined outputs of the ensemble, 
+                tumor probability of every model of the ensemble or None)
+        """
+        outputs = np_asarray(outputs)
+        if self.ensemble is None:
+            return outputs, None
+        return split_outputs(outputs, len(self.ensemble.members))
+    
+    def result_cache(self):
+        """Cache of model outputs with fingerprint of the ensemble when it is used, of current model otherwise."""
+        cache, fingerprint = super().result_cache()
+        if self.ensemble is None or cache is None:
+            return cache, fingerprint
+        fingerprint = self.ensemble.fingerprint()
+        return (cache, fingerprint) if fingerprint is not None else (None, None)
+    
+    def toggle_watch(self, checked):
+        if checked:
+            self.start_watch()
+        else:
+            self.stop_watch()
+    
+    def start_watch(self):
+        """Classify images dropped into the folder while watching. Results are appended to the table
+        and to chosen '.csv' or '.jsonl' file. Images listed but not classified yet are classified first.
+        """
+        if self.detection_thread is not None and self.detection_thread.is_alive():
+            self.uncheck_watch()
+            return None
+        if self.model is None:
+            QMessageBox.information(self, "Model Loading", "Model are being loaded. When model info will appear, try again.")
+            self.uncheck_watch()
+            return None
+        if self.folder_index is None:
+            QMessageBox.warning(self, "No Directory Chosen", "To watch folder, choose directory.")
+            self.uncheck_watch()
+            return None
+        output_path, _ = QFileDialog.getSaveFileName(self, 
+                                                     "Append results to...",
+                                                     "", 
+                                                     "CSV Files (*.csv);;JSON Lines (*.jsonl)")
+        if not output_path:
+            QMessageBox.warning(self, "No File Chosen", "To watch folder, choose file for results.")
+            self.uncheck_watch()
+            return None
+        labels = self.table_model.labels.tolist()
+        self.folder_index.forget([name for name, label in zip(self.filenames, labels) if label == NOT_CLASSIFIED])
+        self.result.setText("Watching...")
+        tracer.reset()
+        self.progress_bar.setRange(0, 0)
+        self.set_folder_widgets_enabled(False)
+        self.detect.setEnabled(False)
+        self.cancel_event = Event()
+        self.detection_thread = Thread(target=self.run_watch, 
+                                       args=(self.folder_index, self.cancel_event, output_path), 
+                                       daemon=True)
+        self.detection_thread.start()
+    
+    def stop_watch(self):
+        self.cancel_event.set()
+        self.result.setText("Stopping...")
+    
+    def run_watch(self, folder_index, cancel_event, output_path):
+        """Body of the watch thread. Writes results to the file, sends them to the table by signal."""
+        def on_batch(names, outputs, seconds_per_image):
+            # file gets combined result of the ensemble
+            combined, _ = self.split_results(outputs)
+            for name, output in zip(names, combined):
+                writer.write(name, output)
+            writer.flush()
+            self.watch_batch_detected.emit(names, np_asarray(outputs), seconds_per_image)
+        
+        format_ = os_path.splitext(output_path)[1].lower().lstrip('.')
+        try:
+            cache, fingerprint = self.result_cache()
+            with open(output_path, 'a', newline='', encoding='utf-8') as file:
+                # header is written only to new file
+                writer = ResultWriter(file, format_, header=file.tell() == 0)
+                model, preprocess_batch = self.detection_model()
+                watch_folder(model, folder_index, load_image, on_batch,
+                             preprocess_batch, self.batch_size, self.watch_interval, cancel_event,
+                             cache=cache, model_fingerprint=fingerprint)
+        except Exception as e:
+            self.detection_failed.emit(str(e))
+            return None
+        self.watch_finished.emit()
+    
+    def update_watch_table(self, names, outputs, seconds_per_image):
+        """Append results of images found in watched folder."""
+        with tracer.span(TABLE_UPDATE, images=len(names)):
+            outputs, member_probabilities = self.split_results(outputs)
+            self.table_model.append_results(names, outputs, seconds_per_image, member_probabilities)
+        self.num_of_detections = int(np_count_nonzero(self.table_model.labels == DETECTED))
+        self.result.setText(f"Watching... Detected: {self.num_of_detections} / {len(self.filenames)}")
+        # busy progress bar shows no text, breakdown goes only to its tooltip
+        self.stage_breakdown()
+    
+    def finish_watch(self):
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(0)
+        self.result.setText(f"Detected: {self.num_of_detections} / {len(self.filenames)}")
+        self.export_trace()
+        self.reset_detection_widgets()
+    
+    def detected_rows(self):
+        """Images marked as detected (indexes of self.filenames), including corrections of the user."""
+        return self.table_model.rows_with_label(DETECTED)
+    
+    def export_grad_cam(self):
+        """Write grad-cam overlays of every detected image into chosen directory. Heatmaps are
+        computed in batches by a background thread. Clicking the button again cancels export.
+        """
+        if self.detection_thread is not None and self.detection_thread.is_alive():
+            # detection locks the button, so the running thread is the export
+            self.cancel_detection()
+            return None
+        # grad-cam is exported for 2D images, 3D studies are skipped
+        rows = [row for row in self.detected_rows() if self.filenames[row] not in self.studies]
+        if not rows:
+            QMessageBox.warning(self, "No Detections", "Use 'Detect' button to find images with tumor first.")
+            return None
+        output_dir = QFileDialog.getExistingDirectory(self, "Choose directory for Grad-CAM images")
+        if not output_dir:
+            QMessageBox.warning(self, "No Directory Chosen", "To export Grad-CAM images, choose directory.")
+            return None
+        paths = [os_path.join(self.images_path, self.filenames[row]) for row in rows]
+        self.result.setText("Exporting Grad-CAM...")
+        self.progress_bar.setRange(0, len(paths))
+        self.progress_bar.setValue(0)
+        self.set_folder_widgets_enabled(False)
+        self.detect.setEnabled(False)
+        self.gradcam_export.setEnabled(True)
+        self.gradcam_export.setText("CANCEL")
+        self.cancel_event = Event()
+        self.detection_thread = Thread(target=self.run_export, args=(paths, output_dir, self.cancel_event), daemon=True)
+        self.detection_thread.start()
+    
+    def run_export(self, paths, output_dir, cancel_event):
+        """Body of the grad-cam export thread.
+
+        Args:
+            paths (list[str]): Paths to the detected images.
+            output_dir (str): Directory for overlays.
+            cancel_event (threading.Event): When set, export stops after current batch.
+        """
+        try:
+            grad_cam_alg = self.get_grad_cam_alg()
+            if grad_cam_alg is None:
+                raise ValueError("Grad-CAM is not available for this model.")
+            stats = export_overlays(grad_cam_alg, paths, output_dir, self.preprocess_batch,
+                                    batch_size=self.batch_size,
+                                    progress=lambda meter: self.export_progress.emit(meter.done, meter.total, meter.summary()),
+                                    cancel_event=cancel_event)
+        except Exception as e:
+            self.export_failed.emit(str(e))
+            return None
+        self.export_finished.emit(stats["count"], stats["failed"], stats["seconds"], stats["images_per_second"])
+    
+    def update_export_progress(self, done, total, info):
+        self.progress_bar.setValue(done)
+        self.progress_bar.setFormat(f"%v / %m  |  {info}")
+    
+    def finish_export(self, count, failed, seconds, images_per_second):
+        self.reset_export_widgets()
+        if self.cancel_event.is_set():
+            self.result.setText(f"Cancelled. Exported: {count} Grad-CAM images")
+            return None
+        self.result.setText(f"Exported: {count} Grad-CAM images")
+        # images which could not be read are reported, not silently missing in the directory
+        failed_text = f"\n{failed} images could not be read and were skipped." if failed else ""
+        QMessageBox.information(self, "Success", f"Exported {count} Grad-CAM images in {seconds:.1f} s "
+                                                 f"({images_per_second:.1f} img/s).{failed_text}")
+
+    def report_export_error(self, message):
+        """Show error raised inside grad-cam export thread."""
+        self.result.setText("Detection Results")
+        self.reset_export_widgets()
+        QMessageBox.critical(self, "Export Error", f"Grad-CAM export failed: {message}")
+    
+    def reset_export_widgets(self):
+        self.gradcam_export.setText("Export Grad-CAM")
+        self.detect.setEnabled(True)
+        self.set_folder_widgets_enabled(True)
 
     def export_to_csv(self):
         """Take data from table and save it into .csv file.
@@ -178,44 +686,50 @@ class MultipleDetection(BaseDetection):
         if filepath:
             with open(filepath, 'w', newline='', encoding='utf-8') as file:
                 writer = csv_writer(file)
-                # get lengths of table
-                rows = self.table_model.rowCount()
-                cols = self.table_model.columnCount()
-                # add headers
-                headers = [self.table_model.headerData(col, Qt.Horizontal) for col in range(cols)]
-                writer.writerow(headers)
-                # iterate over the table
-                for row in range(rows):
-                    # image name
-                    row_data = []
-                    item_name = self.table_model.item(row, 0)
-                    row_data.append(item_name.text() if item_name else "")
-                    item_result = self.table_model.item(row, 1)
-                    # possibilities created for optional words which user can input after personal evalutation 
-                    possibilites_yes = ('detected', 'yes', '1', 'true', 'y', 't')
-                    possibilities_no = ('no tumor', 'no', '0', 'false', 'n', 'f')
-                    # manipulate string to ease the compare to possibilities
-                    check_pattern = str(item_result.text()).strip().lower()
-                    # check table cell and insert data to csv depends on the content
-                    row_data.append(
-                        1 if item_result and check_pattern in possibilites_yes else 
-                        0 if item_result and check_pattern in possibilities_no else 
-                        "N/A")                    
-                    writer.writerow(row_data)
+                model = self.table_model
+                # same columns as csv written by classify.py, then probability of every model of the ensemble
+                writer.writerow(["File Name", "Detection Result", "Tumor Probability"] + 
+                                [f"{name} Probability" for name in model.member_names])
+                format_probability = lambda probability: "" if probability != probability else f"{probability:.6f}"
+                # results are read from arrays, every image in folder order
+                for filename, label, probability, members in zip(model.filenames, model.labels.tolist(),
+                                                                 model.probabilities.tolist(), 
+                                                                 model.member_probabilities.tolist()):
+                    writer.writerow([filename,
+                                     label if label in (DETECTED, NO_TUMOR) else "N/A",
+                                     format_probability(probability)] +
+                                    [format_probability(member) for member in members])
             QMessageBox.information(self, "Success", f"File saved in {filepath}")
         else:
             QMessageBox.warning(self, "No Directory Chosen", "To save as .csv, choose Directory.")
             return None
     
+    def study_slice_index(self, row, study):
+        """Slice of the study with the highest tumor probability (middle slice before detection)."""
+        scores = self.table_model.slice_scores.get(row)
+        if scores is not None and len(scores) and not np_isnan(scores).all():
+            return int(np_nanargmax(scores))
+        return len(study) // 2
+    
+    def gallery_item(self, row):
+        """Item of the gallery for storage row - 3D study is shown by its most suspicious slice."""
+        filename = self.filenames[row]
+        full_path = os_path.join(self.images_path, filename)
+        study = self.studies.get(filename)
+        if study is None:
+            return (filename, full_path, None, "")
+        idx = self.study_slice_index(row, study)
+        return (f"{filename} - slice {idx}", full_path, lambda _, study=study, idx=idx: study.slice_image(idx), str(idx))
+    
     def show_image(self):
-        selected_indexes = self.table.selectedIndexes()
-        # prevent displaying too much
-        if len(selected_indexes) < 10:
-            for idx in selected_indexes:
-                num = idx.row()
-                filename = self.filenames[num]
-                full_path = os_path.join(self.images_path, filename)
-                image_viewer = ImageViewer(full_path)
-                self.image_viewer_refs.append(image_viewer)
-        else:
-            QMessageBox.information(self, "Too much cells", "Choose up to 10 cells.")
+        """Open gallery of the images in order of the table, starting at the first selected image.
+        """
+        if not self.filenames:
+            QMessageBox.warning(self, "Load Images", "Load images to show them.")
+            return None
+        selected_rows = sorted({idx.row() for idx in self.table.selectedIndexes()})
+        # row of the view can differ from folder order after sorting or filtering
+        items = [self.gallery_item(self.table_model.storage_row(row)) for row in range(self.table_model.rowCount())]
+        if self.gallery is None:
+            self.gallery = GalleryViewer()
+        self.gallery.set_items(items, selected_rows[0] if selected_rows else 0)
@@ -0,0 +1,308 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QFont, QColor
+from sys import intern
+# import functions one by one to prevent import whole library (reduce size of .exe)
+from numpy import (
+    arange as np_arange,
+    concatenate as np_concatenate,
+    argsort as np_argsort,
+    argmax as np_argmax,
+    asarray as np_asarray,
+    flatnonzero as np_flatnonzero,
+    full as np_full,
+    isnan as np_isnan,
+    array as np_array,
+    int8 as np_int8,
+    int32 as np_int32,
+    int64 as np_int64,
+    float32 as np_float32
+)
+from script.volumes import THRESHOLD
+
+
+# words accepted in result column, user can correct results after personal evaluation
+POSSIBILITIES_YES = ('detected', 'yes', '1', 'true', 'y', 't')
+POSSIBILITIES_NO = ('no tumor', 'no', '0', 'false', 'n', 'f')
+
+# values of label column
+NOT_CLASSIFIED = -1
+FAILED = -2
+NO_TUMOR = 0
+DETECTED = 1
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """Results of folder detection stored column by column - filenames in one list of interned
+    strings, predicted class, tumor probability, positive slices and time of classification in NumPy arrays.
+    Cells are not stored at all - view asks only for rows which are visible.
+    Sorting and filtering reorder an array of row numbers, results are written batch by batch.
+    Rows of 3D studies keep score of every slice, shown in tooltip of the row.
+    Results of ensemble are the combined result, tumor probability of every model is kept in one 2D array.
+
+    columns:
+        File Name, Detection Result, Tumor Probability, Slices (positive / all), Time [ms],
+        tumor probability of every model of the ensemble
+    """
+    HEADERS = ("File Name", "Detection Result", "Tumor Probability", "Slices", "Time [ms]")
+    LABEL_TEXT = {DETECTED: "DETECTED", NO_TUMOR: "No Tumor", FAILED: "N/A", NOT_CLASSIFIED: " "}
+    # qabstracttablemodel cannot be modified by css styling, so colors are set manually
+    LABEL_COLORS = {DETECTED: QColor(255, 0, 0), NO_TUMOR: QColor(0, 187, 0)}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # font of detection results, shared by every cell
+        self.result_font = QFont("Courier")
+        self.result_font.setPointSize(12)
+        self.result_font.setWeight(QFont.Bold)
+        # names of models of the ensemble, empty for single model
+        self.member_names = []
+        self.set_filenames([])
+
+    def set_filenames(self, filenames):
+        """Replace content of the table with not classified images."""
+        self.beginResetModel()
+        self.filenames = [intern(str(filename)) for filename in filenames]
+        self.rows_by_name = {filename: row for row, filename in enumerate(self.filenames)}
+        self.labels = np_full(len(self.filenames), NOT_CLASSIFIED, dtype=np_int8)
+        self.probabilities = np_full(len(self.filenames), float('nan'), dtype=np_float32)
+        # -1 for 2D images
+        self.positive_slices = np_full(len(self.filenames), -1, dtype=np_int32)
+        self.times = np_full(len(self.filenames), float('nan'), dtype=np_float32)
+        # tumor probability of every model of the ensemble, shape (rows, models)
+        self.member_probabilities = np_full((len(self.filenames), len(self.member_names)), float('nan'), dtype=np_float32)
+        # row -> tumor probability of every slice, only for 3D studies
+        self.slice_scores = {}
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+        self.label_filter = None
+        # row of the view -> row of the storage
+        self.order = np_arange(len(self.filenames))
+        self.endResetModel()
+
+    def set_members(self, names):
+        """Show column with tumor probability of every model of the ensemble, empty names remove them.
+        Results already in the table are kept, probabilities of previous models are cleared."""
+        self.beginResetModel()
+        self.member_names = [str(name) for name in names]
+        self.member_probabilities = np_full((len(self.filenames), len(self.member_names)), float('nan'), dtype=np_float32)
+        self.endResetModel()
+
+    @property
+    def headers(self):
+        return self.HEADERS + tuple(f"{name} Probability" for name in self.member_names)
+
+    def update_results(self, start, outputs, seconds_per_image=float('nan'), member_probabilities=None):
+        """
+        Write results of one batch.
+
+        Args:
+            start (int): Storage row of the first image of the batch.
+            outputs (ndarray): Outputs of the model, shape (N, classes), NaN for images which failed.
+                Combined outputs for ensemble.
+            seconds_per_image (float, optional): Time of classification of one image.
+            member_probabilities (ndarray, optional): Tumor probability of every model of the ensemble, shape (N, models).
+        """
+        outputs = np_asarray(outputs, dtype=np_float32)
+        if not len(outputs):
+            return None
+        end = start + len(outputs)
+        self._write_results(slice(start, end), outputs, seconds_per_image, member_probabilities)
+        if self.sort_column is None and self.label_filter is None:
+            # view rows are storage rows
+            self.dataChanged.emit(self.index(start, 1), self.index(end - 1, len(self.headers) - 1))
+        else:
+            self.apply_order()
+
+    def append_results(self, filenames, outputs, seconds_per_image=float('nan'), member_probabilities=None):
+        """
+        Write results of images found by watch mode. New images are appended at the end,
+        images already in the table (changed files) are updated in place.
+
+        Args:
+            filenames (Sequence[str]): Names of the images of the batch.
+            outputs (ndarray): Outputs of the model, shape (N, classes).
+            seconds_per_image (float, optional): Time of classification of one image.
+            member_probabilities (ndarray, optional): Tumor probability of every model of the ensemble, shape (N, models).
+        """
+        outputs = np_asarray(outputs, dtype=np_float32)
+        if not len(outputs):
+            return None
+        new = [filename for filename in dict.fromkeys(filenames) if filename not in self.rows_by_name]
+        if new:
+            count = len(self.filenames)
+            for row, filename in enumerate(new, start=count):
+                filename = intern(str(filename))
+                self.filenames.append(filename)
+                self.rows_by_name[filename] = row
+            grow = lambda column, value: np_concatenate([column, np_full(len(new), value, dtype=column.dtype)])
+            self.labels = grow(self.labels, NOT_CLASSIFIED)
+            self.probabilities = grow(self.probabilities, float('nan'))
+            self.positive_slices = grow(self.positive_slices, -1)
+            self.times = grow(self.times, float('nan'))
+            self.member_probabilities = np_concatenate([self.member_probabilities, 
+                                                        np_full((len(new), len(self.member_names)), float('nan'), dtype=np_float32)])
+        rows = [self.rows_by_name[filename] for filename in filenames]
+        self._write_results(rows, outputs, seconds_per_image, member_probabilities)
+        if new and self.sort_column is None and self.label_filter is None:
+            self.beginInsertRows(QModelIndex(), len(self.order), len(self.filenames) - 1)
+            self.order = np_arange(len(self.filenames))
+            self.endInsertRows()
+        if self.sort_column is None and self.label_filter is None:
+            self.dataChanged.emit(self.index(min(rows), 1), self.index(max(rows), len(self.headers) - 1))
+        else:
+            self.apply_order()
+
+    def set_study_result(self, row, scores, score, positive_slices, seconds):
+        """
+        Write result of 3D study.
+
+        Args:
+            row (int): Storage row of the study.
+            scores (ndarray): Tumor probability of every slice.
+            score (float): Score of the study, NaN if no slice was classified.
+            positive_slices (int): Number of slices classified as tumor.
+            seconds (float): Time of classification of the whole study.
+        """
+        self.slice_scores[row] = np_asarray(scores, dtype=np_float32)
+        self.labels[row] = FAILED if np_isnan(score) else DETECTED if score >= THRESHOLD else NO_TUMOR
+        self.probabilities[row] = score
+        self.positive_slices[row] = positive_slices
+        self.times[row] = seconds * 1000
+        if self.sort_column is None and self.label_filter is None:
+            self.dataChanged.emit(self.index(row, 1), self.index(row, len(self.headers) - 1))
+        else:
+            self.apply_order()
+
+    def _write_results(self, rows, outputs, seconds_per_image, member_probabilities=None):
+        """Write labels, probabilities and times of the batch into rows (slice or list of storage rows)."""
+        if not len(outputs):
+            return None
+        failed = np_isnan(outputs).any(axis=1)
+        labels = np_argmax(outputs, axis=1).astype(np_int8)
+        labels[failed] = FAILED
+        self.labels[rows] = labels
+        self.probabilities[rows] = outputs[:, 1] if outputs.shape[1] > 1 else float('nan')
+        self.times[rows] = seconds_per_image * 1000
+        if member_probabilities is not None and self.member_names:
+            self.member_probabilities[rows] = np_asarray(member_probabilities, dtype=np_float32)
+
+    def apply_order(self):
+        """Recompute rows of the view after results, filter or sorting changed."""
+        if self.label_filter is None:
+            rows = np_arange(len(self.filenames))
+        else:
+            rows = np_flatnonzero(self.labels == self.label_filter)
+        descending = self.sort_order == Qt.DescendingOrder
+        if self.sort_column == 0:
+            rows = np_array(sorted(rows, key=self.filenames.__getitem__, reverse=descending), dtype=np_int64)
+        elif self.sort_column is not None:
+            column = (self.member_probabilities[:, self.sort_column - len(self.HEADERS)] if self.sort_column >= len(self.HEADERS)
+                      else (self.labels, self.probabilities, self.positive_slices, self.times)[self.sort_column - 1])
+            values = column[rows]
+            missing = np_isnan(values)
+            # stable sort keeps folder order inside equal results in both orders, NaN goes last in both orders
+            sorted_values = -values[~missing] if descending else values[~missing]
+            rows = np_concatenate([rows[~missing][np_argsort(sorted_values, kind='stable')], rows[missing]])
+        if len(rows) != len(self.order):
+            # rows appeared or disappeared (filter, results written while filtering) - layout change cannot describe it
+            self.beginResetModel()
+            self.order = rows
+            self.endResetModel()
+            return None
+        self.layoutAboutToBeChanged.emit()
+        old_order = self.order
+        self.order = rows
+        # keep selection on the same images
+        persistent = self.persistentIndexList()
+        position = {row: view_row for view_row, row in enumerate(rows.tolist())} if persistent else {}
+        for index in persistent:
+            view_row = position.get(int(old_order[index.row()])) if index.row() < len(old_order) else None
+            self.changePersistentIndex(index, QModelIndex() if view_row is None else self.index(view_row, index.column()))
+        self.layoutChanged.emit()
+
+    def set_label_filter(self, label=None):
+        """Show only rows with the label (DETECTED, NO_TUMOR, FAILED, NOT_CLASSIFIED), None shows every row."""
+        self.label_filter = label
+        self.apply_order()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Called by the view when header is clicked, column -1 restores folder order."""
+        self.sort_column = column if column >= 0 else None
+        self.sort_order = order
+        self.apply_order()
+
+    def storage_row(self, row):
+        """Row of the storage (index of the filename) shown in row of the view."""
+        return int(self.order[row])
+
+    def rows_with_label(self, label):
+        """Storage rows with the label, in folder order."""
+        return np_flatnonzero(self.labels == label).tolist()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.order[index.row()]
+        column = index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if column == 0:
+                return self.filenames[row]
+            if column == 1:
+                return self.LABEL_TEXT[int(self.labels[row])]
+            if column == 3:
+                scores = self.slice_scores.get(row)
+                return "" if scores is None else f"{self.positive_slices[row]} / {len(scores)}"
+            if column >= len(self.HEADERS):
+                value = self.member_probabilities[row, column - len(self.HEADERS)]
+            else:
+                value = (self.probabilities if column == 2 else self.times)[row]
+            return "" if np_isnan(value) else f"{value:.1f}" if column == 4 else f"{value:.4f}"
+        if role == Qt.ToolTipRole and row in self.slice_scores:
+            return self.slice_tooltip(row)
+        if column == 1:
+            if role == Qt.ForegroundRole:
+                return self.LABEL_COLORS.get(int(self.labels[row]))
+            if role == Qt.FontRole:
+                return self.result_font
+        return None
+
+    def slice_tooltip(self, row):
+        """Tumor probability of every slice of the study, ten slices per line."""
+        scores = self.slice_scores[row]
+        lines = [f"slices {start}-{min(start + 10, len(scores)) - 1}: "
+                 + " ".join("-" if score != score else f"{score:.2f}" for score in scores[start:start + 10].tolist())
+                 for start in range(0, len(scores), 10)]
+        return "\n".join(lines)
+
+    def flags(self, index):
+        flags = super().flags(index)
+        # detection result can be corrected by the user
+        if index.isValid() and index.column() == 1:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """Accept correction of detection result, written as one of POSSIBILITIES_YES or POSSIBILITIES_NO."""
+        if role != Qt.EditRole or not index.isValid() or index.column() != 1:
+            return False
+        text = str(value).strip().lower()
+        if text in POSSIBILITIES_YES:
+            label = DETECTED
+        elif text in POSSIBILITIES_NO:
+            label = NO_TUMOR
+        else:
+            return False
+        self.labels[self.order[index.row()]] = label
+        self.dataChanged.emit(index, index)
+        return True
@@ -4,13 +4,14 @@ from PyQt5.QtWidgets import (
     QLayout, QLabel, QPushButton,
     QFileDialog, QMessageBox
 )
-from PyQt5.QtGui import QPixmap
-from app.BaseDetection import BaseDetection
+from PyQt5.QtGui import QPixmap, QImage
+from app.BaseDetection import BaseDetection, as_qimage
 # import functions one by one to prevent import whole library (reduce size of .exe)
 from cv2 import imread as cv2_imread
-from numpy import argmax as np_argmax
-### modules lazy-loaded
-# from script.GradCAM import GradCAM
+from numpy import argmax as np_argmax, asarray as np_asarray
+from script.ResultCache import hash_file
+from script.CompiledPredictor import compiled_predictor
+from script.StageTracer import tracer, IMREAD, PREDICT, DISPLAY
 
 
 class SingleDetection(BaseDetection):
@@ -22,6 +23,9 @@ class SingleDetection(BaseDetection):
         self.original_image = None
         self.image_w_grad_original = None
         self.detection_result = None
+        self.heatmap = None # grad-cam heatmap computed together with detection
+        self.display_pixmaps = {} # scaled pixmaps of opened file - 'original' and 'grad_cam'
+        self.display_height = 480
         
         # unique widgets  
         self.result = QLabel("Detection Results", alignment=Qt.AlignCenter)
@@ -74,21 +78,23 @@ class SingleDetection(BaseDetection):
         self.img_path, _ = QFileDialog.getOpenFileName(
             self,
             "Open Image File", "",
-            "Image Files (*.png *.jpg *.jpeg *.svg *.bmp)"
+            "Image Files (*.png *.jpg *.jpeg *.bmp)"
         )
         if self.img_path:
             # reset buttons and variables to default
             self.grad_cam.setChecked(False)
             self.result.setText("Detection Results")
             self.detection_result = None
-            # set image and resize properly to display
-            self.original_image = cv2_imread(self.img_path) # cv2.imread to load original image
-            pixmap = QPixmap(self.img_path)
-            if pixmap.isNull():
+            self.heatmap = None
+            self.image_w_grad_original = None
+            self.display_pixmaps = {}
+            # file is decoded once - the same array feeds the model, display and grad-cam overlay
+            with tracer.span(IMREAD):
+                self.original_image = cv2_imread(self.img_path)
+            if self.original_image is None:
                 QMessageBox.critical(self, "Image Error", "Image not loaded properly. Check extension")
                 return None
-            scale_pixmap = pixmap.scaledToHeight(480, Qt.SmoothTransformation)
-            self.image.setPixmap(scale_pixmap)
+            self.image.setPixmap(self.display_pixmap('original', self.original_image))
             # set qlineedit
             self.path.setText(self.img_path)
             # set colors to default
@@ -105,7 +111,8 @@ class SingleDetection(BaseDetection):
         
         WARNING: if you choose custom model, it should contain custom_preprocessing function 
         in module script/preprocess_input_custom.py. Otherwise your model will take raw image,
-        returning error (input type will be uint8 with shape:(xdim, ydim, 3))
+        returning error (input type will be uint8 with shape:(xdim, ydim, 3)).
+        Servable model (python -m script.servable) resizes and normalizes in its graph and needs no such function.
         """
         if self.model is None:
             QMessageBox.information(self, "Model Loading", "Model are being loaded. When model info will appear, try again.")
@@ -115,8 +122,26 @@ class SingleDetection(BaseDetection):
             return None
         self.result.setText("")
         self.result.update()
-        preprocessed_img = self.preprocess_image(self.original_image)
-        output = self.model.predict(preprocessed_img)
+        # look up result of the same file classified before by the same model
+        cache, fingerprint = self.result_cache()
+        image_hash = hash_file(self.img_path) if cache is not None and self.img_path else None
+        output = cache.get(image_hash, fingerprint) if image_hash else None
+        self.heatmap = None
+        self.image_w_grad_original = None
+        if output is None:
+            preprocessed_img = self.preprocess_image(self.original_image)
+            grad_cam_alg = self.get_grad_cam_alg()
+            if grad_cam_alg is not None:
+                # one forward pass gives prediction and heatmap, so toggling grad-cam is instant
+                output, _, heatmaps = grad_cam_alg.predict_with_heatmap(preprocessed_img)
+                self.heatmap = heatmaps[0]
+            else:
+                # models without Grad-CAM (e.g. TFLite) - compiled forward pass, traced once per model,
+                # no predict loop built per click
+                with tracer.span(PREDICT):
+                    output = compiled_predictor(self.model).predict(preprocessed_img)
+            if image_hash:
+                cache.put(image_hash, fingerprint, np_asarray(output)[0])
         if np_argmax(output) == 1:
             self.detection_result = 1
             self.result.setText("DETECTED")
@@ -130,6 +155,7 @@ class SingleDetection(BaseDetection):
         # reload styling to apply to result
         self.style().polish(self.result)
         self.style().polish(self.image)
+        self.show_stage_breakdown()
     
     def apply_grad_cam(self, checked):
         if self.original_image is None:
@@ -141,27 +167,52 @@ class SingleDetection(BaseDetection):
             QMessageBox.warning(self, "Detect Tumor", "Use 'Detect' button to detect tumor first.")
             return None
         
-        if self.grad_cam_alg is None:
-            # lazy-loading 
-            from script.GradCAM import GradCAM
-            # after loading model, grad-cam alg can be initialized by composition
-            self.grad_cam_alg = GradCAM(self.model)   
-
         if checked:
-            # use grad cam class for getting image with cnn's activation areas applied
-            overlay_image = self.grad_cam_alg.create_gradcam_image(self.img_path, class_index=self.detection_result)
-            self.image_w_grad_original = overlay_image
-            overlayed_qimage = self.preprocess_image(self.image_w_grad_original, reversed_=True)
-            pixmap_grad = QPixmap(overlayed_qimage)
+            if self.image_w_grad_original is None:
+                grad_cam_alg = self.get_grad_cam_alg()
+                if grad_cam_alg is None:
+                    self.grad_cam.setChecked(False)
+                    QMessageBox.warning(self, "Grad-CAM", "Grad-CAM is not available for this model.")
+                    return None
+                if self.heatmap is None:
+                    # result came from the cache, heatmap was not computed during detection
+                    preprocessed_img = self.preprocess_image(self.original_image)
+                    self.heatmap = grad_cam_alg.generate_heatmap(preprocessed_img, self.detection_result)
+                # use grad cam class for getting image with cnn's activation areas applied
+                self.image_w_grad_original = grad_cam_alg.overlay_heatmap_on_image(self.heatmap, self.original_image)
+                self.display_pixmaps.pop('grad_cam', None)
+            # overlay is RGB
+            pixmap_grad = self.display_pixmap('grad_cam', self.image_w_grad_original, QImage.Format_RGB888)
             if pixmap_grad.isNull():
                 QMessageBox.critical(self, "Image Error", "Transition to Grad-CAM failed.")
                 return
-            scale_pixmap_grad = pixmap_grad.scaledToHeight(480, Qt.SmoothTransformation)
-            self.image.setPixmap(scale_pixmap_grad)
+            self.image.setPixmap(pixmap_grad)
+            self.show_stage_breakdown()
         else:
-            pixmap = QPixmap(self.img_path)
-            if pixmap.isNull():
-                QMessageBox.critical(self, "Image Error", "Image not loaded properly. Check the extension.")
-                return
-            scale_pixmap = pixmap.scaledToHeight(480, Qt.SmoothTransformation)
-            self.image.setPixmap(scale_pixmap)
+            # decoded image is not read from the file again
+            self.image.setPixmap(self.display_pixmap('original', self.original_image))
+    
+    def show_stage_breakdown(self):
+        """Show time of every stage in tooltip of the result when stage tracing is on."""
+        if tracer.enabled:
+            self.result.setToolTip(tracer.report())
+    
+    def display_pixmap(self, key, image, format_=QImage.Format_BGR888):
+        """
+        Pixmap of the image scaled to the height of image label, made once per opened file.
+        Full-size pixels are wrapped as QImage without copy, only the scaled image is copied into pixmap.
+
+        Args:
+            key (str): 'original' or 'grad_cam'.
+            image (ndarray): Decoded image (BGR) or grad-cam overlay (RGB).
+            format_ (QImage.Format, optional): Channel order of the image. Defaults to QImage.Format_BGR888.
+
+        Returns:
+            QPixmap: Scaled pixmap.
+        """
+        if key not in self.display_pixmaps:
+            with tracer.span(DISPLAY):
+                # array backing q_image stays alive until scaled copy is made
+                q_image, _pixels = as_qimage(image, format_)
+                self.display_pixmaps[key] = QPixmap.fromImage(q_image.scaledToHeight(self.display_height, Qt.SmoothTransformation))
+        return self.display_pixmaps[key]
@@ -0,0 +1,190 @@
+"""Headless batch classifier. Classifies every image of a directory tree without GUI
+- PyQt5 is never imported, so it runs on servers without display.
+
+usage:
+    python classify.py DIRECTORY --output results.csv [--model models/custom.keras] [--batch-size 32] [--watch 2]
+                       [--processes 4] [--trace trace.json]
+
+Results are streamed batch by batch to '.csv' or '.jsonl' file. With --watch, images added
+to the directory later are classified as they arrive and appended to the file, until Ctrl+C.
+With --processes, images are split among worker processes, each with its own copy of the model.
+With --trace, time of every stage (imread, resize, preprocess_input, predict, ...) is printed
+and written as Chrome trace, opened by chrome://tracing or https://ui.perfetto.dev.
+"""
+from time import time
+start = time()
+import settings
+from sys import stderr
+from argparse import ArgumentParser
+from os import path as os_path
+# import functions one by one to prevent import whole library (reduce size of .exe)
+from cv2 import imread as cv2_imread
+from numpy import (
+    argmax as np_argmax,
+    isnan as np_isnan
+)
+from script.ModelRegistry import registry, DEFAULT_MODEL_PATH
+from script.ResultCache import get_result_cache, model_fingerprint
+from script.preprocessing import resize_image, batch_preprocessor
+from script.batch_inference import list_images, predict_batches, ProgressMeter, DEFAULT_BATCH_SIZE
+from script.prefetch import DEFAULT_WORKERS
+from script.CompiledPredictor import compiled_predictor
+from script.ResultWriter import ResultWriter
+from script.folder_watch import FolderIndex, watch_folder
+from script.sharded_inference import ShardedPredictor
+from script.StageTracer import tracer, IMREAD, RESIZE
+end = time()
+
+
+def load_image(path):
+    """Decode and resize the image. Returns None if the image cannot be used, so run goes on."""
+    try:
+        with tracer.span(IMREAD):
+            image = cv2_imread(path)
+        if image is None:
+            raise ValueError("file cannot be decoded")
+        with tracer.span(RESIZE):
+            return resize_image(image)
+    except Exception as e:
+        print(f"\nSkipping {path}: {e}", file=stderr)
+        return None
+
+
+def classify_directory(model, directory, output_path, model_is_default=True, batch_size=32, workers=DEFAULT_WORKERS,
+                       cache=None, fingerprint=None, sharded=None):
+    """
+    Classify every image of the directory tree and stream results to the file.
+
+    Args:
+        model: Loaded model.
+        directory (str): Root directory with images.
+        output_path (str): Path to '.csv' or '.jsonl' file.
+        model_is_default (bool, optional): Flag for preprocessing, as in BaseDetection. Defaults to True.
+        batch_size (int, optional): Number of images per forward pass. Defaults to 32.
+        workers (int, optional): Number of threads decoding images ahead of the model.
+        cache (ResultCache, optional): Images classified before by the same model are not classified again.
+        fingerprint (str, optional): Fingerprint of the model, required with cache.
+        sharded (ShardedPredictor, optional): Classify by worker processes instead of the model, cache is not used.
+
+    Returns:
+        tuple: (number of detections, number of images, number of images which failed to load)
+    """
+    paths = list_images(directory)
+    format_ = os_path.splitext(output_path)[1].lower().lstrip('.')
+    meter = ProgressMeter(len(paths))
+    num_of_detections = 0
+    num_of_errors = 0
+    normalize = batch_preprocessor(model, model_is_default)
+    with open(output_path, 'w', newline='', encoding='utf-8') as file:
+        writer = ResultWriter(file, format_)
+        if sharded is not None:
+            # worker processes return results in file order as well
+            results = sharded.predict_paths(paths)
+        else:
+            results = predict_batches(compiled_predictor(model), paths, load_image,
+                                      batch_size=batch_size, workers=workers,
+                                      cache=cache, model_fingerprint=fingerprint,
+                                      preprocess_batch=normalize)
+        for start_idx, outputs in results:
+            for offset, output in enumerate(outputs):
+                writer.write(os_path.relpath(paths[start_idx + offset], directory), output)
+                if np_isnan(output).any():
+                    num_of_errors += 1
+                elif np_argmax(output) == 1:
+                    num_of_detections += 1
+            writer.flush()
+            meter.update(len(outputs))
+            print(f"\r{meter.done} / {meter.total}  |  {meter.summary()}", end="", file=stderr)
+    print(file=stderr)
+    if cache is not None:
+        cache.flush()
+    return num_of_detections, len(paths), num_of_errors
+
+
+def watch_directory(model, index, output_path, model_is_default=True, batch_size=32, workers=DEFAULT_WORKERS,
+                    cache=None, fingerprint=None, interval=2.0, stop_event=None):
+    """
+    Classify images which appear in the directory of the index and append results to the file.
+
+    Args:
+        model: Loaded model.
+        index (FolderIndex): Index of the directory, images it holds already are not classified.
+        output_path (str): Path to '.csv' or '.jsonl' file, header is written only to new file.
+        interval (float, optional): Seconds between scans. Defaults to 2.
+        stop_event (threading.Event, optional): Stops watching, without it runs until interrupted.
+        Rest as in classify_directory.
+    """
+    format_ = os_path.splitext(output_path)[1].lower().lstrip('.')
+    normalize = batch_preprocessor(model, model_is_default)
+    with open(output_path, 'a', newline='', encoding='utf-8') as file:
+        writer = ResultWriter(file, format_, header=file.tell() == 0)
+
+        def on_batch(names, outputs, seconds_per_image):
+            for name, output in zip(names, outputs):
+                writer.write(name, output)
+                print(f"{name}: {'ERROR' if np_isnan(output).any() else int(np_argmax(output) == 1)}", file=stderr)
+            writer.flush()
+
+        watch_folder(compiled_predictor(model), index, load_image, on_batch, normalize, batch_size, interval,
+                     stop_event, workers=workers, cache=cache, model_fingerprint=fingerprint)
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Classify MRI scans of a directory tree without GUI.")
+    parser.add_argument("directory", help="directory with images, searched recursively")
+    parser.add_argument("-o", "--output", required=True, help="output file, '.csv' or '.jsonl'")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL_PATH,
+                        help="'.h5', '.keras' or '.tflite' model; models other than default use "
+                             "custom_preprocessing from script/preprocess_input_custom.py")
+    parser.add_argument("-b", "--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="threads decoding images")
+    parser.add_argument("--no-cache", action="store_true", help="classify every image, ignore result cache")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="keep watching the directory, scan it every SECONDS and append new images")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="worker processes, each loads the model; result cache is not used with more than 1")
+    parser.add_argument("--trace", metavar="PATH", help="time every stage and write Chrome trace to PATH")
+    args = parser.parse_args(argv)
+    if args.trace:
+        tracer.enabled = True
+
+    model_is_default = os_path.abspath(args.model) == os_path.abspath(DEFAULT_MODEL_PATH)
+    load_start = time()
+    sharded = None
+    if args.processes > 1:
+        sharded = ShardedPredictor(args.model, args.processes, model_is_default, args.batch_size)
+    # with worker processes, model is loaded in this process only for watching
+    model = registry.get(args.model) if sharded is None or args.watch is not None else None
+    print(f"Model loading time: {time() - load_start}", file=stderr)
+    cache, fingerprint = None, None
+    if not args.no_cache and sharded is None:
+        cache, fingerprint = get_result_cache(), model_fingerprint(args.model, model_is_default)
+    if args.watch is not None:
+        # images present now are classified below, later ones by the watch
+        index = FolderIndex(args.directory, recursive=True)
+        index.scan(require_stable=False)
+    run_start = time()
+    detections, total, errors = classify_directory(model, args.directory, args.output, model_is_default,
+                                                   args.batch_size, args.workers, cache, fingerprint, sharded)
+    if sharded is not None:
+        sharded.close()
+    print(f"Detected: {detections} / {total}, failed to load: {errors}, "
+          f"classification time: {time() - run_start}", file=stderr)
+    if cache is not None:
+        print(f"Result cache: {cache.stats()}", file=stderr)
+    if args.trace:
+        print(tracer.report(), file=stderr)
+        print(f"Stage trace written to {tracer.export_chrome_trace(args.trace)}", file=stderr)
+    if args.watch is not None:
+        print(f"Watching {args.directory}, press Ctrl+C to stop.", file=stderr)
+        try:
+            watch_directory(model, index, args.output, model_is_default, args.batch_size, args.workers,
+                            cache, fingerprint, args.watch)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    print(f"Library loading time: {end-start}", file=stderr)
+    raise SystemExit(main())
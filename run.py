@@ -3,13 +3,18 @@ start = time()
 import settings
 from PyQt5.QtWidgets import QApplication
 from app.MainWindow import MainWindow
+from script.warmup import record_timing
+from script.StageTracer import tracer
 end = time()
-print(f"Library loading time: {end-start}")
+record_timing("library_loading", end-start)
 
 
 if __name__ == "__main__":
     app = QApplication([])
     main_window = MainWindow()
     end2 = time()
-    print(f"Application startup time: {end2-end}")
+    record_timing("application_startup", end2-end)
     app.exec_()
+    if tracer.enabled:
+        # STAGE_TRACE=1 - spans recorded since the last folder run was started
+        print(f"Stage trace written to {tracer.export_chrome_trace()}")
@@ -0,0 +1,76 @@
+from sys import modules as sys_modules
+from threading import Lock
+from weakref import WeakKeyDictionary, ref as weakref
+from numpy import asarray as np_asarray
+### modules lazy-loaded
+# from tensorflow import function as tf_function, TensorSpec
+
+
+class CompiledPredictor():
+    def __init__(self, model):
+        """
+        Forward pass of Keras model as tf.function, traced once per input shape and reused.
+        Unlike model.predict, no data adapter and prediction loop are built on every call,
+        which dominates latency of single image.
+
+        Args:
+            model: Keras model.
+        """
+        # weak reference - predictor is kept per model and must not keep evicted models alive
+        self._model = weakref(model)
+        # dimensions the model leaves open (e.g. image size of servable model) stay open in traced signature,
+        # so images of any size are run by one trace
+        inputs = getattr(model, "inputs", None)
+        self._open_dims = tuple(dim is None for dim in inputs[0].shape[1:]) if inputs else ()
+        # (image shape, dtype) -> tf.function with dynamic batch dimension
+        self._functions = {}
+        self._lock = Lock()
+
+    def _function(self, shape, dtype):
+        shape = tuple(shape[1:])
+        if len(self._open_dims) == len(shape):
+            shape = tuple(None if open_ else dim for dim, open_ in zip(shape, self._open_dims))
+        key = (shape, str(dtype))
+        with self._lock:
+            if key not in self._functions:
+                # lazy-loading
+                from tensorflow import function as tf_function, TensorSpec
+                self._functions[key] = tf_function(lambda images: self._model()(images, training=False),
+                                                   input_signature=[TensorSpec(shape=(None, *shape), dtype=dtype)])
+            return self._functions[key]
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        """
+        Args:
+            batch (np.ndarray): Preprocessed images, shape (N, 224, 224, 3), or raw uint8 images for servable model.
+            batch_size, verbose: Accepted for compatibility with keras predict, ignored.
+
+        Returns:
+            np.ndarray: Outputs of the model, shape (N, classes).
+        """
+        batch = np_asarray(batch)
+        return self._function(batch.shape, batch.dtype)(batch).numpy()
+
+
+_predictors = WeakKeyDictionary()
+_predictors_lock = Lock()
+
+
+def compiled_predictor(model):
+    """
+    Compiled predictor of the model, shared by all callers, so the graph is traced once per model.
+
+    Args:
+        model: Keras model. Other models (e.g. TFLiteModel) are returned unchanged.
+
+    Returns:
+        Object with predict method, as keras model.
+    """
+    # model can be a Keras model only if keras was imported already
+    keras = sys_modules.get("keras")
+    if keras is None or not isinstance(model, keras.Model):
+        return model
+    with _predictors_lock:
+        if model not in _predictors:
+            _predictors[model] = CompiledPredictor(model)
+        return _predictors[model]
@@ -0,0 +1,111 @@
+# qt-free ensemble of models sharing decoded and resized images
+from hashlib import blake2b
+from numpy import (
+    empty as np_empty,
+    asarray as np_asarray,
+    concatenate as np_concatenate,
+    average as np_average,
+    uint8 as np_uint8,
+    float32 as np_float32
+)
+from script.preprocessing import preprocess_batch, is_servable, INPUT_SHAPE
+from script.CompiledPredictor import compiled_predictor
+### modules lazy-loaded
+# from script.ResultCache import model_fingerprint
+
+
+class Ensemble():
+    def __init__(self, members, weights=None):
+        """
+        Several models classifying the same batches. Images are decoded and resized once, stacked
+        into a shared uint8 buffer, and each preprocessing (default or custom) runs once per batch
+        for all models which use it. Exposes predict like a Keras model, so it is used by
+        predict_batches with stack as its preprocess_batch.
+
+        Args:
+            members (Sequence[tuple]): (name, model, model_is_default, path to the model file or None).
+            weights (Sequence[float], optional): Weight of every model in combined result. Defaults to equal weights.
+        """
+        if not members:
+            raise ValueError("Ensemble needs at least one model")
+        self.members = list(members)
+        self.weights = weights
+        # resized images of the batch, shared by all preprocessings
+        self._images = None
+        # preprocessed batch, reused by every preprocessing in turn
+        self._buffer = None
+
+    @property
+    def names(self):
+        return [name for name, *_ in self.members]
+
+    def stack(self, images, out=None):
+        """
+        Stack resized images into shared uint8 buffer, without preprocessing.
+        Signature of preprocess_batch, 'out' float32 buffer of predict_batches is not needed.
+
+        Returns:
+            ndarray: uint8 batch with shape (N, 224, 224, 3).
+        """
+        if self._images is None or len(self._images) < len(images):
+            self._images = np_empty((len(images), *INPUT_SHAPE, 3), dtype=np_uint8)
+        batch = self._images[:len(images)]
+        for idx, image in enumerate(images):
+            batch[idx] = image
+        return batch
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        """
+        Args:
+            batch (ndarray): Resized uint8 images returned by stack.
+            batch_size, verbose: Accepted for compatibility with keras predict, ignored.
+
+        Returns:
+            ndarray: Outputs of every model followed by combined outputs,
+                shape (N, classes * (models + 1)), see split_outputs.
+        """
+        if self._buffer is None or len(self._buffer) < len(batch):
+            self._buffer = np_empty((len(batch), *INPUT_SHAPE, 3), dtype=np_float32)
+        outputs = [None] * len(self.members)
+        for idx, (_, model, _, _) in enumerate(self.members):
+            if is_servable(model):
+                # model normalizes in its graph, shared uint8 batch is fed directly
+                outputs[idx] = np_asarray(compiled_predictor(model).predict(batch), dtype=np_float32)
+        for model_is_default in dict.fromkeys(flag for idx, (_, _, flag, _) in enumerate(self.members) if outputs[idx] is None):
+            # one preprocessing per batch for all models which share it
+            preprocessed = preprocess_batch(batch, model_is_default, out=self._buffer)
+            for idx, (_, model, flag, _) in enumerate(self.members):
+                if outputs[idx] is None and flag == model_is_default:
+                    outputs[idx] = np_asarray(compiled_predictor(model).predict(preprocessed), dtype=np_float32)
+        combined = np_average(outputs, axis=0, weights=self.weights).astype(np_float32)
+        return np_concatenate([*outputs, combined], axis=1)
+
+    def fingerprint(self):
+        """Fingerprint of all models and their preprocessings, for the result cache. None if a model has no file."""
+        # lazy-loading
+        from script.ResultCache import model_fingerprint
+        if any(path is None for *_, path in self.members):
+            return None
+        digest = blake2b(digest_size=20)
+        for _, _, model_is_default, path in self.members:
+            digest.update(model_fingerprint(path, model_is_default).encode())
+        digest.update(repr(self.weights).encode())
+        return digest.hexdigest()
+
+
+def split_outputs(outputs, num_members):
+    """
+    Split outputs of Ensemble.predict.
+
+    Args:
+        outputs (ndarray): Outputs with shape (N, classes * (num_members + 1)).
+        num_members (int): Number of models of the ensemble.
+
+    Returns:
+        tuple: (combined outputs with shape (N, classes), tumor probability of every model with shape (N, num_members))
+    """
+    outputs = np_asarray(outputs)
+    num_of_classes = outputs.shape[1] // (num_members + 1)
+    combined = outputs[:, -num_of_classes:]
+    members = outputs[:, 1:num_of_classes * num_members:num_of_classes]
+    return combined, members
@@ -1,3 +1,5 @@
+from threading import Lock
+from weakref import WeakKeyDictionary
 from cv2 import (
     imread as cv2_imread,
     cvtColor as cv2_cvtColor,
@@ -10,16 +12,31 @@ from cv2 import (
 from numpy import (
     expand_dims as np_expand_dims,
     uint8 as np_uint8,
-    dot as np_dot,
-    maximum as np_maximum,
-    max as np_max
+    int32 as np_int32,
+    full as np_full,
+    asarray as np_asarray,
+    ndim as np_ndim
 )
 from tensorflow.keras.models import Model
 from tensorflow.keras.applications.efficientnet import preprocess_input
-from tensorflow.keras.layers import Conv2D, SeparableConv2D
+from tensorflow.keras.layers import Conv2D, SeparableConv2D, Dense
 from keras.activations import softmax as keras_activations_softmax
-from tensorflow import GradientTape as tf_GradientTape
-from tensorflow import reduce_mean as tf_reduce_mean
+from tensorflow import (
+    GradientTape as tf_GradientTape,
+    TensorSpec as tf_TensorSpec,
+    function as tf_function,
+    reduce_mean as tf_reduce_mean,
+    reduce_max as tf_reduce_max,
+    gather as tf_gather,
+    argmax as tf_argmax,
+    einsum as tf_einsum,
+    matmul as tf_matmul,
+    int32 as tf_int32
+)
+from tensorflow.nn import relu as tf_relu, softmax as tf_softmax
+from tensorflow.math import divide_no_nan as tf_divide_no_nan
+from script.StageTracer import tracer, GRAD_CAM, OVERLAY
+from script.servable import split_servable
 
 class GradCAM():
     def __init__(self, model):
@@ -27,11 +44,25 @@ class GradCAM():
         Computes the Grad-CAM heatmap and overlays it on the original image.
 
         Args:
-            model: Keras model to classify image
+            model: Keras model to classify image. Servable model (script/servable.py) takes raw uint8
+                images, its preprocessing runs before the taped pass of the wrapped model.
         """
-        self.model = model
+        self.preprocessing, self.model = split_servable(model)
         self.last_conv_layer_name = self._find_last_conv_layer_name()
-        self._disable_softmax()
+        # gradient model and compiled heatmap function are built once per instance
+        self.grad_model = self._build_grad_model()
+        input_shape = tuple(model.inputs[0].shape[1:])
+        # servable model takes raw uint8 images
+        self.input_dtype = 'float32' if self.preprocessing is None else 'uint8'
+        images_spec = tf_TensorSpec(shape=(None, *input_shape), dtype=self.input_dtype)
+        self._compiled_heatmaps = tf_function(
+            self._compute_heatmaps,
+            input_signature=[images_spec, tf_TensorSpec(shape=(None,), dtype=tf_int32)]
+        )
+        self._compiled_predict_with_heatmaps = tf_function(
+            lambda images: self._compute_heatmaps(images),
+            input_signature=[images_spec]
+        )
 
     def _find_last_conv_layer_name(self):
         """
@@ -53,10 +84,60 @@ class GradCAM():
         """Load the model from a file."""
         return load_model(self.model_path)
 
-    def _disable_softmax(self):
-        """Disable the softmax activation in the last layer."""
-        if hasattr(self.model.layers[-1], "activation") and self.model.layers[-1].activation == keras_activations_softmax:
-            self.model.layers[-1].activation = None
+    def _build_grad_model(self):
+        """
+        Build model returning activations of the last conv layer and class scores. Scores are taken
+        before softmax of the last dense layer. Model passed to GradCAM is not modified, because the
+        same instance is shared with other pages.
+
+        Returns:
+            keras.Model: Model with outputs [conv activations, scores].
+        """
+        last_layer = self.model.layers[-1]
+        if isinstance(last_layer, Dense) and last_layer.activation == keras_activations_softmax:
+            # logits are computed from inputs of the last layer in _compute_heatmaps
+            self.logits_layer = last_layer
+            scores = last_layer.input
+        else:
+            self.logits_layer = None
+            scores = self.model.output
+        return Model(
+            inputs=self.model.inputs,
+            outputs=[self.model.get_layer(self.last_conv_layer_name).output, scores]
+        )
+
+    def _compute_heatmaps(self, images, class_indices=None):
+        """
+        Body of the compiled functions: one taped forward pass gives class probabilities and heatmaps.
+
+        Args:
+            images (tf.Tensor): Batch of preprocessed images, float32.
+            class_indices (tf.Tensor, optional): Class index for every image of the batch, int32.
+                Defaults to the predicted class of every image.
+
+        Returns:
+            tuple: (normalized heatmaps with shape (N, h, w), class probabilities with shape (N, classes),
+                class indices used for heatmaps with shape (N,))
+        """
+        if self.preprocessing is not None:
+            images = self.preprocessing(images, training=False)
+        with tf_GradientTape() as tape:
+            conv_outputs, scores = self.grad_model(images, training=False)
+            if self.logits_layer is not None:
+                scores = tf_matmul(scores, self.logits_layer.kernel)
+                if self.logits_layer.use_bias:
+                    scores = scores + self.logits_layer.bias
+            if class_indices is None:
+                class_indices = tf_argmax(scores, axis=1, output_type=tf_int32)
+            loss = tf_gather(scores, class_indices, batch_dims=1)
+        # images of the batch are independent, so gradient of summed loss holds gradient of every image
+        grads = tape.gradient(loss, conv_outputs)
+        pooled_grads = tf_reduce_mean(grads, axis=(1, 2))
+        heatmaps = tf_relu(tf_einsum('nhwc,nc->nhw', conv_outputs, pooled_grads))
+        # normalization, heatmaps without activations stay zero
+        heatmaps = tf_divide_no_nan(heatmaps, tf_reduce_max(heatmaps, axis=(1, 2), keepdims=True))
+        probabilities = tf_softmax(scores) if self.logits_layer is not None else scores
+        return heatmaps, probabilities, class_indices
 
     def preprocess_image(self, image_path, target_size=(224, 224)):
         """
@@ -86,28 +167,41 @@ class GradCAM():
         Returns:
             np.ndarray: Normalized heatmap.
         """
-        grad_model = Model(
-            inputs=self.model.input,
-            outputs=[
-                self.model.get_layer(self.last_conv_layer_name).output,
-                self.model.output
-            ]
-        )
-        
-        with tf_GradientTape() as tape:
-            conv_outputs, predictions = grad_model(image)
-            loss = predictions[:, class_index]
+        return self.generate_heatmaps(image, class_index)[0]
 
-        grads = tape.gradient(loss, conv_outputs)
-        pooled_grads = tf_reduce_mean(grads, axis=(0, 1, 2))
+    def generate_heatmaps(self, images, class_indices):
+        """
+        Generate Grad-CAM heatmaps for a batch of images in one pass of the compiled function.
+
+        Args:
+            images (np.ndarray): Images preprocessed for the model, shape (N, 224, 224, 3),
+                or raw uint8 images for servable model.
+            class_indices (int or Sequence[int]): Class index for every image, or one for all of them.
 
-        conv_outputs = conv_outputs[0]
-        heatmap = np_dot(conv_outputs, pooled_grads.numpy())
-        heatmap = np_maximum(heatmap, 0)  # ReLU
-        if np_max(heatmap) > 0:
-            heatmap /= np_max(heatmap)  # Normalization
+        Returns:
+            np.ndarray: Normalized heatmaps with shape (N, h, w).
+        """
+        images = np_asarray(images, dtype=self.input_dtype)
+        if np_ndim(class_indices) == 0:
+            class_indices = np_full(len(images), class_indices, dtype=np_int32)
+        with tracer.span(GRAD_CAM, images=len(images)):
+            heatmaps, _, _ = self._compiled_heatmaps(images, np_asarray(class_indices, dtype=np_int32))
+            return heatmaps.numpy()
+
+    def predict_with_heatmap(self, images):
+        """
+        Classify images and generate Grad-CAM heatmaps of predicted classes in one forward pass.
+
+        Args:
+            images (np.ndarray): Images preprocessed for the model, shape (N, 224, 224, 3).
 
-        return heatmap
+        Returns:
+            tuple: (class probabilities with shape (N, classes), predicted class indices with shape (N,),
+                normalized heatmaps with shape (N, h, w))
+        """
+        with tracer.span(GRAD_CAM, images=len(images)):
+            heatmaps, probabilities, class_indices = self._compiled_predict_with_heatmaps(np_asarray(images, dtype=self.input_dtype))
+            return probabilities.numpy(), class_indices.numpy(), heatmaps.numpy()
 
     def overlay_heatmap(self, heatmap, original_image_path, alpha=0.4, colormap=cv2_COLORMAP_JET):
         """
@@ -122,16 +216,31 @@ class GradCAM():
         Returns:
             np.ndarray: Image with the heatmap overlay.
         """
-        original_image = cv2_imread(original_image_path)
-        original_image = cv2_cvtColor(original_image, cv2_COLOR_BGR2RGB)
+        return self.overlay_heatmap_on_image(heatmap, cv2_imread(original_image_path), alpha, colormap)
 
-        heatmap_resized = cv2_resize(heatmap, (original_image.shape[1], original_image.shape[0]))
-        heatmap_resized = 1 - heatmap_resized
-        heatmap_resized = np_uint8(255 * heatmap_resized)
-        heatmap_colored = cv2_applyColorMap(heatmap_resized, colormap)
+    def overlay_heatmap_on_image(self, heatmap, original_image, alpha=0.4, colormap=cv2_COLORMAP_JET):
+        """
+        Overlay the heatmap on already decoded image, so the file is not read again.
 
-        overlayed_image = cv2_addWeighted(original_image, 1 - alpha, heatmap_colored, alpha, 0)
-        return overlayed_image
+        Args:
+            heatmap (np.ndarray): Grad-CAM heatmap.
+            original_image (np.ndarray): Image as returned by cv2.imread (BGR).
+            alpha (float): Transparency coefficient for the heatmap.
+            colormap (int): Colormap for the heatmap.
+
+        Returns:
+            np.ndarray: Image with the heatmap overlay (RGB).
+        """
+        with tracer.span(OVERLAY):
+            original_image = cv2_cvtColor(original_image, cv2_COLOR_BGR2RGB)
+
+            heatmap_resized = cv2_resize(heatmap, (original_image.shape[1], original_image.shape[0]))
+            heatmap_resized = 1 - heatmap_resized
+            heatmap_resized = np_uint8(255 * heatmap_resized)
+            heatmap_colored = cv2_applyColorMap(heatmap_resized, colormap)
+
+            overlayed_image = cv2_addWeighted(original_image, 1 - alpha, heatmap_colored, alpha, 0)
+            return overlayed_image
 
     def create_gradcam_image(self, image_path, class_index=1):
         """
@@ -148,3 +257,21 @@ class GradCAM():
         overlayed_image = self.overlay_heatmap(heatmap, image_path)
         return overlayed_image
 
+
+_grad_cams = WeakKeyDictionary()
+_grad_cams_lock = Lock()
+
+
+def shared_grad_cam(model):
+    """
+    Grad-CAM of the model shared by all callers, so gradient model is built and traced once per model
+    (e.g. by the warm-up, before the first click of the user).
+
+    Raises:
+        Exception: Grad-CAM cannot be built for the model.
+    """
+    # building happens under the lock, warm-up thread and page ask for the same instance
+    with _grad_cams_lock:
+        if model not in _grad_cams:
+            _grad_cams[model] = GradCAM(model)
+        return _grad_cams[model]
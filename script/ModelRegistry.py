@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from threading import RLock
+from os import (
+    environ,
+    stat as os_stat,
+    path as os_path
+)
+### modules lazy-loaded
+# from keras.models import load_model
+# from script.servable import CUSTOM_OBJECTS
+# from script.TFLiteModel import TFLiteModel
+
+
+DEFAULT_MODEL_PATH = "models/EfficientNet.keras"
+
+
+def load_model_file(path):
+    """Default loader of the registry - loads '.h5' or '.keras' file without compiling, or '.tflite' file."""
+    if path.lower().endswith('.tflite'):
+        # lazy-loading
+        from script.TFLiteModel import TFLiteModel
+        return TFLiteModel(model_path=path)
+    # lazy-loading
+    from keras.models import load_model
+    # layers of servable models (preprocessing in the graph)
+    from script.servable import CUSTOM_OBJECTS
+    return load_model(path, compile=False, custom_objects=CUSTOM_OBJECTS)
+
+
+def estimate_model_memory(model):
+    """
+    Estimate memory held by weights of the model.
+
+    Args:
+        model: Keras model, or any object with 'memory_bytes' attribute.
+
+    Returns:
+        int: Size of the weights in bytes.
+    """
+    if hasattr(model, "memory_bytes"):
+        return int(model.memory_bytes)
+    # lazy-loading
+    from numpy import dtype as np_dtype, prod as np_prod
+    total = 0
+    for weight in getattr(model, "weights", []):
+        dtype = getattr(weight.dtype, "as_numpy_dtype", weight.dtype)
+        total += int(np_prod(weight.shape)) * np_dtype(dtype).itemsize
+    return total
+
+
+class ModelRegistry():
+    def __init__(self, memory_budget=None):
+        """
+        Process-wide cache of loaded models. Model file is loaded once and the same instance is
+        handed to every page. Models are keyed by (path, mtime, size), so a replaced file is loaded again.
+        Least recently used models are evicted when their weights exceed the memory budget.
+
+        Args:
+            memory_budget (int, optional): Budget in bytes. Defaults to MODEL_MEMORY_BUDGET_MB environment variable or 2048 MB.
+        """
+        if memory_budget is None:
+            memory_budget = int(environ.get("MODEL_MEMORY_BUDGET_MB", 2048)) * 1024 ** 2
+        self.memory_budget = memory_budget
+        # key -> (model, bytes), ordered from least to most recently used
+        self._models = OrderedDict()
+        self._lock = RLock()
+
+    @staticmethod
+    def model_key(path):
+        """Identity of the model file: (absolute path, modification time, size)."""
+        stat = os_stat(path)
+        return (os_path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def get(self, path, loader=load_model_file):
+        """
+        Return model stored in the file, loading it only if it is not in the registry yet.
+
+        Args:
+            path (str): Path to the model file.
+            loader (callable, optional): Takes path, returns model. Defaults to load_model_file.
+
+        Returns:
+            Loaded model, shared by all callers.
+        """
+        key = self.model_key(path)
+        # loading happens under the lock, so two pages asking at once load the file only once
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            model = loader(path)
+            # file was replaced on disk - drop outdated version
+            for old_key in [k for k in self._models if k[0] == key[0]]:
+                del self._models[old_key]
+            self._models[key] = (model, estimate_model_memory(model))
+            self._evict()
+            return model
+
+    def _evict(self):
+        """Remove least recently used models until weights fit into budget. Latest model always stays."""
+        while len(self._models) > 1 and self.memory_usage() > self.memory_budget:
+            self._models.popitem(last=False)
+
+    def memory_usage(self):
+        """Total size of weights of the models in the registry, in bytes."""
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def summary(self):
+        """
+        Returns:
+            list[tuple]: (path, size in bytes) of every model, from least to most recently used.
+        """
+        with self._lock:
+            return [(key[0], size) for key, (_, size) in self._models.items()]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+# shared by every detection page
+registry = ModelRegistry()
@@ -0,0 +1,175 @@
+from sqlite3 import connect as sqlite_connect
+from hashlib import blake2b
+from functools import lru_cache
+from threading import Lock
+from time import time
+from os import (
+    environ,
+    makedirs,
+    path as os_path
+)
+from numpy import (
+    frombuffer as np_frombuffer,
+    asarray as np_asarray,
+    float32 as np_float32
+)
+from script.ModelRegistry import ModelRegistry
+
+
+SCRIPT_DIR = os_path.dirname(os_path.abspath(__file__))
+# files which define preprocessing - editing them invalidates cached results
+PREPROCESSING_SOURCES = {
+    True: os_path.join(SCRIPT_DIR, "preprocessing.py"),
+    False: os_path.join(SCRIPT_DIR, "preprocess_input_custom.py"),
+}
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Hex digest of the file content."""
+    digest = blake2b(digest_size=20)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=32)
+def _fingerprint(model_key, model_is_default):
+    """Fingerprint is computed once per version of the model file (key holds mtime and size)."""
+    digest = blake2b(digest_size=20)
+    digest.update(hash_file(model_key[0]).encode())
+    digest.update(hash_file(PREPROCESSING_SOURCES[bool(model_is_default)]).encode())
+    return digest.hexdigest()
+
+
+def model_fingerprint(model_path, model_is_default=True):
+    """
+    Fingerprint of the model file and the preprocessing function used with it.
+
+    Args:
+        model_path (str): Path to '.h5', '.keras' or '.tflite' file.
+        model_is_default (bool, optional): Flag for preprocessing, as in BaseDetection. Defaults to True.
+
+    Returns:
+        str: Hex digest.
+    """
+    return _fingerprint(ModelRegistry.model_key(model_path), bool(model_is_default))
+
+
+class ResultCache():
+    def __init__(self, path=None, max_entries=None):
+        """
+        On-disk cache of model outputs, keyed by hash of the image file and fingerprint of the model.
+        When number of entries exceeds max_entries, least recently used entries are removed.
+
+        Args:
+            path (str, optional): SQLite file. Defaults to RESULT_CACHE_PATH environment variable or 'cache/results.sqlite'.
+            max_entries (int, optional): Defaults to RESULT_CACHE_MAX_ENTRIES environment variable or 200000.
+        """
+        if path is None:
+            path = environ.get("RESULT_CACHE_PATH", "cache/results.sqlite")
+        if max_entries is None:
+            max_entries = int(environ.get("RESULT_CACHE_MAX_ENTRIES", 200000))
+        if path != ":memory:" and os_path.dirname(path):
+            makedirs(os_path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        # one connection shared by detection threads, access is serialized by the lock
+        self._connection = sqlite_connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS results (
+                                        image_hash TEXT NOT NULL,
+                                        model_fingerprint TEXT NOT NULL,
+                                        outputs BLOB NOT NULL,
+                                        last_access REAL NOT NULL,
+                                        PRIMARY KEY (image_hash, model_fingerprint))""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        self._connection.commit()
+
+    def get(self, image_hash, model_fingerprint):
+        """
+        Returns:
+            ndarray or None: Cached outputs of the model (float32), None on miss.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT outputs FROM results WHERE image_hash = ? AND model_fingerprint = ?",
+                (image_hash, model_fingerprint)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # committed with next put_many or flush
+            self._connection.execute(
+                "UPDATE results SET last_access = ? WHERE image_hash = ? AND model_fingerprint = ?",
+                (time(), image_hash, model_fingerprint))
+            return np_frombuffer(row[0], dtype=np_float32).copy()
+
+    def put_many(self, items, model_fingerprint):
+        """
+        Args:
+            items (Iterable[tuple]): (image hash, outputs of the model for the image).
+            model_fingerprint (str): Fingerprint of the model which produced outputs.
+        """
+        now = time()
+        rows = [(image_hash, model_fingerprint, np_asarray(outputs, dtype=np_float32).tobytes(), now)
+                for image_hash, outputs in items]
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+            self._evict()
+            self._connection.commit()
+
+    def put(self, image_hash, model_fingerprint, outputs):
+        self.put_many([(image_hash, outputs)], model_fingerprint)
+
+    def _evict(self):
+        """Remove least recently used entries above max_entries. Called under the lock."""
+        excess = self._count() - self.max_entries
+        if excess > 0:
+            self._connection.execute(
+                "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY last_access LIMIT ?)",
+                (excess,))
+
+    def _count(self):
+        return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
+
+    def flush(self):
+        """Commit pending updates of access time."""
+        with self._lock:
+            self._connection.commit()
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, hit_rate and number of entries.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "entries": self._count()}
+
+    def close(self):
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+
+_result_cache = None
+_result_cache_lock = Lock()
+
+
+def get_result_cache():
+    """Cache shared by the whole process, opened on first use."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
@@ -0,0 +1,46 @@
+from csv import writer as csv_writer
+from json import dumps as json_dumps
+from numpy import (
+    argmax as np_argmax,
+    isnan as np_isnan
+)
+
+
+class ResultWriter():
+    def __init__(self, file, format_, header=True):
+        """
+        Writes one row per image, flushed after every batch.
+
+        Args:
+            file: Opened text file.
+            format_ (str): 'csv' or 'jsonl'.
+            header (bool, optional): Write header of csv file. False when appending to existing file.
+        """
+        self.file = file
+        self.format_ = format_
+        if format_ == 'csv':
+            self.writer = csv_writer(file)
+            if header:
+                # same columns as csv exported from the gui
+                self.writer.writerow(["File Name", "Detection Result", "Tumor Probability"])
+        elif format_ != 'jsonl':
+            raise ValueError(f"Unsupported output format: {format_}")
+
+    def write(self, filename, output):
+        """
+        Args:
+            filename (str): Name of the image, relative to classified directory.
+            output (ndarray): Output of the model for the image, NaN if image was not loaded.
+        """
+        failed = bool(np_isnan(output).any())
+        detected = None if failed else int(np_argmax(output) == 1)
+        probability = None if failed else float(output[1])
+        if self.format_ == 'csv':
+            self.writer.writerow([filename, "N/A" if failed else detected, "" if failed else f"{probability:.6f}"])
+        else:
+            result = "ERROR" if failed else "DETECTED" if detected else "No Tumor"
+            self.file.write(json_dumps({"file": filename, "result": result,
+                                        "detected": detected, "probability": probability}) + "\n")
+
+    def flush(self):
+        self.file.flush()
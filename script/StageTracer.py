@@ -0,0 +1,186 @@
+from collections import deque
+from threading import Lock, get_ident, current_thread
+from time import perf_counter_ns
+from json import dump as json_dump
+from os import (
+    environ,
+    getpid,
+    makedirs,
+    path as os_path
+)
+
+
+# stage names used across the application, in order of the pipeline
+DISK = "disk"                       # reading file for the result cache (hash)
+IMREAD = "imread"                   # cv2.imread - disk read and decoding
+RESIZE = "resize"
+WAIT = "wait_for_images"            # consumer waits for loading threads
+PREPROCESS = "preprocess_input"
+PREDICT = "predict"
+GRAD_CAM = "grad_cam"
+OVERLAY = "overlay"
+DISPLAY = "display"                 # QImage/QPixmap of shown image
+TABLE_UPDATE = "table_update"       # results written into Qt table model
+
+
+class _Span():
+    """Timed block of one stage, recorded by the tracer when the block ends."""
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, self.start, perf_counter_ns() - self.start, self.args)
+        return False
+
+
+class _NullSpan():
+    """Span of disabled tracer - nothing is measured nor stored."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class StageTracer():
+    def __init__(self, enabled=None, max_events=200000):
+        """
+        Per-stage timing of the hot path (decoding, preprocessing, forward pass, table updates).
+        Disabled tracer returns one shared no-op span, so instrumented code pays only for a method call.
+        Enabled tracer keeps totals of every stage and the last max_events spans for the Chrome trace.
+
+        Args:
+            enabled (bool, optional): Defaults to STAGE_TRACE environment variable ('1' enables).
+            max_events (int, optional): Number of newest spans kept for export. Defaults to 200000.
+        """
+        if enabled is None:
+            enabled = environ.get("STAGE_TRACE", "0") == "1"
+        self.enabled = enabled
+        self._lock = Lock()
+        self._events = deque(maxlen=max_events)
+        # stage -> [count, total ns]
+        self._totals = {}
+        self._threads = {}
+        self._origin = perf_counter_ns()
+
+    def span(self, name, **args):
+        """
+        Context manager timing the block as the stage.
+
+        Args:
+            name (str): Stage, e.g. PREDICT.
+            **args: Details shown with the span in the trace viewer, e.g. batch size.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def record(self, name, start, duration, args=None):
+        """Store finished span. start is perf_counter_ns() at the beginning of the block, duration in ns."""
+        thread_id = get_ident()
+        with self._lock:
+            self._events.append((name, thread_id, start, duration, args or None))
+            totals = self._totals.get(name)
+            if totals is None:
+                self._totals[name] = [1, duration]
+            else:
+                totals[0] += 1
+                totals[1] += duration
+            if thread_id not in self._threads:
+                self._threads[thread_id] = current_thread().name
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self._totals.clear()
+            self._threads.clear()
+            self._origin = perf_counter_ns()
+
+    def summary(self):
+        """
+        Returns:
+            list[tuple]: (stage, number of spans, total seconds, mean seconds), the slowest stage first.
+        """
+        with self._lock:
+            totals = [(name, count, total / 1e9, total / count / 1e9) for name, (count, total) in self._totals.items()]
+        return sorted(totals, key=lambda stage: stage[2], reverse=True)
+
+    def breakdown(self, limit=4):
+        """
+        Share of every stage in time spent by all stages, e.g. 'predict 61% · imread 24% · resize 8%'.
+        Stages run by loading threads overlap with the forward pass, so shares describe work, not wall time.
+
+        Args:
+            limit (int, optional): Number of slowest stages shown. Defaults to 4.
+
+        Returns:
+            str: Breakdown, empty when nothing was recorded.
+        """
+        summary = self.summary()
+        total = sum(seconds for _, _, seconds, _ in summary)
+        if total <= 0:
+            return ""
+        return " · ".join(f"{name} {seconds / total:.0%}" for name, _, seconds, _ in summary[:limit])
+
+    def report(self):
+        """Multi-line table of stages - count, total and mean time."""
+        lines = [f"{'stage':<18}{'count':>8}{'total s':>10}{'mean ms':>10}"]
+        lines += [f"{name:<18}{count:>8}{total:>10.3f}{mean * 1000:>10.2f}" for name, count, total, mean in self.summary()]
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """
+        Spans in Chrome trace event format, opened by chrome://tracing or https://ui.perfetto.dev.
+
+        Returns:
+            dict: {'traceEvents': [...], 'displayTimeUnit': 'ms'}
+        """
+        pid = getpid()
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+            origin = self._origin
+        trace_events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": name}}
+                        for thread_id, name in threads.items()]
+        for name, thread_id, start, duration, args in events:
+            event = {"name": name, "cat": "stage", "ph": "X", "pid": pid, "tid": thread_id,
+                     "ts": (start - origin) / 1000, "dur": duration / 1000}
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path=None):
+        """
+        Write Chrome trace JSON file.
+
+        Args:
+            path (str, optional): Defaults to STAGE_TRACE_PATH environment variable or 'cache/trace.json'.
+
+        Returns:
+            str: Path of the written file.
+        """
+        path = path or environ.get("STAGE_TRACE_PATH", "cache/trace.json")
+        directory = os_path.dirname(path)
+        if directory:
+            makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json_dump(self.chrome_trace(), file)
+        return path
+
+
+# process-wide tracer, shared by detection pages, GradCAM and batch inference
+tracer = StageTracer()
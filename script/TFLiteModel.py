@@ -0,0 +1,236 @@
+from threading import Lock
+from time import perf_counter
+from json import dumps as json_dumps
+from os import (
+    makedirs,
+    path as os_path
+)
+from cv2 import imread as cv2_imread
+from numpy import (
+    asarray as np_asarray,
+    concatenate as np_concatenate,
+    linspace as np_linspace,
+    median as np_median,
+    argmax as np_argmax,
+    round as np_round,
+    float32 as np_float32
+)
+from script.batch_inference import list_images
+from script.preprocessing import resize_image, preprocess_batch
+### modules lazy-loaded
+# import tensorflow as tf
+
+
+BACKENDS = ("keras", "tflite-float16", "tflite-int8")
+CALIBRATION_DIR = "archive/brain_tumor_dataset"
+
+
+class TFLiteModel():
+    def __init__(self, model_content=None, model_path=None, num_threads=None):
+        """
+        Model converted to TFLite, run by the TFLite interpreter. Exposes predict like a Keras model,
+        so it can be used by the detection pages and batch runs without changes.
+
+        Args:
+            model_content (bytes, optional): Converted model.
+            model_path (str, optional): Path to '.tflite' file, used if model_content is not given.
+            num_threads (int, optional): Threads of the interpreter. Defaults to TFLite default.
+        """
+        # lazy-loading
+        from tensorflow.lite import Interpreter
+        if model_content is None:
+            with open(model_path, 'rb') as file:
+                model_content = file.read()
+        self.model_content = model_content
+        self.memory_bytes = len(model_content)
+        self.interpreter = Interpreter(model_content=model_content, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.batch_size = None
+        # interpreter is not thread-safe
+        self._lock = Lock()
+
+    def _resize_input(self, batch_size):
+        """Interpreter keeps input shape between calls, it is changed only when batch size changes."""
+        if batch_size != self.batch_size:
+            shape = list(self.input_details['shape'])
+            shape[0] = batch_size
+            self.interpreter.resize_tensor_input(self.input_details['index'], shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = batch_size
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        """
+        Args:
+            batch (np.ndarray): Preprocessed images, shape (N, 224, 224, 3).
+            batch_size, verbose: Accepted for compatibility with keras predict, ignored.
+
+        Returns:
+            np.ndarray: Outputs of the model, shape (N, classes).
+        """
+        batch = np_asarray(batch, dtype=np_float32)
+        with self._lock:
+            self._resize_input(len(batch))
+            scale, zero_point = self.input_details['quantization']
+            if scale:
+                # model with integer input
+                batch = np_round(batch / scale + zero_point).astype(self.input_details['dtype'])
+            self.interpreter.set_tensor(self.input_details['index'], batch)
+            self.interpreter.invoke()
+            outputs = self.interpreter.get_tensor(self.output_details['index'])
+            scale, zero_point = self.output_details['quantization']
+            if scale:
+                outputs = (outputs.astype(np_float32) - zero_point) * scale
+            return outputs.copy()
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.model_content)
+
+
+def calibration_batches(model_is_default=True, directory=CALIBRATION_DIR, count=100):
+    """
+    Representative images for int8 calibration, spread evenly over both classes of the dataset.
+
+    Yields:
+        list: [preprocessed image with shape (1, 224, 224, 3)], format expected by TFLite converter.
+    """
+    paths = list_images(directory)
+    for idx in np_linspace(0, len(paths) - 1, min(count, len(paths))).astype(int):
+        image = cv2_imread(paths[idx])
+        if image is not None:
+            yield [preprocess_batch([resize_image(image)], model_is_default)]
+
+
+def convert(model, mode="float16", model_is_default=True, calibration_dir=CALIBRATION_DIR, calibration_count=100):
+    """
+    Convert Keras model to TFLite.
+
+    Args:
+        model: Keras model.
+        mode (str, optional): 'float16' halves the weights, 'int8' quantizes weights and activations
+            with ranges calibrated on images from calibration_dir. Defaults to 'float16'.
+        model_is_default (bool, optional): Preprocessing of calibration images, as in BaseDetection.
+        calibration_dir (str, optional): Images for int8 calibration. Defaults to archive/brain_tumor_dataset.
+        calibration_count (int, optional): Number of calibration images. Defaults to 100.
+
+    Returns:
+        bytes: Converted model.
+    """
+    # lazy-loading
+    import tensorflow as tf
+    input_shape = tuple(model.inputs[0].shape[1:])
+    forward = tf.function(lambda images: model(images, training=False),
+                          input_signature=[tf.TensorSpec(shape=(None, *input_shape), dtype=tf.float32)])
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([forward.get_concrete_function()], model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        converter.representative_dataset = lambda: calibration_batches(model_is_default, calibration_dir, calibration_count)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"Unsupported TFLite mode: {mode}")
+    return converter.convert()
+
+
+def convert_cached(model, model_path, backend, model_is_default=True, cache_dir="cache/tflite"):
+    """
+    Convert the model for the backend once and keep converted file next to other caches.
+
+    Args:
+        model: Loaded Keras model.
+        model_path (str): Path to the file of the Keras model, name of converted file is based on it.
+        backend (str): 'tflite-float16' or 'tflite-int8'.
+        model_is_default (bool, optional): Preprocessing of calibration images, as in BaseDetection.
+        cache_dir (str, optional): Directory of converted models.
+
+    Returns:
+        str: Path to '.tflite' file.
+    """
+    # lazy-loading, ResultCache hashes model files
+    from script.ResultCache import model_fingerprint
+    mode = backend.split('-')[-1]
+    name = os_path.splitext(os_path.basename(model_path))[0]
+    tflite_path = os_path.join(cache_dir, f"{name}_{mode}_{model_fingerprint(model_path, model_is_default)[:12]}.tflite")
+    if not os_path.exists(tflite_path):
+        makedirs(cache_dir, exist_ok=True)
+        content = convert(model, mode, model_is_default)
+        with open(tflite_path, 'wb') as file:
+            file.write(content)
+    return tflite_path
+
+
+def dataset_labels(paths):
+    """Labels of archive/brain_tumor_dataset images: 1 in 'yes' directory, 0 in 'no' directory."""
+    return [1 if os_path.basename(os_path.dirname(path)) == 'yes' else 0 for path in paths]
+
+
+def measure_latency(model, image, runs=20):
+    """Median latency of classifying single image, in seconds. First call (warm-up) is not counted."""
+    model.predict(image, verbose=0)
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        model.predict(image, verbose=0)
+        timings.append(perf_counter() - start)
+    return float(np_median(timings))
+
+
+def compare(keras_model, tflite_model, keras_size, model_is_default=True, directory=CALIBRATION_DIR, batch_size=32):
+    """
+    Report size, latency and accuracy of TFLite model against Keras model on labelled images.
+
+    Args:
+        keras_model: Keras model.
+        tflite_model (TFLiteModel): Converted model.
+        keras_size (int): Size of Keras model file in bytes.
+        model_is_default (bool, optional): Preprocessing, as in BaseDetection. Defaults to True.
+        directory (str, optional): Labelled images. Defaults to archive/brain_tumor_dataset.
+        batch_size (int, optional): Batch size for accuracy evaluation. Defaults to 32.
+
+    Returns:
+        dict: Sizes in bytes, median latencies in ms, accuracies and agreement of predictions.
+    """
+    paths = list_images(directory)
+    # unreadable files are skipped together with their paths, so labels stay aligned with images
+    decoded = [(path, image) for path, image in zip(paths, map(cv2_imread, paths)) if image is not None]
+    labels = np_asarray(dataset_labels([path for path, _ in decoded]))
+    images = [resize_image(image) for _, image in decoded]
+    predictions = {"keras": [], "tflite": []}
+    for start in range(0, len(images), batch_size):
+        batch = preprocess_batch(images[start:start + batch_size], model_is_default)
+        predictions["keras"].append(np_asarray(keras_model.predict(batch, verbose=0)))
+        predictions["tflite"].append(tflite_model.predict(batch))
+    keras_classes = np_argmax(np_concatenate(predictions["keras"]), axis=1)
+    tflite_classes = np_argmax(np_concatenate(predictions["tflite"]), axis=1)
+    single_image = preprocess_batch(images[:1], model_is_default)
+    return {
+        "keras_size_mb": keras_size / 1024 ** 2,
+        "tflite_size_mb": tflite_model.memory_bytes / 1024 ** 2,
+        "keras_latency_ms": measure_latency(keras_model, single_image) * 1000,
+        "tflite_latency_ms": measure_latency(tflite_model, single_image) * 1000,
+        "keras_accuracy": float((keras_classes == labels).mean()),
+        "tflite_accuracy": float((tflite_classes == labels).mean()),
+        "agreement": float((keras_classes == tflite_classes).mean()),
+        "images": int(len(keras_classes)),
+    }
+
+
+if __name__ == "__main__":
+    # usage: python -m script.TFLiteModel --mode int8 [--model models/EfficientNet.keras] [--output file.tflite]
+    from argparse import ArgumentParser
+    from script.ModelRegistry import registry, DEFAULT_MODEL_PATH
+    parser = ArgumentParser(description="Convert model to TFLite and compare it with Keras model.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--mode", choices=("float16", "int8"), default="float16")
+    parser.add_argument("--output", help="path of '.tflite' file, which can be uploaded in the app")
+    args = parser.parse_args()
+    model_is_default = os_path.abspath(args.model) == os_path.abspath(DEFAULT_MODEL_PATH)
+    keras_model = registry.get(args.model)
+    tflite_model = TFLiteModel(model_content=convert(keras_model, args.mode, model_is_default))
+    if args.output:
+        tflite_model.save(args.output)
+    report = compare(keras_model, tflite_model, os_path.getsize(args.model), model_is_default)
+    print(json_dumps(report, indent=2))
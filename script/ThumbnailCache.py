@@ -0,0 +1,200 @@
+# qt-free thumbnails of scans, generated by worker threads and kept in memory and on disk
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Thread, Lock, Condition
+from os import (
+    environ,
+    makedirs,
+    listdir,
+    remove,
+    stat as os_stat,
+    utime as os_utime,
+    path as os_path
+)
+from cv2 import (
+    imread as cv2_imread,
+    imwrite as cv2_imwrite,
+    resize as cv2_resize,
+    INTER_AREA as cv2_INTER_AREA
+)
+from script.prefetch import DEFAULT_WORKERS
+
+
+THUMBNAIL_SIZE = 128
+THUMBNAIL_DIR = environ.get("THUMBNAIL_CACHE_PATH", "cache/thumbnails")
+
+
+def make_thumbnail(image, size=THUMBNAIL_SIZE):
+    """Shrink image so its longer side is `size`, aspect ratio is kept. Smaller images are returned unchanged."""
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2_resize(image, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2_INTER_AREA)
+
+
+class ThumbnailCache():
+    def __init__(self, size=THUMBNAIL_SIZE, directory=THUMBNAIL_DIR, max_entries=2048,
+                 max_disk_entries=20000, workers=DEFAULT_WORKERS, max_pending=256):
+        """
+        Thumbnails of images, least recently used are evicted from memory and from disk.
+        Requests are served by a pool of worker threads, newest request first - after fast scrolling,
+        visible images are generated before images which were scrolled past.
+
+        Args:
+            size (int, optional): Longer side of thumbnail in pixels. Defaults to 128.
+            directory (str, optional): Directory of '.png' thumbnails, None keeps thumbnails only in memory.
+                Defaults to THUMBNAIL_CACHE_PATH environment variable or 'cache/thumbnails'.
+            max_entries (int, optional): Thumbnails kept in memory. Defaults to 2048.
+            max_disk_entries (int, optional): Thumbnails kept on disk. Defaults to 20000.
+            workers (int, optional): Number of worker threads. Defaults to DEFAULT_WORKERS.
+            max_pending (int, optional): Oldest requests above this number are dropped. Defaults to 256.
+        """
+        self.size = size
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_pending = max_pending
+        if directory is not None:
+            makedirs(directory, exist_ok=True)
+        # (path, variant) -> ((mtime_ns, size), thumbnail)
+        self._memory = OrderedDict()
+        self._lock = Lock()
+        # (path, variant) -> (load_image, callbacks), the newest request is the last one
+        self._pending = OrderedDict()
+        self._condition = Condition(self._lock)
+        self._closed = False
+        self._disk_writes = 0
+        self._threads = [Thread(target=self._work, daemon=True, name=f"thumbnails-{idx}") for idx in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def _disk_path(self, path, variant, stamp):
+        digest = blake2b(digest_size=16)
+        digest.update(f"{os_path.abspath(path)}|{variant}|{stamp[0]}|{stamp[1]}|{self.size}".encode())
+        return os_path.join(self.directory, f"{digest.hexdigest()}.png")
+
+    def get(self, path, variant=""):
+        """Thumbnail from memory, None if it was not generated yet. Never touches disk, safe to call while painting."""
+        with self._lock:
+            entry = self._memory.get((path, variant))
+            if entry is None:
+                return None
+            self._memory.move_to_end((path, variant))
+            return entry[1]
+
+    def load(self, path, load_image=None, variant=""):
+        """
+        Thumbnail from memory, from disk or generated from the image, in this order.
+
+        Args:
+            path (str): Path to the image (or to '.npy' volume or folder of slices).
+            load_image (callable, optional): Takes path, returns decoded BGR image. Defaults to cv2.imread.
+            variant (str, optional): Distinguishes several thumbnails of one path, e.g. slices of a study.
+
+        Returns:
+            ndarray or None: uint8 BGR thumbnail, None if the image cannot be read.
+        """
+        try:
+            stat = os_stat(path)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._memory.get((path, variant))
+            if entry is not None and entry[0] == stamp:
+                self._memory.move_to_end((path, variant))
+                return entry[1]
+        thumbnail = None
+        disk_path = None if self.directory is None else self._disk_path(path, variant, stamp)
+        if disk_path is not None and os_path.exists(disk_path):
+            thumbnail = cv2_imread(disk_path)
+            if thumbnail is not None:
+                # mtime of cached file orders eviction from disk
+                os_utime(disk_path)
+        if thumbnail is None:
+            image = (load_image or cv2_imread)(path)
+            if image is None:
+                return None
+            thumbnail = make_thumbnail(image, self.size)
+            if disk_path is not None:
+                cv2_imwrite(disk_path, thumbnail)
+                self._disk_writes += 1
+                if self._disk_writes % 256 == 0:
+                    self.prune_disk()
+        with self._lock:
+            self._memory[(path, variant)] = (stamp, thumbnail)
+            self._memory.move_to_end((path, variant))
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return thumbnail
+
+    def request(self, path, callback=None, load_image=None, variant=""):
+        """
+        Generate thumbnail in worker thread. Repeated request of pending thumbnail moves it to the front,
+        so it can be requested every time it is painted.
+
+        Args:
+            path (str): Path to the image.
+            callback (callable, optional): Called from worker thread with path, variant and the thumbnail
+                (None if it failed). Without callback, thumbnail is only prefetched into the cache.
+            load_image (callable, optional): Takes path, returns decoded BGR image. Defaults to cv2.imread.
+            variant (str, optional): Distinguishes several thumbnails of one path.
+        """
+        key = (path, variant)
+        with self._condition:
+            _, callbacks = self._pending.pop(key, (None, []))
+            if callback is not None and callback not in callbacks:
+                callbacks.append(callback)
+            self._pending[key] = (load_image, callbacks)
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+            self._condition.notify()
+
+    def cancel_pending(self):
+        """Drop requests which were not started yet."""
+        with self._condition:
+            self._pending.clear()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return None
+                # newest request first
+                (path, variant), (load_image, callbacks) = self._pending.popitem(last=True)
+            try:
+                thumbnail = self.load(path, load_image, variant)
+            except Exception:
+                thumbnail = None
+            for callback in callbacks:
+                callback(path, variant, thumbnail)
+
+    def prune_disk(self):
+        """Remove least recently used thumbnails from disk above max_disk_entries."""
+        if self.directory is None:
+            return None
+        paths = [os_path.join(self.directory, name) for name in listdir(self.directory) if name.endswith('.png')]
+        if len(paths) <= self.max_disk_entries:
+            return None
+        def last_used(path):
+            # file can be removed by other worker meanwhile
+            try:
+                return os_stat(path).st_mtime_ns
+            except OSError:
+                return 0
+        paths.sort(key=last_used)
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            try:
+                remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        """Stop worker threads, pending requests are dropped."""
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify_all()
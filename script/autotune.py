@@ -0,0 +1,197 @@
+"""Tuning of CPU threads, oneDNN and batch size for this machine.
+
+usage:
+    python -m script.autotune [--model models/custom.keras] [--dataset archive/brain_tumor_dataset] [--dry-run]
+
+Every combination of intra-op threads, inter-op threads and oneDNN is measured in a fresh
+interpreter (tensorflow reads them only at startup), each with all batch sizes. Throughput
+is measured on sample images from archive/, decoded once and preprocessed with every batch,
+as in folder detection. The fastest configuration is written into the tuning block of
+settings.py, so the app, classify.py and other runs apply it at startup.
+"""
+from sys import executable, stderr
+from subprocess import run as subprocess_run
+from itertools import product
+from json import dumps as json_dumps, loads as json_loads
+from time import perf_counter, strftime
+from os import (
+    environ,
+    cpu_count,
+    path as os_path
+)
+### modules lazy-loaded - tensorflow has to be configured by environment before import
+# from script.ModelRegistry import registry
+# from script.CompiledPredictor import compiled_predictor
+# from script.preprocessing import batch_preprocessor
+# from script.benchmark import load_image
+# from script.batch_inference import list_images
+
+
+TUNING_MARKER = "########## TUNING ###########"
+SETTINGS_PATH = os_path.join(os_path.dirname(os_path.dirname(os_path.abspath(__file__))), "settings.py")
+DATASET_DIR = "archive/brain_tumor_dataset"
+DEFAULT_BATCH_SIZES = (8, 16, 32, 64)
+
+
+def thread_counts(cpus=None):
+    """Candidate numbers of intra-op threads - 1, half and all CPUs."""
+    cpus = cpus or cpu_count() or 1
+    return sorted({1, max(1, cpus // 2), cpus})
+
+
+def candidate_grid(intra_op=None, inter_op=(1, 2), onednn=(False, True)):
+    """
+    Configurations measured in separate processes, batch sizes are measured inside each of them.
+
+    Returns:
+        list[dict]: intra_op_threads, inter_op_threads and onednn of every configuration.
+    """
+    intra_op = intra_op or thread_counts()
+    return [{"intra_op_threads": intra, "inter_op_threads": inter, "onednn": enabled}
+            for intra, inter, enabled in product(intra_op, inter_op, onednn)]
+
+
+def environment(config):
+    """Environment variables which apply the configuration, read by tensorflow at import."""
+    env = {
+        "TF_ENABLE_ONEDNN_OPTS": "1" if config["onednn"] else "0",
+        "TF_NUM_INTRAOP_THREADS": str(config["intra_op_threads"]),
+        "TF_NUM_INTEROP_THREADS": str(config["inter_op_threads"]),
+    }
+    if "batch_size" in config:
+        env["INFERENCE_BATCH_SIZE"] = str(config["batch_size"])
+    return env
+
+
+def measure_throughput(model_path, dataset, batch_sizes, samples=64, repeats=3):
+    """
+    Throughput of preprocessing and forward pass in this process, for every batch size.
+    Called in the measuring subprocess, after the environment was set.
+
+    Returns:
+        dict: batch size -> images per second (best of repeats).
+    """
+    # lazy-loading
+    from script.ModelRegistry import registry, DEFAULT_MODEL_PATH
+    from script.CompiledPredictor import compiled_predictor
+    from script.preprocessing import batch_preprocessor
+    from script.benchmark import load_image
+    from script.batch_inference import list_images
+    model_is_default = os_path.abspath(model_path) == os_path.abspath(DEFAULT_MODEL_PATH)
+    model = registry.get(model_path)
+    preprocess_batch = batch_preprocessor(model, model_is_default)
+    model = compiled_predictor(model)
+    images = [image for image in map(load_image, list_images(dataset)[:samples]) if image is not None]
+    if not images:
+        raise ValueError(f"No images in {dataset}")
+    results = {}
+    for batch_size in batch_sizes:
+        batches = [images[start:start + batch_size] for start in range(0, len(images), batch_size)]
+        # warm-up - tracing of the graph for this batch size is not measured
+        model.predict(preprocess_batch(batches[0]))
+        best = 0.0
+        for _ in range(repeats):
+            start = perf_counter()
+            for batch in batches:
+                model.predict(preprocess_batch(batch))
+            best = max(best, len(images) / (perf_counter() - start))
+        results[batch_size] = best
+    return results
+
+
+def run_config(config, model_path, dataset, batch_sizes, samples=64):
+    """
+    Measure configuration in a fresh interpreter.
+
+    Returns:
+        dict: batch size -> images per second, empty if the run failed.
+    """
+    command = [executable, "-m", "script.autotune", "--measure", "--model", model_path, "--dataset", dataset,
+               "--samples", str(samples), "--batch-sizes", *map(str, batch_sizes)]
+    env = {**environ, **environment(config)}
+    process = subprocess_run(command, capture_output=True, text=True, env=env,
+                             cwd=os_path.dirname(SETTINGS_PATH))
+    if process.returncode != 0:
+        print(f"{config} failed: {process.stderr.strip().splitlines()[-1:]}", file=stderr)
+        return {}
+    return {int(batch_size): value for batch_size, value in json_loads(process.stdout.strip().splitlines()[-1]).items()}
+
+
+def tune(model_path, dataset=DATASET_DIR, grid=None, batch_sizes=DEFAULT_BATCH_SIZES, samples=64, runner=run_config):
+    """
+    Measure every configuration and pick the fastest one.
+
+    Returns:
+        tuple: (best configuration with batch_size and images_per_second or None, all measured configurations)
+    """
+    measured = []
+    for config in grid or candidate_grid():
+        for batch_size, images_per_second in runner(config, model_path, dataset, batch_sizes, samples).items():
+            measured.append({**config, "batch_size": batch_size, "images_per_second": images_per_second})
+            print(f"{json_dumps(measured[-1])}", file=stderr)
+    best = max(measured, key=lambda config: config["images_per_second"], default=None)
+    return best, measured
+
+
+def tuning_block(config):
+    """Lines of settings.py which apply the configuration, between tuning markers."""
+    lines = [TUNING_MARKER,
+             f"# written by 'python -m script.autotune' on {strftime('%Y-%m-%d')}: "
+             f"{config['images_per_second']:.1f} images/s on this machine"]
+    for name, value in environment(config).items():
+        lines += [f"environ['{name}'] = '{value}'",
+                  f"print(\"{name} set to \", environ['{name}'])"]
+    lines.append(TUNING_MARKER)
+    return "\n".join(lines) + "\n"
+
+
+def write_tuning(config, settings_path=SETTINGS_PATH):
+    """Replace tuning block of settings.py, or append it. Block goes last, so it overrides defaults above it."""
+    with open(settings_path, encoding='utf-8') as file:
+        content = file.read()
+    block = tuning_block(config)
+    start = content.find(TUNING_MARKER)
+    if start != -1:
+        end = content.find(TUNING_MARKER, start + len(TUNING_MARKER))
+        end = len(content) if end == -1 else end + len(TUNING_MARKER)
+        # newline after the closing marker belongs to the block
+        end += content[end:end + 1] == "\n"
+        content = content[:start] + block + content[end:]
+    else:
+        content = content.rstrip("\n") + "\n\n" + block
+    with open(settings_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+
+
+def main(argv=None):
+    from argparse import ArgumentParser, SUPPRESS
+    from script.ModelRegistry import DEFAULT_MODEL_PATH
+    parser = ArgumentParser(description="Find the fastest threads, oneDNN and batch size for this machine.")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("-d", "--dataset", default=DATASET_DIR, help="directory with sample images")
+    parser.add_argument("-b", "--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("-s", "--samples", type=int, default=64, help="number of sample images")
+    parser.add_argument("--intra-op", type=int, nargs="+", help="intra-op threads, defaults to 1, half and all CPUs")
+    parser.add_argument("--inter-op", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--dry-run", action="store_true", help="only print the best configuration")
+    parser.add_argument("--measure", action="store_true", help=SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        # measuring subprocess - environment was set by the parent
+        print(json_dumps(measure_throughput(args.model, args.dataset, args.batch_sizes, args.samples)))
+        return 0
+    best, _ = tune(args.model, args.dataset, candidate_grid(args.intra_op, args.inter_op), args.batch_sizes, args.samples)
+    if best is None:
+        print("No configuration could be measured.", file=stderr)
+        return 1
+    print(f"Best: {json_dumps(best)}", file=stderr)
+    if not args.dry_run:
+        write_tuning(best)
+        print(f"Tuning written to {SETTINGS_PATH}", file=stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    # settings are not imported - they would override configuration measured by this process
+    raise SystemExit(main())
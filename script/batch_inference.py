@@ -0,0 +1,180 @@
+from numpy import (
+    concatenate as np_concatenate,
+    asarray as np_asarray,
+    full as np_full,
+    nan as np_nan,
+    empty as np_empty,
+    float32 as np_float32
+)
+from os import walk as os_walk, environ, path as os_path
+from time import perf_counter
+from datetime import timedelta
+from itertools import islice
+from script.prefetch import prefetch, DEFAULT_WORKERS
+from script.ResultCache import hash_file
+from script.preprocessing import INPUT_SHAPE
+from script.StageTracer import tracer, DISK, WAIT, PREPROCESS, PREDICT
+
+
+# formats decoded by cv2.imread (vector images like svg are not)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+# batch size of folder runs, tuned for the machine by script/autotune.py (settings.py)
+DEFAULT_BATCH_SIZE = int(environ.get("INFERENCE_BATCH_SIZE", 32))
+
+
+def list_images(directory, extensions=IMAGE_EXTENSIONS):
+    """
+    Walk the directory tree and collect paths of the images, sorted for reproducible order.
+
+    Args:
+        directory (str): Root of the tree.
+        extensions (tuple[str], optional): Accepted extensions, lowercase.
+
+    Returns:
+        list[str]: Paths of the images.
+    """
+    paths = []
+    for root, dirs, files in os_walk(directory):
+        dirs.sort()
+        paths.extend(os_path.join(root, file) for file in sorted(files) if file.lower().endswith(extensions))
+    return paths
+
+
+def iter_batches(items, batch_size):
+    """
+    Split sequence into consecutive chunks. The last (tail) chunk holds the remainder.
+
+    Args:
+        items (Sequence): Items to split, e.g. paths of the images.
+        batch_size (int): Maximal number of items in one chunk.
+
+    Yields:
+        tuple: (index of the first item of the chunk, chunk)
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+    for start in range(0, len(items), batch_size):
+        yield start, items[start:start + batch_size]
+
+
+def predict_batches(model, paths, load_image, batch_size=32, prefetch_depth=None, workers=DEFAULT_WORKERS,
+                    cache=None, model_fingerprint=None, preprocess_batch=None):
+    """
+    Classify images with one forward pass per batch instead of one per image. Next images are
+    decoded and preprocessed by a thread pool while the model runs on current batch.
+
+    Args:
+        model: Keras model (or any object with compatible predict method).
+        paths (Sequence[str]): Paths to the images.
+        load_image (callable): Takes path, returns preprocessed image of shape (1, 224, 224, 3),
+            or None if the image could not be loaded. Outputs of such images are filled with NaN.
+        batch_size (int, optional): Number of images stacked for a single forward pass. Defaults to 32.
+        prefetch_depth (int, optional): Number of images loaded ahead. Defaults to two batches.
+        workers (int, optional): Number of loading threads, 0 loads images in caller thread.
+        cache (ResultCache, optional): Images found in the cache are not loaded nor classified again.
+        model_fingerprint (str, optional): Fingerprint of the model, required with cache.
+        preprocess_batch (callable, optional): Takes list of images returned by load_image and 
+            preallocated float32 buffer (out), returns preprocessed batch. With it, load_image 
+            only decodes and resizes, and normalization runs once per batch.
+
+    Yields:
+        tuple: (index of the first image of the batch, ndarray of outputs with shape (len(batch), classes))
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+    if prefetch_depth is None:
+        prefetch_depth = 2 * batch_size
+    
+    def load(path):
+        """Returns (hash of the file, cached outputs, preprocessed image)."""
+        if cache is None:
+            return None, None, load_image(path)
+        with tracer.span(DISK):
+            image_hash = hash_file(path)
+            cached = cache.get(image_hash, model_fingerprint)
+        if cached is not None:
+            return image_hash, cached, None
+        return image_hash, None, load_image(path)
+    
+    items = prefetch(paths, load, depth=prefetch_depth, workers=workers)
+    # buffer for preprocessed batches, reused by every batch
+    buffer = None
+    start = 0
+    while True:
+        with tracer.span(WAIT):
+            batch_items = list(islice(items, batch_size))
+        if not batch_items:
+            break
+        # images which have to go through the model
+        to_predict = [idx for idx, (_, cached, image) in enumerate(batch_items) if cached is None and image is not None]
+        predicted = None
+        if to_predict:
+            images = [batch_items[idx][2] for idx in to_predict]
+            with tracer.span(PREPROCESS, images=len(images)):
+                if preprocess_batch is None:
+                    batch = np_concatenate(images, axis=0)
+                else:
+                    if buffer is None:
+                        buffer = np_empty((batch_size, *INPUT_SHAPE, 3), dtype=np_float32)
+                    batch = preprocess_batch(images, out=buffer)
+            with tracer.span(PREDICT, images=len(images)):
+                predicted = np_asarray(model.predict(batch, batch_size=len(to_predict), verbose=0))
+        if len(to_predict) == len(batch_items):
+            outputs = predicted
+        else:
+            # mix of cached, predicted and not loaded images
+            cached_outputs = [(idx, cached) for idx, (_, cached, _) in enumerate(batch_items) if cached is not None]
+            num_of_classes = (predicted.shape[1] if predicted is not None else 
+                              len(cached_outputs[0][1]) if cached_outputs else 2)
+            outputs = np_full((len(batch_items), num_of_classes), np_nan, dtype=np_float32)
+            for idx, cached in cached_outputs:
+                outputs[idx] = cached
+            if predicted is not None:
+                outputs[to_predict] = predicted
+        if cache is not None and to_predict:
+            cache.put_many([(batch_items[idx][0], predicted[pos]) for pos, idx in enumerate(to_predict)],
+                           model_fingerprint)
+        yield start, outputs
+        start += len(batch_items)
+
+
+class ProgressMeter():
+    def __init__(self, total):
+        """
+        Tracks number of processed images, throughput and estimated time of arrival.
+
+        Args:
+            total (int): Number of images to process.
+        """
+        self.total = total
+        self.done = 0
+        self.start_time = perf_counter()
+
+    def update(self, processed):
+        """Add number of images processed since last update."""
+        self.done += processed
+
+    @property
+    def elapsed(self):
+        """Seconds since the meter was created."""
+        return perf_counter() - self.start_time
+
+    @property
+    def throughput(self):
+        """Processed images per second."""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Estimated seconds left, None if nothing has been processed yet."""
+        throughput = self.throughput
+        if throughput == 0:
+            return None
+        return (self.total - self.done) / throughput
+
+    def summary(self):
+        """Short text with throughput and eta, e.g. '12.3 img/s, ETA 0:00:31'."""
+        eta = self.eta
+        eta_text = "--:--:--" if eta is None else str(timedelta(seconds=round(eta)))
+        return f"{self.throughput:.1f} img/s, ETA {eta_text}"
@@ -0,0 +1,290 @@
+"""Performance benchmark of the application core, run without GUI on images from archive/.
+
+usage:
+    python -m script.benchmark --output bench/results.json [--baseline bench/previous.json] [--tolerance 0.2]
+
+Writes JSON with cold import times, model load times, single-image latency (p50/p95) of
+model.predict and of the compiled path run by DETECT of single detection (one pass with Grad-CAM
+heatmap, or compiled forward pass when Grad-CAM is not available), folder throughput at several
+batch sizes and peak RSS. With baseline, metrics worse than baseline by more than
+tolerance are reported and exit code is 1.
+"""
+from sys import (
+    executable,
+    platform,
+    version as python_version,
+    stderr
+)
+from subprocess import run as subprocess_run
+from time import perf_counter, strftime
+from json import (
+    dump as json_dump,
+    load as json_load
+)
+from os import (
+    cpu_count,
+    makedirs,
+    listdir,
+    path as os_path
+)
+from cv2 import imread as cv2_imread
+from numpy import (
+    percentile as np_percentile,
+    mean as np_mean
+)
+from script.ModelRegistry import load_model_file, DEFAULT_MODEL_PATH
+from script.preprocessing import resize_image, preprocess_batch
+from script.batch_inference import list_images, predict_batches
+from script.prefetch import DEFAULT_WORKERS
+from script.CompiledPredictor import compiled_predictor
+### modules lazy-loaded
+# from resource import getrusage, RUSAGE_SELF
+# from script.GradCAM import GradCAM
+
+
+DATASET_DIR = "archive/brain_tumor_dataset"
+MODELS_DIR = "models"
+MODEL_EXTENSIONS = (".h5", ".keras", ".tflite")
+# modules imported by the app at startup, each timed in a fresh interpreter
+IMPORT_TARGETS = ("numpy", "cv2", "tensorflow", "keras", "script.GradCAM", "app.MainWindow")
+DEFAULT_BATCH_SIZES = (1, 8, 32)
+
+
+def latency_summary(timings):
+    """
+    Args:
+        timings (Sequence[float]): Durations in seconds.
+
+    Returns:
+        dict: p50, p95 and mean in milliseconds, and number of runs.
+    """
+    timings_ms = [timing * 1000 for timing in timings]
+    return {"p50_ms": float(np_percentile(timings_ms, 50)),
+            "p95_ms": float(np_percentile(timings_ms, 95)),
+            "mean_ms": float(np_mean(timings_ms)),
+            "runs": len(timings_ms)}
+
+
+def cold_import_times(targets=IMPORT_TARGETS, repeats=3):
+    """
+    Import time of every module in a fresh interpreter, so modules are not loaded already.
+    Modules are imported after settings, as in run.py.
+
+    Returns:
+        dict: module -> median import time in seconds, None if module cannot be imported.
+    """
+    code = ("import settings; from time import perf_counter; start = perf_counter(); "
+            "import {module}; print(perf_counter() - start)")
+    results = {}
+    for module in targets:
+        timings = []
+        for _ in range(repeats):
+            process = subprocess_run([executable, "-c", code.format(module=module)],
+                                     capture_output=True, text=True)
+            if process.returncode != 0:
+                break
+            timings.append(float(process.stdout.strip().splitlines()[-1]))
+        results[module] = float(np_percentile(timings, 50)) if timings else None
+    return results
+
+
+def model_files(directory=MODELS_DIR):
+    """Model files of the directory, sorted."""
+    if not os_path.isdir(directory):
+        return []
+    return sorted(os_path.join(directory, name) for name in listdir(directory)
+                  if name.lower().endswith(MODEL_EXTENSIONS))
+
+
+def model_load_times(paths, loader=load_model_file):
+    """
+    Load every model file once, bypassing the registry.
+
+    Returns:
+        dict: path -> load time in seconds.
+    """
+    results = {}
+    for path in paths:
+        start = perf_counter()
+        loader(path)
+        results[path] = perf_counter() - start
+    return results
+
+
+def load_image(path):
+    image = cv2_imread(path)
+    return None if image is None else resize_image(image)
+
+
+def single_image_latency(predict, images, model_is_default=True, runs=50):
+    """
+    Latency of classifying one image at a time, preprocessing included, as on single detection page.
+    First call (warm-up, tracing of the graph) is reported separately.
+
+    Args:
+        predict (callable): Classifies preprocessed batch, e.g. predict of the model.
+        images (Sequence[ndarray]): Resized images, used in turn.
+        model_is_default (bool, optional): Flag for preprocessing, as in BaseDetection.
+        runs (int, optional): Number of timed predictions.
+
+    Returns:
+        dict: Summary of latency, see latency_summary, and first_call_ms.
+    """
+    start = perf_counter()
+    predict(preprocess_batch(images[:1], model_is_default))
+    first_call = perf_counter() - start
+    timings = []
+    for idx in range(runs):
+        start = perf_counter()
+        predict(preprocess_batch([images[idx % len(images)]], model_is_default))
+        timings.append(perf_counter() - start)
+    return {**latency_summary(timings), "first_call_ms": first_call * 1000}
+
+
+def folder_throughput(model, paths, batch_sizes=DEFAULT_BATCH_SIZES, model_is_default=True, workers=DEFAULT_WORKERS):
+    """
+    Classify all images as on multiple detection page, decoding included, without result cache.
+
+    Returns:
+        dict: batch size -> {'seconds', 'images_per_second'}.
+    """
+    normalize = lambda images, out: preprocess_batch(images, model_is_default, out)
+    results = {}
+    for batch_size in batch_sizes:
+        start = perf_counter()
+        for _ in predict_batches(model, paths, load_image, batch_size=batch_size,
+                                 workers=workers, preprocess_batch=normalize):
+            pass
+        seconds = perf_counter() - start
+        results[str(batch_size)] = {"seconds": seconds, "images_per_second": len(paths) / seconds if seconds else 0.0}
+    return results
+
+
+def peak_rss_mb():
+    """Peak resident memory of the process in MB, None where 'resource' module is not available (Windows)."""
+    try:
+        # lazy-loading
+        from resource import getrusage, RUSAGE_SELF
+    except ImportError:
+        return None
+    peak = getrusage(RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / 1024 ** 2 if platform == "darwin" else peak / 1024
+
+
+def environment():
+    """Versions and hardware, so results of different machines are not compared by accident."""
+    info = {"python": python_version.split()[0], "platform": platform, "cpu_count": cpu_count(),
+            "timestamp": strftime("%Y-%m-%dT%H:%M:%S")}
+    for module in ("numpy", "cv2", "tensorflow", "keras"):
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            info[module] = None
+    return info
+
+
+def run_benchmark(model_path=DEFAULT_MODEL_PATH, dataset=DATASET_DIR, models_dir=MODELS_DIR,
+                  batch_sizes=DEFAULT_BATCH_SIZES, runs=50, import_repeats=3, workers=DEFAULT_WORKERS):
+    """
+    Run every benchmark. Cold imports run first, in subprocesses, so they are not affected by this process.
+
+    Returns:
+        dict: Results, ready to be written as JSON.
+    """
+    results = {"environment": environment(), "cold_import_s": cold_import_times(repeats=import_repeats)}
+    results["model_load_s"] = model_load_times(model_files(models_dir))
+    model_is_default = os_path.abspath(model_path) == os_path.abspath(DEFAULT_MODEL_PATH)
+    model = load_model_file(model_path)
+    paths = list_images(dataset)
+    images = [image for image in map(load_image, paths[:runs]) if image is not None]
+    results["model"] = model_path
+    results["images"] = len(paths)
+    results["single_image_latency"] = single_image_latency(lambda batch: model.predict(batch, verbose=0),
+                                                           images, model_is_default, runs)
+    try:
+        # lazy-loading
+        from script.GradCAM import GradCAM
+        grad_cam = GradCAM(model)
+    except Exception:
+        grad_cam = None
+    # path of DETECT, against model.predict above - one compiled pass giving prediction and heatmap,
+    # compiled forward pass for models without Grad-CAM
+    detect = single_image_latency(compiled_predictor(model).predict if grad_cam is None else grad_cam.predict_with_heatmap,
+                                  images, model_is_default, runs)
+    detect["grad_cam"] = grad_cam is not None
+    detect["speedup_p50"] = results["single_image_latency"]["p50_ms"] / detect["p50_ms"]
+    results["detect_latency"] = detect
+    results["folder_throughput"] = folder_throughput(model, paths, batch_sizes, model_is_default, workers)
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def flatten(results, prefix=""):
+    """Nested results as {'folder_throughput.32.images_per_second': value}, numbers only."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def find_regressions(baseline, current, tolerance=0.2):
+    """
+    Compare timing, throughput and memory metrics of two runs.
+
+    Args:
+        baseline (dict): Results of previous run.
+        current (dict): Results of this run.
+        tolerance (float, optional): Allowed relative change. Defaults to 0.2 (20 %).
+
+    Returns:
+        list[tuple]: (metric, baseline value, current value) of metrics which got worse than tolerance.
+    """
+    baseline, current = flatten(baseline), flatten(current)
+    regressions = []
+    for metric, value in current.items():
+        previous = baseline.get(metric)
+        if not previous or metric.startswith("environment.") or metric.endswith(".runs"):
+            continue
+        higher_is_better = metric.endswith(("images_per_second", "speedup_p50"))
+        change = (previous - value if higher_is_better else value - previous) / previous
+        if change > tolerance:
+            regressions.append((metric, previous, value))
+    return regressions
+
+
+def main(argv=None):
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description="Benchmark model loading, inference and Grad-CAM on archive/ images.")
+    parser.add_argument("-o", "--output", default="bench/results.json", help="JSON file with results")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("-d", "--dataset", default=DATASET_DIR)
+    parser.add_argument("-b", "--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("-r", "--runs", type=int, default=50, help="timed predictions of single image")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="threads decoding images")
+    parser.add_argument("--baseline", help="JSON file of previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown, default 0.2")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.model, args.dataset, batch_sizes=args.batch_sizes, runs=args.runs, workers=args.workers)
+    if os_path.dirname(args.output):
+        makedirs(os_path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json_dump(results, file, indent=2)
+    print(f"Results written to {args.output}", file=stderr)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = find_regressions(json_load(file), results, args.tolerance)
+        for metric, previous, value in regressions:
+            print(f"REGRESSION {metric}: {previous:.4g} -> {value:.4g}", file=stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    import settings
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+from os import (
+    scandir as os_scandir,
+    path as os_path
+)
+from time import perf_counter
+from threading import Event
+from script.batch_inference import predict_batches, IMAGE_EXTENSIONS
+from script.prefetch import DEFAULT_WORKERS
+
+
+class FolderIndex():
+    def __init__(self, directory, extensions=IMAGE_EXTENSIONS, recursive=False):
+        """
+        Index of images seen in the directory, keyed by name with (mtime, size) of the file.
+        Every scan stats the directory once with os.scandir and reports only new or changed images.
+
+        Args:
+            directory (str): Watched directory.
+            extensions (tuple[str], optional): Accepted extensions, lowercase.
+            recursive (bool, optional): Scan subdirectories too. Defaults to False.
+        """
+        self.directory = directory
+        self.extensions = extensions
+        self.recursive = recursive
+        # name (relative to directory) -> (mtime_ns, size) of reported images
+        self.entries = {}
+        # images seen in the last scan but not reported yet, waiting until file stops changing
+        self.pending = {}
+
+    def _scan_tree(self, directory, prefix=""):
+        """Yields (name relative to watched directory, (mtime_ns, size)) of every image."""
+        with os_scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(self.extensions):
+                    stat = entry.stat()
+                    yield os_path.join(prefix, entry.name), (stat.st_mtime_ns, stat.st_size)
+                elif self.recursive and entry.is_dir(follow_symlinks=False):
+                    yield from self._scan_tree(entry.path, os_path.join(prefix, entry.name))
+
+    def scan(self, require_stable=True):
+        """
+        Args:
+            require_stable (bool, optional): Report image only when its mtime and size did not change
+                since previous scan, so files still being written by the scanner are not read. Defaults to True.
+
+        Returns:
+            list[str]: Sorted names of new or changed images, relative to the directory.
+        """
+        found = dict(self._scan_tree(self.directory))
+        changed = []
+        for name, stat in found.items():
+            if self.entries.get(name) == stat:
+                continue
+            if require_stable and self.pending.get(name) != stat:
+                self.pending[name] = stat
+                continue
+            self.pending.pop(name, None)
+            self.entries[name] = stat
+            changed.append(name)
+        # removed files are reported again if they come back
+        for name in self.entries.keys() - found.keys():
+            del self.entries[name]
+        for name in self.pending.keys() - found.keys():
+            del self.pending[name]
+        return sorted(changed)
+
+    def forget(self, names):
+        """Report the images again by next scan, e.g. images listed but never classified."""
+        for name in names:
+            stat = self.entries.pop(name, None)
+            if stat is not None:
+                self.pending[name] = stat
+
+    def path(self, name):
+        return os_path.join(self.directory, name)
+
+
+def watch_folder(model, index, load_image, on_batch, preprocess_batch=None, batch_size=32, interval=2.0,
+                 stop_event=None, workers=DEFAULT_WORKERS, cache=None, model_fingerprint=None):
+    """
+    Classify images of the index as they arrive, until stop_event is set.
+
+    Args:
+        model: Loaded model.
+        index (FolderIndex): Index of watched directory. Images it already holds are not classified.
+        load_image (callable): Takes path, returns decoded image or None if it cannot be used.
+        on_batch (callable): Called with (names, outputs, seconds per image) after every batch.
+        preprocess_batch (callable, optional): As in predict_batches.
+        batch_size (int, optional): Number of images per forward pass. Defaults to 32.
+        interval (float, optional): Seconds between scans. Defaults to 2.
+        stop_event (threading.Event, optional): Stops watching. Without it, watching never ends.
+        workers, cache, model_fingerprint: As in predict_batches.
+    """
+    if stop_event is None:
+        stop_event = Event()
+    while not stop_event.is_set():
+        names = index.scan()
+        if names:
+            batch_start = perf_counter()
+            for start, outputs in predict_batches(model, [index.path(name) for name in names], load_image,
+                                                  batch_size, workers=workers, cache=cache,
+                                                  model_fingerprint=model_fingerprint,
+                                                  preprocess_batch=preprocess_batch):
+                on_batch(names[start:start + len(outputs)], outputs, (perf_counter() - batch_start) / len(outputs))
+                batch_start = perf_counter()
+                if stop_event.is_set():
+                    # images not classified yet are reported by next scan after restart
+                    index.forget(names[start + len(outputs):])
+                    break
+            if cache is not None:
+                cache.flush()
+        stop_event.wait(interval)
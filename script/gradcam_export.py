@@ -0,0 +1,98 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from os import (
+    makedirs,
+    path as os_path
+)
+from cv2 import (
+    imread as cv2_imread,
+    imwrite as cv2_imwrite,
+    cvtColor as cv2_cvtColor,
+    COLOR_RGB2BGR as cv2_COLOR_RGB2BGR
+)
+from numpy import (
+    empty as np_empty,
+    float32 as np_float32
+)
+from script.prefetch import prefetch, DEFAULT_WORKERS
+from script.batch_inference import ProgressMeter
+from script.preprocessing import resize_image, INPUT_SHAPE
+
+
+def overlay_path(output_dir, image_path):
+    """Path of the overlay written for the image, e.g. 'out/Y1_gradcam.png'."""
+    stem = os_path.splitext(os_path.basename(image_path))[0]
+    return os_path.join(output_dir, f"{stem}_gradcam.png")
+
+
+def export_overlays(grad_cam, paths, output_dir, preprocess_batch, class_index=1, batch_size=16,
+                    workers=DEFAULT_WORKERS, progress=None, cancel_event=None):
+    """
+    Compute Grad-CAM heatmaps in batches and write overlays of all images into the directory.
+    Decoding runs ahead in a thread pool, colormap/blending and writing run in another pool,
+    so the model is the only serial stage. Files which cannot be decoded are skipped and counted as failed.
+
+    Args:
+        grad_cam (GradCAM): Grad-CAM of the model.
+        paths (Sequence[str]): Paths to the images.
+        output_dir (str): Directory for overlays, created if it does not exist.
+        preprocess_batch (callable): Takes list of resized uint8 images and preallocated float32 
+            buffer (out), returns preprocessed batch of shape (N, 224, 224, 3).
+        class_index (int, optional): Class for which heatmaps are computed. Defaults to 1 (tumor).
+        batch_size (int, optional): Number of images per pass of Grad-CAM. Defaults to 16.
+        workers (int, optional): Number of threads for decoding and for blending.
+        progress (callable, optional): Called with ProgressMeter after every batch.
+        cancel_event (threading.Event, optional): When set, export stops after current batch.
+
+    Returns:
+        dict: count of written overlays, failed (images which could not be decoded), seconds and images_per_second.
+    """
+    makedirs(output_dir, exist_ok=True)
+    # progress counts failed images too
+    meter = ProgressMeter(len(paths))
+    failed = 0
+
+    def load(path):
+        image = cv2_imread(path)
+        # broken or deleted file does not stop the export, as in folder detection
+        return path, image, None if image is None else resize_image(image)
+
+    def blend_and_write(heatmap, image, path):
+        overlay = grad_cam.overlay_heatmap_on_image(heatmap, image)
+        if not cv2_imwrite(overlay_path(output_dir, path), cv2_cvtColor(overlay, cv2_COLOR_RGB2BGR)):
+            raise OSError(f"Could not write overlay of {path}")
+
+    items = prefetch(paths, load, depth=2 * batch_size, workers=max(workers, 1))
+    writers = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="gradcam-export")
+    pending = deque()
+    buffer = np_empty((batch_size, *INPUT_SHAPE, 3), dtype=np_float32)
+    try:
+        while not (cancel_event is not None and cancel_event.is_set()):
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+            decoded = [item for item in batch if item[1] is not None]
+            failed += len(batch) - len(decoded)
+            meter.update(len(batch) - len(decoded))
+            if decoded:
+                heatmaps = grad_cam.generate_heatmaps(preprocess_batch([item[2] for item in decoded], out=buffer), class_index)
+                for heatmap, (path, image, _) in zip(heatmaps, decoded):
+                    pending.append(writers.submit(blend_and_write, heatmap, image, path))
+            # count overlays already written, without waiting for the latest batch
+            while pending and pending[0].done():
+                pending.popleft().result()
+                meter.update(1)
+            if progress is not None:
+                progress(meter)
+        while pending:
+            pending.popleft().result()
+            meter.update(1)
+    finally:
+        items.close()
+        writers.shutdown(wait=True)
+    if progress is not None:
+        progress(meter)
+    count, seconds = meter.done - failed, meter.elapsed
+    return {"count": count, "failed": failed, "seconds": seconds,
+            "images_per_second": count / seconds if seconds > 0 else 0.0}
@@ -0,0 +1,335 @@
+"""Local HTTP inference service for tools which cannot drive the GUI (e.g. PACS export scripts).
+
+usage:
+    python -m script.inference_server [--model models/custom.keras] [--port 8000] [--max-batch-size 32] [--max-delay-ms 5]
+
+endpoints:
+    POST /predict  - body is image file (png, jpg, ...), returns JSON with result and class probabilities
+    POST /gradcam  - body is image file, returns png with Grad-CAM overlay, result in X-Detection-Result
+                     and X-Tumor-Probability headers
+    GET  /metrics  - JSON with requests, queue depth and batch sizes of both endpoints
+    GET  /health   - 'ok'
+
+Concurrent requests are grouped into micro-batches - the first request of a batch waits at most
+max-delay-ms for others, then the whole batch is classified by one forward pass.
+Model is loaded by the registry and images are preprocessed as in the GUI.
+"""
+from sys import stderr
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import Future
+from queue import Queue, Empty
+from threading import Thread, Lock
+from time import perf_counter
+from json import dumps as json_dumps
+from collections import Counter
+from cv2 import (
+    imdecode as cv2_imdecode,
+    imencode as cv2_imencode,
+    cvtColor as cv2_cvtColor,
+    IMREAD_COLOR as cv2_IMREAD_COLOR,
+    COLOR_RGB2BGR as cv2_COLOR_RGB2BGR
+)
+from numpy import (
+    frombuffer as np_frombuffer,
+    empty as np_empty,
+    asarray as np_asarray,
+    argmax as np_argmax,
+    uint8 as np_uint8,
+    float32 as np_float32
+)
+from script.preprocessing import resize_image, batch_preprocessor, INPUT_SHAPE
+from script.CompiledPredictor import compiled_predictor
+### modules lazy-loaded
+# from script.GradCAM import GradCAM
+
+
+RESULT_TEXT = {1: "DETECTED", 0: "No Tumor"}
+# larger bodies are rejected, scans are a few MB at most
+MAX_BODY_BYTES = 64 * 1024 ** 2
+
+
+class MicroBatcher():
+    def __init__(self, process_batch, max_batch_size=32, max_delay=0.005):
+        """
+        Group items submitted by concurrent threads into batches processed by one worker thread.
+        Worker takes the first waiting item, then collects items for at most max_delay seconds
+        or until the batch is full.
+
+        Args:
+            process_batch (callable): Takes list of items, returns list of results in the same order.
+            max_batch_size (int, optional): Defaults to 32.
+            max_delay (float, optional): Seconds the first item of the batch waits for others. Defaults to 0.005.
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue = Queue()
+        self._lock = Lock()
+        self.requests = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = Counter()
+        self.busy_seconds = 0.0
+        self._thread = Thread(target=self._work, daemon=True, name="micro-batcher")
+        self._thread.start()
+
+    def submit(self, item):
+        """
+        Returns:
+            concurrent.futures.Future: Result of the item, or exception raised by process_batch.
+        """
+        future = Future()
+        self._queue.put((item, future))
+        with self._lock:
+            self.requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def _work(self):
+        while True:
+            batch = [self._queue.get()]
+            if batch[0] is None:
+                return None
+            deadline = perf_counter() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - perf_counter()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except Empty:
+                    break
+                if item is None:
+                    # close was called - finish this batch first
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            start = perf_counter()
+            try:
+                results = self.process_batch([item for item, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            with self._lock:
+                self.batches += 1
+                self.batch_sizes[len(batch)] += 1
+                self.busy_seconds += perf_counter() - start
+
+    def metrics(self):
+        """Counters of requests and batches, current and maximal depth of the queue."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "mean_batch_size": sum(size * count for size, count in self.batch_sizes.items()) / self.batches if self.batches else 0.0,
+                "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                "busy_seconds": self.busy_seconds,
+            }
+
+    def close(self):
+        self._queue.put(None)
+
+
+def decode_image(data):
+    """
+    Decode image file sent in request body.
+
+    Returns:
+        ndarray: uint8 BGR image, as returned by cv2.imread.
+
+    Raises:
+        ValueError: Body is not an image.
+    """
+    image = cv2_imdecode(np_frombuffer(data, dtype=np_uint8), cv2_IMREAD_COLOR) if data else None
+    if image is None:
+        raise ValueError("request body is not an image")
+    return image
+
+
+class InferenceService():
+    def __init__(self, model, model_is_default=True, preprocess=None, max_batch_size=32, max_delay=0.005):
+        """
+        Classification and Grad-CAM of single images, micro-batched across concurrent requests.
+
+        Args:
+            model: Loaded model.
+            model_is_default (bool, optional): Flag for preprocessing, as in BaseDetection. Defaults to True.
+            preprocess (callable, optional): Takes list of resized uint8 images and float32 buffer (out),
+                returns preprocessed batch. Defaults to preprocess_batch with model_is_default,
+                or stacking of raw images for servable model.
+            max_batch_size (int, optional): Defaults to 32.
+            max_delay (float, optional): Seconds the first request waits for others. Defaults to 0.005.
+        """
+        self.model = model
+        self.model_is_default = model_is_default
+        self.preprocess = preprocess or batch_preprocessor(model, model_is_default)
+        self._grad_cam = None
+        self._grad_cam_lock = Lock()
+        self.predict_batcher = MicroBatcher(self.predict_batch, max_batch_size, max_delay)
+        self.gradcam_batcher = MicroBatcher(self.gradcam_batch, max_batch_size, max_delay)
+        # preprocessed batches, reused by each worker thread
+        self._predict_buffer = np_empty((max_batch_size, *INPUT_SHAPE, 3), dtype=np_float32)
+        self._gradcam_buffer = np_empty((max_batch_size, *INPUT_SHAPE, 3), dtype=np_float32)
+
+    def grad_cam(self):
+        with self._grad_cam_lock:
+            if self._grad_cam is None:
+                # lazy-loading
+                from script.GradCAM import GradCAM
+                self._grad_cam = GradCAM(self.model)
+            return self._grad_cam
+
+    def predict_batch(self, images):
+        """Run in batcher thread. Returns class probabilities of every image."""
+        batch = self.preprocess([resize_image(image) for image in images], self._predict_buffer)
+        return list(np_asarray(compiled_predictor(self.model).predict(batch), dtype=np_float32))
+
+    def gradcam_batch(self, images):
+        """Run in batcher thread. Returns (probabilities, png with overlay) of every image."""
+        grad_cam = self.grad_cam()
+        batch = self.preprocess([resize_image(image) for image in images], self._gradcam_buffer)
+        probabilities, _, heatmaps = grad_cam.predict_with_heatmap(batch)
+        results = []
+        for image, heatmap, output in zip(images, heatmaps, probabilities):
+            overlay = cv2_cvtColor(grad_cam.overlay_heatmap_on_image(heatmap, image), cv2_COLOR_RGB2BGR)
+            results.append((output, cv2_imencode(".png", overlay)[1].tobytes()))
+        return results
+
+    def predict(self, data, timeout=None):
+        """
+        Args:
+            data (bytes): Image file.
+
+        Returns:
+            dict: result, label and class probabilities.
+        """
+        output = self.predict_batcher.submit(decode_image(data)).result(timeout)
+        return self.result(output)
+
+    def gradcam(self, data, timeout=None):
+        """
+        Args:
+            data (bytes): Image file.
+
+        Returns:
+            tuple: (result as in predict, png with Grad-CAM overlay)
+        """
+        output, png = self.gradcam_batcher.submit(decode_image(data)).result(timeout)
+        return self.result(output), png
+
+    @staticmethod
+    def result(output):
+        label = int(np_argmax(output))
+        return {"result": RESULT_TEXT.get(label, str(label)), "label": label,
+                "probabilities": [float(value) for value in output]}
+
+    def metrics(self):
+        return {"predict": self.predict_batcher.metrics(), "gradcam": self.gradcam_batcher.metrics()}
+
+    def close(self):
+        self.predict_batcher.close()
+        self.gradcam_batcher.close()
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """Handler of one request, served by thread of ThreadingHTTPServer. Service is attribute of the server."""
+    protocol_version = "HTTP/1.1"
+
+    def send_body(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, content):
+        self.send_body(status, json_dumps(content).encode(), "application/json")
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self.send_json(200, self.server.service.metrics())
+        elif self.path == "/health":
+            self.send_body(200, b"ok", "text/plain")
+        else:
+            self.send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.send_json(413, {"error": "image is too large"})
+            self.close_connection = True
+            return None
+        data = self.rfile.read(length)
+        service = self.server.service
+        try:
+            if self.path == "/predict":
+                self.send_json(200, service.predict(data))
+            elif self.path == "/gradcam":
+                result, png = service.gradcam(data)
+                self.send_body(200, png, "image/png",
+                               (("X-Detection-Result", result["result"]),
+                                ("X-Tumor-Probability", f"{result['probabilities'][-1]:.6f}")))
+            else:
+                self.send_json(404, {"error": f"unknown endpoint {self.path}"})
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        # requests are counted by /metrics, access log would flood stderr under load
+        pass
+
+
+def make_server(service, host="127.0.0.1", port=8000):
+    """
+    Args:
+        service (InferenceService): Service answering requests.
+        host (str, optional): Defaults to localhost only.
+        port (int, optional): 0 picks a free port. Defaults to 8000.
+
+    Returns:
+        ThreadingHTTPServer: Server, call serve_forever to run it.
+    """
+    server = ThreadingHTTPServer((host, port), InferenceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    from argparse import ArgumentParser
+    from os import path as os_path
+    from script.ModelRegistry import registry, DEFAULT_MODEL_PATH
+    parser = ArgumentParser(description="Serve classification and Grad-CAM of MRI scans over local HTTP.")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL_PATH,
+                        help="'.h5', '.keras' or '.tflite' model; models other than default use "
+                             "custom_preprocessing from script/preprocess_input_custom.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8000)
+    parser.add_argument("-b", "--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0, help="time the first request waits for others")
+    args = parser.parse_args(argv)
+
+    model_is_default = os_path.abspath(args.model) == os_path.abspath(DEFAULT_MODEL_PATH)
+    service = InferenceService(registry.get(args.model), model_is_default,
+                               max_batch_size=args.max_batch_size, max_delay=args.max_delay_ms / 1000)
+    server = make_server(service, args.host, args.port)
+    print(f"Serving {args.model} on http://{args.host}:{server.server_address[1]}, press Ctrl+C to stop.", file=stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    import settings
+    raise SystemExit(main())
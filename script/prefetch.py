@@ -0,0 +1,42 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from os import cpu_count
+
+
+DEFAULT_WORKERS = min(4, cpu_count() or 1)
+
+
+def prefetch(items, load, depth=64, workers=DEFAULT_WORKERS):
+    """
+    Producer/consumer pipeline. Thread pool loads up to `depth` items ahead, while the caller
+    consumes current results (e.g. model runs on current batch). Decoding and resizing in cv2
+    release the GIL, so loading overlaps with inference.
+
+    Args:
+        items (Iterable): Items to load, e.g. paths of the images.
+        load (callable): Takes item, returns loaded item (e.g. decoded and preprocessed image).
+        depth (int, optional): Maximal number of items loaded ahead (bound of the queue). Defaults to 64.
+        workers (int, optional): Number of loading threads. 0 loads items serially in caller thread.
+
+    Yields:
+        Loaded items, in the same order as `items`. Exception raised by `load` is re-raised here.
+    """
+    if workers == 0:
+        for item in items:
+            yield load(item)
+        return
+    items = iter(items)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+    try:
+        # bounded queue of pending results
+        pending = deque(executor.submit(load, item) for item in islice(items, max(depth, 1)))
+        while pending:
+            result = pending.popleft().result()
+            # refill the queue before handing result to the consumer
+            for item in islice(items, 1):
+                pending.append(executor.submit(load, item))
+            yield result
+    finally:
+        # consumer stopped early (e.g. cancelled) - drop what is not started yet
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -3,7 +3,8 @@ from numpy import (
     uint8 as np_uint8,
     expand_dims as np_expand_dims,
     ndarray as np_ndarray,
-    array as np_array
+    array as np_array,
+    float32 as np_float32
 )
 from cv2 import resize as cv2_resize
 
@@ -35,6 +36,28 @@ def handle_io_type(func):
     return wrapper
 
 
+# decorator for checking batch dimensions and type, called once per batch
+def handle_batch_io_type(func):
+    def wrapper(images: np_ndarray) -> np_ndarray:
+        """
+        Preprocess stacked images of the folder at once. Optional, when defined it is used instead
+        of custom_preprocessing when many images are classified, so it must give the same results.
+
+        Args:
+            images (np.ndarray): Resized images as a float32 array with shape (N, 224, 224, 3).
+                Array is a buffer reused between batches, so it can be modified in place.
+
+        Returns:
+            np.ndarray: Preprocessed images as a float32 array with shape (N, 224, 224, 3).
+        """
+        # Check input type and shape
+        assert images.dtype == np_float32, "Input images must be of type float32"
+        assert images.shape[1:] == (224, 224, 3), "Input images must have shape (N, 224, 224, 3)"
+        
+        return func(images)
+    return wrapper
+
+
 @handle_io_type
 # place code of your preprocessing function here:
 ########## CODE ###########
@@ -48,3 +71,17 @@ def custom_preprocessing(image):
 ########## ENDCODE ########### 
 
 
+# optional - place code of the same preprocessing for a batch of resized images here, it speeds up
+# folder runs. Without it (None), custom_preprocessing above is run on every image of the batch.
+# Example for the code above (resizing is done before batching):
+#
+# @handle_batch_io_type
+# def custom_preprocessing_batch(images):
+#     return preprocess_input(images)
+########## BATCH CODE ###########
+
+custom_preprocessing_batch = None
+
+########## ENDBATCH CODE ###########
+
+
@@ -0,0 +1,135 @@
+# qt-free preprocessing shared by gui (BaseDetection) and headless runs (classify.py)
+from cv2 import resize as cv2_resize
+from numpy import (
+    array as np_array,
+    empty as np_empty,
+    expand_dims as np_expand_dims,
+    float32 as np_float32,
+    uint8 as np_uint8
+)
+### modules lazy-loaded
+# from keras.applications.efficientnet import preprocess_input as efficientnet_preprocess_input
+# from script import preprocess_input_custom
+
+
+# (height, width) of model input
+INPUT_SHAPE = (224, 224)
+
+
+def preprocess_image(image, model_is_default=True):
+    """
+    Resize and prepare image for prediction.
+
+    Args:
+        image (ndarray): Image as uint8 array with shape (x, y, 3), as returned by cv2.imread.
+        model_is_default (bool, optional): True for default EfficientNet preprocessing. Instead,
+            custom_preprocessing from script/preprocess_input_custom.py is used.
+
+    Returns:
+        ndarray: Preprocessed image with shape (1, 224, 224, 3).
+    """
+    if model_is_default:
+        # lazy-loading of preprocessing
+        from keras.applications.efficientnet import preprocess_input as efficientnet_preprocess_input
+        image_resized = cv2_resize(image, (224, 224))
+        image_as_array = np_array(image_resized)
+        image_preprocessed = efficientnet_preprocess_input(image_as_array)
+        return np_expand_dims(image_preprocessed, axis=0)  # Add batch dimension
+    # lazy-loading of custom-preprocessing
+    from script.preprocess_input_custom import custom_preprocessing
+    return custom_preprocessing(image)
+
+
+def resize_image(image):
+    """Resize decoded image to model input size. Cheap step, run by loading threads before batching."""
+    if image.shape[:2] == INPUT_SHAPE:
+        return image
+    return cv2_resize(image, (INPUT_SHAPE[1], INPUT_SHAPE[0]))
+
+
+def preprocess_batch(images, model_is_default=True, out=None):
+    """
+    Prepare batch of images for prediction. Images are written straight into float32 buffer
+    and normalized by one vectorized operation on the whole batch.
+
+    Args:
+        images (Sequence[ndarray]): Decoded uint8 images with shape (x, y, 3), preferably already resized.
+        model_is_default (bool, optional): True for default EfficientNet preprocessing. Instead,
+            custom_preprocessing from script/preprocess_input_custom.py is run on every image,
+            or custom_preprocessing_batch on the whole batch, if the user defined it.
+        out (ndarray, optional): Preallocated float32 buffer with shape (>=N, 224, 224, 3), reused between batches.
+
+    Returns:
+        ndarray: Preprocessed batch with shape (N, 224, 224, 3), backed by `out` when possible.
+    """
+    if out is None:
+        out = np_empty((len(images), *INPUT_SHAPE, 3), dtype=np_float32)
+    batch = out[:len(images)]
+    if model_is_default:
+        # lazy-loading of preprocessing
+        from keras.applications.efficientnet import preprocess_input as efficientnet_preprocess_input
+        normalize = efficientnet_preprocess_input
+    else:
+        # lazy-loading of custom-preprocessing
+        from script import preprocess_input_custom
+        normalize = getattr(preprocess_input_custom, "custom_preprocessing_batch", None)
+        if normalize is None:
+            # the same hook as single detection, so every page gives the same results
+            for idx, image in enumerate(images):
+                batch[idx] = preprocess_input_custom.custom_preprocessing(image)[0]
+            return batch
+    for idx, image in enumerate(images):
+        # uint8 -> float32 conversion happens during the copy, no intermediate array
+        batch[idx] = resize_image(image)
+    return normalize(batch)
+
+
+def is_servable(model):
+    """
+    Model with preprocessing in its graph (script/servable.py) - takes raw uint8 images of any size.
+
+    Args:
+        model: Keras model, or any object with predict method (e.g. TFLiteModel, Ensemble).
+
+    Returns:
+        bool: True if the only input of the model is uint8.
+    """
+    inputs = getattr(model, "inputs", None)
+    # objects which only mimic predict (e.g. test doubles) have no list of input tensors
+    if not isinstance(inputs, (list, tuple)) or len(inputs) != 1:
+        return False
+    dtype = inputs[0].dtype
+    return str(getattr(dtype, "name", dtype)) == "uint8"
+
+
+def stack_batch(images, out=None):
+    """
+    Stack decoded images into uint8 batch for servable model, which normalizes them in its graph.
+    Signature of preprocess_batch - float32 buffer of predict_batches is not used.
+
+    Args:
+        images (Sequence[ndarray]): Decoded uint8 images, preferably already resized.
+        out (ndarray, optional): Preallocated uint8 buffer with shape (>=N, 224, 224, 3), other buffers are ignored.
+
+    Returns:
+        ndarray: uint8 batch with shape (N, 224, 224, 3).
+    """
+    if out is None or out.dtype != np_uint8 or len(out) < len(images):
+        out = np_empty((len(images), *INPUT_SHAPE, 3), dtype=np_uint8)
+    batch = out[:len(images)]
+    for idx, image in enumerate(images):
+        batch[idx] = resize_image(image)
+    return batch
+
+
+def batch_preprocessor(model, model_is_default=True):
+    """
+    Preparation of batches for the model: stacking of raw images for servable model,
+    preprocess_batch with model_is_default otherwise.
+
+    Returns:
+        callable: Takes list of resized uint8 images and preallocated buffer (out), returns batch.
+    """
+    if is_servable(model):
+        return stack_batch
+    return lambda images, out=None: preprocess_batch(images, model_is_default, out)
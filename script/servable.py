@@ -0,0 +1,179 @@
+"""Servable model - preprocessing folded into the graph of the model.
+
+usage:
+    python -m script.servable [--model models/custom.keras] [--normalization caffe] [--output models/custom.servable.keras]
+                              [--check archive/brain_tumor_dataset]
+
+Saved '.keras' file takes raw uint8 BGR images of any size, as decoded by cv2.imread. Resizing to
+224x224 and normalization run in the graph, so the app feeds decoded batches straight to the model
+and script/preprocess_input_custom.py is not needed. Normalization of custom models has to be named,
+it matches preprocess_input of keras.applications:
+    none  - pixels as float32 (EfficientNet, ConvNeXt - they normalize inside)
+    caffe - channels reversed, ImageNet mean subtracted (VGG16, VGG19, ResNet50)
+    tf    - scaled to [-1, 1] (MobileNet, Inception, Xception)
+    torch - scaled to [0, 1], standardized by ImageNet mean and std (DenseNet)
+With --check, outputs of the servable model are compared with the original model and Python preprocessing.
+"""
+from sys import stderr
+from os import path as os_path
+from keras import (
+    Input as keras_Input,
+    Model as keras_Model,
+    ops as keras_ops
+)
+from keras.layers import Layer, Resizing
+from keras.saving import register_keras_serializable
+from script.preprocessing import INPUT_SHAPE, is_servable
+
+
+NORMALIZATIONS = ("none", "caffe", "tf", "torch")
+# ImageNet statistics, as in keras.applications.imagenet_utils
+CAFFE_MEAN = (103.939, 116.779, 123.68)
+TORCH_MEAN = (0.485, 0.456, 0.406)
+TORCH_STD = (0.229, 0.224, 0.225)
+# names of the layers, by which servable model is split
+NORMALIZATION_LAYER = "normalization"
+RESIZING_LAYER = "resizing"
+
+
+@register_keras_serializable(package="BrainTumorDetection")
+class InputNormalization(Layer):
+    def __init__(self, mode="none", **kwargs):
+        """
+        Cast uint8 images to float32 and normalize them, as preprocess_input of keras.applications.
+
+        Args:
+            mode (str, optional): One of NORMALIZATIONS. Defaults to 'none'.
+        """
+        super().__init__(**kwargs)
+        if mode not in NORMALIZATIONS:
+            raise ValueError(f"Unknown normalization '{mode}', choose one of {NORMALIZATIONS}")
+        self.mode = mode
+
+    def call(self, images):
+        images = keras_ops.cast(images, "float32")
+        if self.mode == "tf":
+            return images / 127.5 - 1.0
+        if self.mode == "torch":
+            return (images / 255.0 - keras_ops.convert_to_tensor(TORCH_MEAN)) / keras_ops.convert_to_tensor(TORCH_STD)
+        if self.mode == "caffe":
+            return keras_ops.flip(images, axis=-1) - keras_ops.convert_to_tensor(CAFFE_MEAN)
+        return images
+
+    def compute_output_shape(self, input_shape):
+        return input_shape
+
+    def get_config(self):
+        return {**super().get_config(), "mode": self.mode}
+
+
+# passed to load_model, layers are found even if the file is loaded before this module is imported
+CUSTOM_OBJECTS = {"InputNormalization": InputNormalization}
+
+
+def build_servable(model, normalization="none"):
+    """
+    Wrap the model with normalization and resizing layers. Normalization is affine per channel,
+    so it runs before resizing - bilinear resizing of normalized image gives the same pixels.
+
+    Args:
+        model: Keras model taking preprocessed float32 images with shape (N, 224, 224, 3).
+        normalization (str, optional): One of NORMALIZATIONS. Defaults to 'none' (default EfficientNet model).
+
+    Returns:
+        keras.Model: Model taking uint8 images with shape (N, height, width, 3), of any height and width.
+    """
+    if is_servable(model):
+        raise ValueError("Model already takes raw uint8 images")
+    inputs = keras_Input(shape=(None, None, 3), dtype="uint8", name="image")
+    images = InputNormalization(normalization, name=NORMALIZATION_LAYER)(inputs)
+    images = Resizing(*INPUT_SHAPE, interpolation="bilinear", name=RESIZING_LAYER)(images)
+    return keras_Model(inputs, model(images), name=f"{model.name}_servable")
+
+
+def split_servable(model):
+    """
+    Split servable model into its preprocessing and the wrapped model, e.g. for Grad-CAM,
+    which needs layers of the wrapped model.
+
+    Returns:
+        tuple: (keras.Model from uint8 images to preprocessed batch, wrapped model),
+            (None, model) for models without preprocessing in the graph.
+    """
+    if not is_servable(model):
+        return None, model
+    preprocessing = keras_Model(model.inputs, model.get_layer(RESIZING_LAYER).output)
+    return preprocessing, model.layers[-1]
+
+
+def save_servable(model, path, normalization="none"):
+    """
+    Build servable model and save it as single '.keras' file, loaded by the registry as any other model.
+
+    Returns:
+        keras.Model: Saved servable model.
+    """
+    if not path.lower().endswith(".keras"):
+        raise ValueError("Servable model is saved as '.keras' file")
+    servable = build_servable(model, normalization)
+    servable.save(path)
+    return servable
+
+
+def compare(model, servable, paths, model_is_default=True):
+    """
+    Outputs of the servable model on raw images against the original model on images preprocessed
+    in Python. Small differences come from resizing of uint8 (cv2) and float32 (graph) pixels.
+
+    Returns:
+        dict: images, max_abs_diff of probabilities and agreement of predicted classes.
+    """
+    # lazy-loading
+    from cv2 import imread as cv2_imread
+    from numpy import abs as np_abs, argmax as np_argmax, mean as np_mean
+    from script.preprocessing import preprocess_image
+    from script.CompiledPredictor import compiled_predictor
+    max_abs_diff, agreement = 0.0, []
+    for path in paths:
+        image = cv2_imread(path)
+        if image is None:
+            continue
+        # custom models are compared with custom_preprocessing, which the servable replaces
+        expected = compiled_predictor(model).predict(preprocess_image(image, model_is_default))
+        actual = compiled_predictor(servable).predict(image[None])
+        max_abs_diff = max(max_abs_diff, float(np_abs(expected - actual).max()))
+        agreement.append(np_argmax(expected) == np_argmax(actual))
+    return {"images": len(agreement), "max_abs_diff": max_abs_diff,
+            "agreement": float(np_mean(agreement)) if agreement else 0.0}
+
+
+def main(argv=None):
+    from argparse import ArgumentParser
+    from script.ModelRegistry import registry, DEFAULT_MODEL_PATH
+    from script.batch_inference import list_images
+    parser = ArgumentParser(description="Save model with resizing and normalization in its graph.")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL_PATH, help="'.h5' or '.keras' model")
+    parser.add_argument("-n", "--normalization", choices=NORMALIZATIONS,
+                        help="defaults to 'none' for default model, 'caffe' (as shipped "
+                             "script/preprocess_input_custom.py) for other models")
+    parser.add_argument("-o", "--output", help="defaults to MODEL.servable.keras")
+    parser.add_argument("--check", metavar="DIRECTORY", help="compare outputs with the original model on images of DIRECTORY")
+    parser.add_argument("--samples", type=int, default=32, help="number of images compared by --check")
+    args = parser.parse_args(argv)
+
+    model_is_default = os_path.abspath(args.model) == os_path.abspath(DEFAULT_MODEL_PATH)
+    normalization = args.normalization or ("none" if model_is_default else "caffe")
+    output = args.output or f"{os_path.splitext(args.model)[0]}.servable.keras"
+    model = registry.get(args.model)
+    servable = save_servable(model, output, normalization)
+    print(f"Servable model ({normalization} normalization) saved to {output}", file=stderr)
+    if args.check:
+        report = compare(model, servable, list_images(args.check)[:args.samples], model_is_default)
+        print(f"Compared {report['images']} images: max abs diff {report['max_abs_diff']:.6f}, "
+              f"agreement {report['agreement']:.1%}", file=stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    import settings
+    raise SystemExit(main())
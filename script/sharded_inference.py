@@ -0,0 +1,212 @@
+"""Inference sharded across worker processes, each with its own copy of the model.
+
+usage:
+    python -m script.sharded_inference DIRECTORY [--model models/custom.keras] [--workers 4] [--report]
+
+In one process, decoding, preprocessing and dispatch of the model contend for the GIL. Here the
+list of images is split into shards, which worker processes decode, preprocess and classify
+independently. Every worker writes outputs straight into one result matrix in shared memory,
+so no tensor is pickled. Results are yielded in file order. With --report, throughput and scaling
+efficiency are measured for 1..N workers.
+"""
+from sys import stderr
+from time import perf_counter
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from os import cpu_count, path as os_path
+from cv2 import imread as cv2_imread
+from numpy import (
+    ndarray as np_ndarray,
+    array as np_array,
+    zeros as np_zeros,
+    nan as np_nan,
+    float32 as np_float32,
+    uint8 as np_uint8
+)
+from script.batch_inference import predict_batches, list_images, DEFAULT_BATCH_SIZE
+from script.preprocessing import resize_image, batch_preprocessor, INPUT_SHAPE
+from script.prefetch import DEFAULT_WORKERS
+from script.CompiledPredictor import compiled_predictor
+
+
+# shards per worker - smaller shards balance load when images differ in size
+SHARDS_PER_WORKER = 4
+
+# state of worker process, set by _init_worker
+_worker = {}
+
+
+def _init_worker(model_path, model_is_default, threads):
+    """Initializer of worker process - loads its own copy of the model."""
+    # lazy-loading - thread pools of tensorflow are configured before first operation
+    from tensorflow import config as tf_config
+    from script.ModelRegistry import registry
+    tf_config.threading.set_intra_op_parallelism_threads(threads)
+    tf_config.threading.set_inter_op_parallelism_threads(1)
+    model = registry.get(model_path)
+    _worker["model"] = compiled_predictor(model)
+    _worker["preprocess"] = batch_preprocessor(model, model_is_default)
+    _worker["decode_threads"] = min(DEFAULT_WORKERS, threads)
+
+
+def _num_classes():
+    """Number of outputs of the model, run in worker process."""
+    image = np_zeros((1, *INPUT_SHAPE, 3), dtype=np_uint8)
+    batch = _worker["preprocess"](image)
+    return int(_worker["model"].predict(batch).shape[-1])
+
+
+def _load_image(path):
+    image = cv2_imread(path)
+    return None if image is None else resize_image(image)
+
+
+def _run_shard(task):
+    """
+    Classify one shard in worker process, outputs are written into shared result matrix.
+
+    Args:
+        task (tuple): (name of result memory, shape of results, start, stop, paths of the shard, batch size)
+
+    Returns:
+        tuple: (start, stop, seconds)
+    """
+    output_name, output_shape, start, stop, paths, batch_size = task
+    begin = perf_counter()
+    output_memory = SharedMemory(name=output_name)
+    outputs = None
+    try:
+        outputs = np_ndarray(output_shape, dtype=np_float32, buffer=output_memory.buf)
+        for offset, batch_outputs in predict_batches(_worker["model"], paths, _load_image, batch_size,
+                                                     workers=_worker["decode_threads"],
+                                                     preprocess_batch=_worker["preprocess"]):
+            outputs[start + offset:start + offset + len(batch_outputs)] = batch_outputs
+    finally:
+        # views of shared memory have to be released before it is closed
+        outputs = None
+        output_memory.close()
+    return start, stop, perf_counter() - begin
+
+
+class ShardedPredictor():
+    def __init__(self, model_path, workers=None, model_is_default=True, batch_size=32):
+        """
+        Pool of worker processes, each loads the model once and keeps it for all runs.
+
+        Args:
+            model_path (str): Path to '.h5', '.keras' or '.tflite' file, loaded by every worker.
+            workers (int, optional): Number of processes. Defaults to number of CPUs.
+            model_is_default (bool, optional): Flag for preprocessing, as in BaseDetection. Defaults to True.
+            batch_size (int, optional): Number of images per forward pass in every worker. Defaults to 32.
+        """
+        self.workers = workers or cpu_count() or 1
+        self.batch_size = batch_size
+        # cpus are shared among workers, so workers do not oversubscribe them
+        threads = max(1, (cpu_count() or 1) // self.workers)
+        # spawn - tensorflow state of the parent is not inherited by workers
+        self._pool = get_context("spawn").Pool(self.workers, initializer=_init_worker,
+                                               initargs=(model_path, model_is_default, threads))
+        self.num_of_classes = self._pool.apply(_num_classes)
+
+    def _shards(self, count):
+        size = max(1, -(-count // (self.workers * SHARDS_PER_WORKER)))
+        return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+    def _run(self, count, make_task):
+        """Run shards, yield finished ranges of result rows in file order."""
+        output_shape = (count, self.num_of_classes)
+        output_memory = SharedMemory(create=True, size=max(1, count * self.num_of_classes * 4))
+        outputs = None
+        try:
+            outputs = np_ndarray(output_shape, dtype=np_float32, buffer=output_memory.buf)
+            outputs[:] = np_nan
+            tasks = [make_task(output_memory.name, output_shape, start, stop) for start, stop in self._shards(count)]
+            finished = {}
+            next_start = 0
+            for start, stop, _ in self._pool.imap_unordered(_run_shard, tasks):
+                finished[start] = stop
+                # shards finish out of order, results are handed over in file order
+                while next_start in finished:
+                    stop = finished.pop(next_start)
+                    yield next_start, np_array(outputs[next_start:stop])
+                    next_start = stop
+        finally:
+            # views of shared memory have to be released before it is closed
+            outputs = None
+            output_memory.close()
+            output_memory.unlink()
+
+    def predict_paths(self, paths):
+        """
+        Classify image files, decoded by workers.
+
+        Yields:
+            tuple: (index of the first image, outputs with shape (N, classes), NaN for images which failed to load)
+        """
+        paths = list(paths)
+        yield from self._run(len(paths), lambda name, shape, start, stop:
+                             (name, shape, start, stop, paths[start:stop], self.batch_size))
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def scaling_report(model_path, paths, max_workers=None, model_is_default=True, batch_size=32):
+    """
+    Throughput of sharded inference for 1..max_workers processes. Model loading is not measured.
+
+    Returns:
+        list[dict]: workers, seconds, images_per_second and efficiency (speedup divided by number of workers).
+    """
+    max_workers = max_workers or cpu_count() or 1
+    report = []
+    for workers in range(1, max_workers + 1):
+        with ShardedPredictor(model_path, workers, model_is_default, batch_size) as predictor:
+            start = perf_counter()
+            for _ in predictor.predict_paths(paths):
+                pass
+            seconds = perf_counter() - start
+        images_per_second = len(paths) / seconds if seconds > 0 else 0.0
+        base = report[0]["images_per_second"] if report else images_per_second
+        report.append({"workers": workers, "seconds": seconds, "images_per_second": images_per_second,
+                       "efficiency": images_per_second / (base * workers) if base else 0.0})
+    return report
+
+
+def main(argv=None):
+    from argparse import ArgumentParser
+    from script.ModelRegistry import DEFAULT_MODEL_PATH
+    parser = ArgumentParser(description="Classify directory tree by several worker processes.")
+    parser.add_argument("directory", help="directory with images, searched recursively")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("-w", "--workers", type=int, default=cpu_count() or 1, help="worker processes")
+    parser.add_argument("-b", "--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--report", action="store_true", help="measure scaling for 1..WORKERS processes")
+    args = parser.parse_args(argv)
+
+    model_is_default = os_path.abspath(args.model) == os_path.abspath(DEFAULT_MODEL_PATH)
+    paths = list_images(args.directory)
+    if args.report:
+        print("workers  images/s  efficiency", file=stderr)
+        for row in scaling_report(args.model, paths, args.workers, model_is_default, args.batch_size):
+            print(f"{row['workers']:>7}  {row['images_per_second']:>8.1f}  {row['efficiency']:>10.2f}", file=stderr)
+        return 0
+    with ShardedPredictor(args.model, args.workers, model_is_default, args.batch_size) as predictor:
+        start = perf_counter()
+        detections = 0
+        for _, outputs in predictor.predict_paths(paths):
+            detections += int((outputs.argmax(axis=1) == 1).sum())
+    print(f"Detected: {detections} / {len(paths)}, classification time: {perf_counter() - start}", file=stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    import settings
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+# qt-free support of 3D studies - '.npy' volumes (memory-mapped) and folders of 2D slices
+from os import (
+    scandir as os_scandir,
+    path as os_path
+)
+from math import ceil
+from cv2 import (
+    imread as cv2_imread,
+    cvtColor as cv2_cvtColor,
+    COLOR_GRAY2BGR as cv2_COLOR_GRAY2BGR
+)
+from numpy import (
+    load as np_load,
+    asarray as np_asarray,
+    sort as np_sort,
+    clip as np_clip,
+    isnan as np_isnan,
+    count_nonzero as np_count_nonzero,
+    uint8 as np_uint8,
+    float32 as np_float32
+)
+from script.batch_inference import predict_batches, list_images
+from script.preprocessing import resize_image
+from script.prefetch import DEFAULT_WORKERS
+
+
+VOLUME_EXTENSIONS = ('.npy',)
+# share of the highest slice scores averaged into score of the study
+TOP_FRACTION = 0.1
+THRESHOLD = 0.5
+
+
+def open_volume(path):
+    """
+    Open '.npy' volume without reading it - slices are read from disk when they are indexed.
+
+    Args:
+        path (str): Path to array of shape (slices, height, width) or (slices, height, width, channels).
+
+    Returns:
+        np.memmap: Volume.
+    """
+    volume = np_load(path, mmap_mode='r')
+    if volume.ndim not in (3, 4) or (volume.ndim == 4 and volume.shape[3] not in (1, 3)):
+        raise ValueError(f"{path}: expected shape (slices, height, width[, 1 or 3]), got {volume.shape}")
+    return volume
+
+
+class Study():
+    def __init__(self, path):
+        """
+        3D study - '.npy' volume or directory of 2D slices (sorted by name).
+
+        Args:
+            path (str): Path to '.npy' file or to directory with slices.
+        """
+        self.path = path
+        self.name = os_path.basename(os_path.normpath(path))
+        if os_path.isdir(path):
+            self.volume = None
+            self.slice_paths = list_images(path)
+        else:
+            self.volume = open_volume(path)
+            self.slice_paths = None
+        self._intensity_range = None
+
+    def __len__(self):
+        return len(self.slice_paths) if self.volume is None else len(self.volume)
+
+    def intensity_range(self):
+        """Minimum and maximum of the volume, computed slice by slice once, used to map slices to uint8."""
+        if self._intensity_range is None:
+            low, high = float('inf'), float('-inf')
+            for slice_ in self.volume:
+                low, high = min(low, float(slice_.min())), max(high, float(slice_.max()))
+            self._intensity_range = (low, high)
+        return self._intensity_range
+
+    def slice_image(self, idx):
+        """
+        Slice as uint8 BGR image, like image decoded by cv2.imread. Slices of '.npy' volumes which are
+        not uint8 are scaled by intensity range of the whole volume, so contrast is equal for all slices.
+
+        Returns:
+            ndarray or None: Image, None if the slice cannot be read.
+        """
+        if self.volume is None:
+            return cv2_imread(self.slice_paths[idx])
+        # only this slice is read from disk
+        slice_ = np_asarray(self.volume[idx])
+        if slice_.dtype != np_uint8:
+            low, high = self.intensity_range()
+            scale = 255.0 / (high - low) if high > low else 0.0
+            slice_ = np_clip((slice_.astype(np_float32) - low) * scale, 0, 255).astype(np_uint8)
+        if slice_.ndim == 3 and slice_.shape[2] == 1:
+            slice_ = slice_[:, :, 0]
+        return cv2_cvtColor(slice_, cv2_COLOR_GRAY2BGR) if slice_.ndim == 2 else slice_
+
+    def load_slice(self, idx):
+        """Slice decoded and resized for the model, None if it cannot be read."""
+        image = self.slice_image(idx)
+        return None if image is None else resize_image(image)
+
+
+def is_study(path):
+    """True for '.npy' file or directory which contains images."""
+    if os_path.isdir(path):
+        return bool(list_images(path))
+    return path.lower().endswith(VOLUME_EXTENSIONS)
+
+
+def find_studies(directory):
+    """
+    Names of studies inside the directory - '.npy' files and subdirectories with slices.
+
+    Returns:
+        list[str]: Sorted names, relative to the directory.
+    """
+    with os_scandir(directory) as entries:
+        return sorted(entry.name for entry in entries if is_study(entry.path))
+
+
+def predict_study(model, study, preprocess_batch=None, batch_size=32, workers=DEFAULT_WORKERS):
+    """
+    Stream slices of the study through batched inference. Slices are read and resized by loading
+    threads while the model runs, at most two batches of slices are held in memory.
+
+    Yields:
+        tuple: (index of the first slice of the batch, outputs of the model for the batch)
+    """
+    yield from predict_batches(model, range(len(study)), study.load_slice, batch_size,
+                               workers=workers, preprocess_batch=preprocess_batch)
+
+
+def aggregate_scores(scores, threshold=THRESHOLD, top_fraction=TOP_FRACTION):
+    """
+    Verdict of the study from tumor probabilities of its slices. Tumor is visible only in some
+    slices, so score of the study is the mean of its highest slice scores (top_fraction of slices,
+    at least one), not the mean of all slices.
+
+    Args:
+        scores (ndarray): Tumor probability of every slice, NaN for slices which failed.
+        threshold (float, optional): Probability from which slice and study are positive. Defaults to 0.5.
+        top_fraction (float, optional): Share of slices averaged. Defaults to 0.1.
+
+    Returns:
+        tuple: (score of the study - NaN if no slice was classified, number of positive slices)
+    """
+    scores = np_asarray(scores, dtype=np_float32)
+    scores = scores[~np_isnan(scores)]
+    if not len(scores):
+        return float('nan'), 0
+    top = np_sort(scores)[-max(1, ceil(top_fraction * len(scores))):]
+    return float(top.mean()), int(np_count_nonzero(scores >= threshold))
@@ -0,0 +1,56 @@
+# qt-free model warm-up, run in the background while start page is shown
+from time import perf_counter
+from script.ModelRegistry import registry, DEFAULT_MODEL_PATH
+### modules lazy-loaded
+# from script.CompiledPredictor import compiled_predictor
+# from numpy import zeros as np_zeros, uint8 as np_uint8
+# from script.preprocessing import batch_preprocessor
+# from script.GradCAM import shared_grad_cam
+
+
+# startup timings in seconds, e.g. {'library_loading': 1.2, 'model_loading': 3.4, 'warm_up': 0.8}
+STARTUP_TIMINGS = {}
+
+
+def record_timing(name, seconds):
+    """Store startup timing and print it, as run.py does with loading times."""
+    STARTUP_TIMINGS[name] = seconds
+    print(f"{name.replace('_', ' ').capitalize()} time: {seconds}")
+
+
+def warm_up_model(path=DEFAULT_MODEL_PATH, model_is_default=True):
+    """
+    Load the model into the registry and run one dummy 224x224 inference, so the first
+    prediction requested by the user does not pay for tracing of the graph. Grad-CAM of the model,
+    which single detection runs on DETECT, is built and traced as well.
+
+    Args:
+        path (str, optional): Path to the model file. Defaults to the default model.
+        model_is_default (bool, optional): Flag for preprocessing, as in BaseDetection.
+
+    Returns:
+        Loaded model, shared by the registry.
+    """
+    # lazy-loading
+    from numpy import zeros as np_zeros, uint8 as np_uint8
+    from script.preprocessing import batch_preprocessor, INPUT_SHAPE
+    from script.CompiledPredictor import compiled_predictor
+    start = perf_counter()
+    model = registry.get(path)
+    loaded = perf_counter()
+    record_timing("model_loading", loaded - start)
+    dummy = batch_preprocessor(model, model_is_default)([np_zeros((*INPUT_SHAPE, 3), dtype=np_uint8)])
+    # trace the same compiled forward pass, which is used by detection pages
+    compiled_predictor(model).predict(dummy)
+    warmed_up = perf_counter()
+    record_timing("warm_up", warmed_up - loaded)
+    try:
+        # lazy-loading
+        from script.GradCAM import shared_grad_cam
+        # the same instance and compiled function are used by DETECT of single detection
+        shared_grad_cam(model).predict_with_heatmap(dummy)
+    except Exception:
+        # model without convolutions - pages show Grad-CAM as unavailable
+        return model
+    record_timing("grad_cam_warm_up", perf_counter() - warmed_up)
+    return model
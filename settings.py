@@ -7,3 +7,21 @@ print("TF_CPP_MIN_LOG_LEVEL set to ", environ['TF_CPP_MIN_LOG_LEVEL'])
 # turnning off onednn from tensorflow
 environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 print("TF_ENABLE_ONEDNN_OPTS set to ", environ['TF_ENABLE_ONEDNN_OPTS'])
+
+# memory budget of models shared by detection pages (script/ModelRegistry.py)
+environ.setdefault('MODEL_MEMORY_BUDGET_MB', '2048')
+print("MODEL_MEMORY_BUDGET_MB set to ", environ['MODEL_MEMORY_BUDGET_MB'])
+
+# on-disk cache of detection results (script/ResultCache.py)
+environ.setdefault('RESULT_CACHE_PATH', 'cache/results.sqlite')
+environ.setdefault('RESULT_CACHE_MAX_ENTRIES', '200000')
+print("RESULT_CACHE_PATH set to ", environ['RESULT_CACHE_PATH'])
+
+# per-stage timing of detection, exported as Chrome trace (script/StageTracer.py)
+environ.setdefault('STAGE_TRACE', '0')
+environ.setdefault('STAGE_TRACE_PATH', 'cache/trace.json')
+print("STAGE_TRACE set to ", environ['STAGE_TRACE'])
+
+########## TUNING ###########
+# threads, oneDNN and batch size of this machine are written here by 'python -m script.autotune'
+########## TUNING ###########
@@ -0,0 +1,22 @@
+import pytest
+
+
+def build_small_model(conv=False):
+    """Small classifier of 224x224 images with two classes, built in a moment - stands for the real models.
+
+    Args:
+        conv (bool, optional): Add convolution layer, so the model has one for Grad-CAM. Defaults to False.
+    """
+    # lazy-loading - tests without keras are collected as well
+    from keras import Input, Model
+    from keras.layers import Conv2D, GlobalAveragePooling2D, Dense
+    inputs = Input(shape=(224, 224, 3))
+    features = Conv2D(4, 3, name="last_conv")(inputs) if conv else inputs
+    outputs = Dense(2, activation="softmax")(GlobalAveragePooling2D()(features))
+    return Model(inputs, outputs)
+
+
+@pytest.fixture(scope="session")
+def small_model():
+    """Builder of small models, every call gives a new model."""
+    return build_small_model
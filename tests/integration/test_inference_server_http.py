@@ -0,0 +1,62 @@
+from script.inference_server import InferenceService, make_server
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Event
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from json import loads
+from time import sleep, monotonic
+from unittest import mock
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def server():
+    model = mock.Mock()
+    batch_sizes = []
+    release = Event()
+    def predict(batch, **kwargs):
+        batch_sizes.append(len(batch))
+        # the first batch is held until the test releases it - requests arriving meanwhile form the next batch
+        release.wait(timeout=10)
+        return np.tile([0.2, 0.8], (len(batch), 1))
+    model.predict.side_effect = predict
+    service = InferenceService(model, preprocess=lambda images, out: out[:len(images)], max_delay=0.02)
+    server = make_server(service, port=0)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", batch_sizes, service, release
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+def post(url, data):
+    with urlopen(Request(url, data=data, method="POST"), timeout=10) as response:
+        return loads(response.read())
+
+def test_concurrent_clients_are_batched(server):
+    url, batch_sizes, service, release = server
+    with open("archive/test/Y_new.png", "rb") as file:
+        image = file.read()
+    with ThreadPoolExecutor(32) as executor:
+        futures = [executor.submit(post, f"{url}/predict", image) for _ in range(32)]
+        # every request is queued while the first batch is blocked in the model
+        deadline = monotonic() + 10
+        while service.predict_batcher.metrics()["requests"] < 32 and monotonic() < deadline:
+            sleep(0.005)
+        release.set()
+        results = [future.result() for future in futures]
+    assert all(result["result"] == "DETECTED" for result in results)
+    assert sum(batch_sizes) == 32
+    assert max(batch_sizes) > 1
+    with urlopen(f"{url}/metrics", timeout=10) as response:
+        metrics = loads(response.read())["predict"]
+    assert metrics["requests"] == 32
+    assert metrics["batches"] == len(batch_sizes)
+    assert metrics["queue_depth"] == 0
+
+def test_invalid_image(server):
+    url, _, _, release = server
+    release.set()
+    with pytest.raises(HTTPError) as error:
+        post(f"{url}/predict", b"not an image")
+    assert error.value.code == 400
@@ -3,13 +3,48 @@ from PyQt5.QtWidgets import QApplication
 import numpy as np
 app = QApplication([])
 
-def test_integration_multiple_detection(mocker):
+def test_integration_multiple_detection(mocker, qtbot):
     md = MultipleDetection(None)
     mocker.patch('app.MultipleDetection.QFileDialog.getExistingDirectory', return_value="archive/test")
-    mocker.patch.object(md, 'preprocess_image', return_value=np.ones((1, 224, 224, 3)))
+    mocker.patch.object(md, 'preprocess_batch', side_effect=lambda images, out=None: np.ones((len(images), 224, 224, 3)))
     mock_model = mocker.Mock()
-    mock_model.predict.side_effect = [[[0.1, 0.9]], [[0.9, 0.1]], [[0.1, 0.9]]]
+    # all three images fit into a single batch
+    mock_model.predict.return_value = [[0.1, 0.9], [0.9, 0.1], [0.1, 0.9]]
     md.model = mock_model
     md.browse_for_img()
-    md.detect_tumor()
-    assert md.result.text() == "Detected: 2 / 3"
\ No newline at end of file
+    with qtbot.waitSignal(md.detection_finished, timeout=5000):
+        md.detect_tumor()
+    assert md.result.text() == "Detected: 2 / 3"
+    assert mock_model.predict.call_count == 1
+
+def test_integration_multiple_detection_tail_batch(mocker, qtbot):
+    md = MultipleDetection(None, batch_size=2)
+    mocker.patch('app.MultipleDetection.QFileDialog.getExistingDirectory', return_value="archive/test")
+    mocker.patch.object(md, 'preprocess_batch', side_effect=lambda images, out=None: np.ones((len(images), 224, 224, 3)))
+    mock_model = mocker.Mock()
+    mock_model.predict.side_effect = [[[0.1, 0.9], [0.9, 0.1]], [[0.1, 0.9]]]
+    md.model = mock_model
+    md.browse_for_img()
+    with qtbot.waitSignal(md.detection_finished, timeout=5000):
+        md.detect_tumor()
+    assert mock_model.predict.call_count == 2
+    assert md.result.text() == "Detected: 2 / 3"
+    assert md.progress_bar.value() == 3
+
+def test_integration_multiple_detection_cancel(mocker, qtbot):
+    md = MultipleDetection(None, batch_size=1)
+    mocker.patch('app.MultipleDetection.QFileDialog.getExistingDirectory', return_value="archive/test")
+    mocker.patch.object(md, 'preprocess_batch', side_effect=lambda images, out=None: np.ones((len(images), 224, 224, 3)))
+    mock_model = mocker.Mock()
+    def predict(batch, **kwargs):
+        # user cancels while first batch is being classified
+        md.cancel_event.set()
+        return [[0.1, 0.9]]
+    mock_model.predict.side_effect = predict
+    md.model = mock_model
+    md.browse_for_img()
+    with qtbot.waitSignal(md.detection_finished, timeout=5000) as blocker:
+        md.detect_tumor()
+    assert blocker.args == [1, True]
+    assert md.result.text() == "Cancelled. Detected: 1 / 1 of 3"
+    assert md.detect.text() == "DETECT"
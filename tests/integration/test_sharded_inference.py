@@ -0,0 +1,34 @@
+from script.sharded_inference import ShardedPredictor, scaling_report
+from script.batch_inference import list_images, predict_batches
+from script.preprocessing import resize_image, preprocess_batch
+import numpy as np
+import cv2
+import pytest
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory, small_model):
+    path = str(tmp_path_factory.mktemp("models") / "small.keras")
+    small_model().save(path)
+    return path
+
+def test_results_in_file_order(model_path):
+    paths = list_images("archive/test") * 5 + ["archive/test/missing.png"]
+    with ShardedPredictor(model_path, workers=2, model_is_default=False, batch_size=4) as predictor:
+        results = list(predictor.predict_paths(paths))
+    assert [start for start, _ in results] == sorted(start for start, _ in results)
+    outputs = np.concatenate([outputs for _, outputs in results])
+    assert outputs.shape == (len(paths), 2)
+    assert np.isnan(outputs[-1]).all()
+    # same outputs as single process
+    from keras.models import load_model
+    model = load_model(model_path, compile=False)
+    expected = np.concatenate([batch for _, batch in predict_batches(
+        model, paths[:-1], lambda path: resize_image(cv2.imread(path)), 4,
+        preprocess_batch=lambda images, out: preprocess_batch(images, False, out))])
+    assert np.allclose(outputs[:-1], expected, atol=1e-5)
+
+def test_scaling_report(model_path):
+    report = scaling_report(model_path, list_images("archive/test"), max_workers=2, model_is_default=False)
+    assert [row["workers"] for row in report] == [1, 2]
+    assert report[0]["efficiency"] == pytest.approx(1.0)
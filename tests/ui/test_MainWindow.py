@@ -7,4 +7,14 @@ def test_navigation():
     main_window = MainWindow()
     assert main_window.stacked_widget.currentWidget() == main_window.start_page
     main_window.show_page("SinglePage")
-    assert main_window.stacked_widget.currentWidget() == main_window.single_page
\ No newline at end of file
+    assert main_window.stacked_widget.currentWidget() == main_window.single_page
+
+def test_detection_pages_built_on_first_use():
+    main_window = MainWindow(warm_up=False)
+    assert main_window.single_page is None and main_window.multi_page is None
+    main_window.show_page("MultiPage")
+    multi_page = main_window.multi_page
+    main_window.show_page("Start")
+    main_window.show_page("MultiPage")
+    assert main_window.multi_page is multi_page
+    assert main_window.single_page is None
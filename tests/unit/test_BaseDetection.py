@@ -1,7 +1,8 @@
 import pytest
-from app.BaseDetection import BaseDetection
+from app.BaseDetection import BaseDetection, as_qimage
 import numpy as np
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage
 
 app = QApplication([])
 
@@ -23,4 +24,13 @@ def test_preprocess_image():
     bd.load_model_()
     dummy_image = np.ones((256, 256, 3), dtype=np.uint8)
     processed_image = bd.preprocess_image(dummy_image)
-    assert processed_image.shape == (1, 224, 224, 3)
\ No newline at end of file
+    assert processed_image.shape == (1, 224, 224, 3)
+def test_as_qimage_without_copy():
+    image = np.zeros((30, 40, 3), dtype=np.uint8)
+    q_image, pixels = as_qimage(image)
+    assert pixels is image
+    assert (q_image.width(), q_image.height()) == (40, 30)
+    # view with padded rows is wrapped too, channel view is copied
+    assert as_qimage(image[:, :20])[1].base is image
+    assert as_qimage(image[:, :, ::-1])[1].flags['C_CONTIGUOUS']
+    assert as_qimage(np.zeros((30, 40), dtype=np.float32))[0].format() == QImage.Format_Grayscale8
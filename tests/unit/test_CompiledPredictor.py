@@ -0,0 +1,23 @@
+from script.CompiledPredictor import compiled_predictor, CompiledPredictor
+from unittest import mock
+import numpy as np
+
+
+def test_matches_keras_predict(small_model):
+    model = small_model()
+    images = np.random.rand(3, 224, 224, 3).astype(np.float32)
+    outputs = compiled_predictor(model).predict(images)
+    assert np.allclose(outputs, model.predict(images, verbose=0), atol=1e-5)
+
+def test_traced_once_per_shape(small_model):
+    model = small_model()
+    predictor = compiled_predictor(model)
+    assert compiled_predictor(model) is predictor
+    for batch_size in (1, 1, 4):
+        predictor.predict(np.zeros((batch_size, 224, 224, 3), dtype=np.float32))
+    assert len(predictor._functions) == 1
+    assert predictor._functions[((224, 224, 3), "float32")].experimental_get_tracing_count() == 1
+
+def test_other_models_unchanged():
+    model = mock.Mock()
+    assert compiled_predictor(model) is model
@@ -0,0 +1,32 @@
+from script.Ensemble import Ensemble, split_outputs
+from unittest import mock
+import numpy as np
+
+
+def constant_model(probability):
+    model = mock.Mock()
+    model.predict.side_effect = lambda batch: np.tile([1 - probability, probability], (len(batch), 1))
+    return model
+
+def test_preprocessing_once_per_flag(mocker):
+    preprocess = mocker.patch('script.Ensemble.preprocess_batch', side_effect=lambda batch, flag, out: out[:len(batch)])
+    ensemble = Ensemble([("a", constant_model(0.2), True, None),
+                         ("b", constant_model(0.6), False, None),
+                         ("c", constant_model(0.7), True, None)])
+    batch = ensemble.stack([np.full((224, 224, 3), idx, dtype=np.uint8) for idx in range(3)])
+    assert batch.dtype == np.uint8 and batch[2, 0, 0, 0] == 2
+    outputs = ensemble.predict(batch)
+    assert preprocess.call_count == 2
+    combined, members = split_outputs(outputs, 3)
+    assert np.allclose(members, [[0.2, 0.6, 0.7]] * 3)
+    assert np.allclose(combined[:, 1], 0.5)
+
+def test_weighted_combination(mocker):
+    mocker.patch('script.Ensemble.preprocess_batch', side_effect=lambda batch, flag, out: out[:len(batch)])
+    ensemble = Ensemble([("a", constant_model(0.0), True, None),
+                         ("b", constant_model(1.0), True, None)], weights=[1, 3])
+    combined, _ = split_outputs(ensemble.predict(ensemble.stack([np.zeros((224, 224, 3), dtype=np.uint8)])), 2)
+    assert np.allclose(combined, [[0.25, 0.75]])
+
+def test_fingerprint_needs_model_files():
+    assert Ensemble([("a", constant_model(0.5), True, None)]).fingerprint() is None
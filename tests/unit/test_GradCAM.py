@@ -14,4 +14,33 @@ def test_generate_heatmap():
     grad_cam = GradCAM(model)
     dummy_image = np.ones((1, 224, 224, 3), dtype=np.float32)
     heatmap = grad_cam.generate_heatmap(dummy_image, class_index=1)
-    assert heatmap.shape != ()
\ No newline at end of file
+    assert heatmap.shape != ()
+def test_generate_heatmaps_batch():
+    model = load_model("models/EfficientNet.keras")
+    grad_cam = GradCAM(model)
+    dummy_images = np.ones((3, 224, 224, 3), dtype=np.float32)
+    heatmaps = grad_cam.generate_heatmaps(dummy_images, [0, 1, 1])
+    assert heatmaps.shape[0] == 3
+    assert heatmaps.max() <= 1.0
+    # shared model is left untouched
+    assert grad_cam.model.layers[-1].activation is not None
+
+def test_predict_with_heatmap():
+    model = load_model("models/EfficientNet.keras")
+    grad_cam = GradCAM(model)
+    dummy_images = np.ones((2, 224, 224, 3), dtype=np.float32)
+    probabilities, class_indices, heatmaps = grad_cam.predict_with_heatmap(dummy_images)
+    assert np.allclose(probabilities, model.predict(dummy_images), atol=1e-4)
+    assert (class_indices == probabilities.argmax(axis=1)).all()
+    assert heatmaps.shape[0] == 2
+
+def test_servable_model():
+    from script.servable import build_servable
+    model = load_model("models/EfficientNet.keras")
+    grad_cam = GradCAM(build_servable(model))
+    # raw image of any size, preprocessing runs in the graph
+    images = np.random.randint(0, 255, (2, 300, 260, 3), dtype=np.uint8)
+    probabilities, class_indices, heatmaps = grad_cam.predict_with_heatmap(images)
+    assert probabilities.shape == (2, 2)
+    assert grad_cam.last_conv_layer_name == "top_conv"
+    assert heatmaps.max() <= 1.0
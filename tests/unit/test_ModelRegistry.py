@@ -0,0 +1,45 @@
+from script.ModelRegistry import ModelRegistry
+from unittest import mock
+from os import utime
+
+
+class FakeModel():
+    def __init__(self, memory_bytes):
+        self.memory_bytes = memory_bytes
+
+
+def test_model_loaded_once(tmp_path):
+    path = tmp_path / "model.keras"
+    path.write_bytes(b"weights")
+    loader = mock.Mock(return_value=FakeModel(10))
+    registry = ModelRegistry(memory_budget=100)
+    first = registry.get(str(path), loader)
+    second = registry.get(str(path), loader)
+    assert first is second
+    assert loader.call_count == 1
+    assert registry.memory_usage() == 10
+
+def test_replaced_file_is_reloaded(tmp_path):
+    path = tmp_path / "model.keras"
+    path.write_bytes(b"weights")
+    registry = ModelRegistry(memory_budget=100)
+    first = registry.get(str(path), lambda p: FakeModel(10))
+    path.write_bytes(b"new weights")
+    utime(path, ns=(0, 10 ** 9))
+    second = registry.get(str(path), lambda p: FakeModel(10))
+    assert first is not second
+    assert len(registry.summary()) == 1
+
+def test_lru_eviction(tmp_path):
+    paths = []
+    for name in ("a.h5", "b.h5", "c.h5"):
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+    registry = ModelRegistry(memory_budget=25)
+    registry.get(paths[0], lambda p: FakeModel(10))
+    registry.get(paths[1], lambda p: FakeModel(10))
+    # touch 'a', so 'b' becomes least recently used
+    registry.get(paths[0], lambda p: FakeModel(10))
+    registry.get(paths[2], lambda p: FakeModel(10))
+    assert [p for p, _ in registry.summary()] == [paths[0], paths[2]]
@@ -1,18 +1,99 @@
 from app.MultipleDetection import MultipleDetection
 from PyQt5.QtWidgets import QApplication
+import numpy as np
 
 app = QApplication([])
 
-def test_browse_for_images(mocker):
+def test_browse_for_images(mocker, tmp_path):
     md = MultipleDetection(None)
-    mocker.patch('app.MultipleDetection.QFileDialog.getExistingDirectory', return_value="../../archive/test/")
-    mocker.patch('os.listdir', return_value=["image1.jpg", "image2.jpg"])
+    for name in ("image1.jpg", "image2.jpg", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    mocker.patch('app.MultipleDetection.QFileDialog.getExistingDirectory', return_value=str(tmp_path))
     md.browse_for_img()
-    assert len(md.filenames) == 2
+    assert md.filenames == ["image1.jpg", "image2.jpg"]
 
-def test_export_to_csv(mocker):
+def test_watch_results_appended(mocker, tmp_path):
     md = MultipleDetection(None)
-    mocker.patch('app.MultipleDetection.QFileDialog.getSaveFileName', return_value=("output.csv", ""))
-    md.table_model.setItem(0, 0, mocker.Mock(text="image1.jpg"))
-    md.table_model.setItem(0, 1, mocker.Mock(text="No Tumor"))
-    md.export_to_csv()
\ No newline at end of file
+    (tmp_path / "image1.jpg").write_bytes(b"")
+    mocker.patch('app.MultipleDetection.QFileDialog.getExistingDirectory', return_value=str(tmp_path))
+    md.browse_for_img()
+    md.update_watch_table(["image2.jpg", "image1.jpg"], np.array([[0.2, 0.8], [0.9, 0.1]]), 0.01)
+    assert md.filenames == ["image1.jpg", "image2.jpg"]
+    assert md.table_model.rowCount() == 2
+    assert md.detected_rows() == [1]
+
+def test_export_to_csv(mocker, tmp_path):
+    md = MultipleDetection(None)
+    output = tmp_path / "output.csv"
+    mocker.patch('app.MultipleDetection.QFileDialog.getSaveFileName', return_value=(str(output), ""))
+    mocker.patch('app.MultipleDetection.QMessageBox.information')
+    md.table_model.set_filenames(["image1.jpg", "image2.jpg", "image3.jpg"])
+    md.update_detection_table(0, np.array([[0.9, 0.1], [0.2, 0.8]]), 0.01)
+    md.export_to_csv()
+    assert output.read_text().splitlines() == ["File Name,Detection Result,Tumor Probability",
+                                               "image1.jpg,0,0.100000",
+                                               "image2.jpg,1,0.800000",
+                                               "image3.jpg,N/A,"]
+    assert md.num_of_detections == 1
+
+def test_ensemble_results(mocker):
+    md = MultipleDetection(None)
+    md.ensemble = mocker.Mock(members=[None, None])
+    md.table_model.set_filenames(["image1.jpg", "image2.jpg"])
+    md.table_model.set_members(["EfficientNet", "VGG_16"])
+    # outputs of both models followed by combined outputs
+    md.update_detection_table(0, np.array([[0.4, 0.6, 0.6, 0.4, 0.5, 0.5], 
+                                           [0.1, 0.9, 0.3, 0.7, 0.2, 0.8]]), 0.01)
+    assert np.allclose(md.table_model.probabilities, [0.5, 0.8])
+    assert np.allclose(md.table_model.member_probabilities, [[0.6, 0.4], [0.9, 0.7]])
+    assert md.num_of_detections == 1
+
+def test_broken_file_gives_failed_row(mocker, tmp_path):
+    from app.MultipleDetection import load_image
+    from app.ResultsTableModel import DETECTED, FAILED
+    from threading import Event
+    import cv2
+    cv2.imwrite(str(tmp_path / "image1.png"), np.zeros((64, 64, 3), dtype=np.uint8))
+    (tmp_path / "image2.png").write_bytes(b"not an image")
+    paths = [str(tmp_path / "image1.png"), str(tmp_path / "image2.png")]
+    assert load_image(paths[0]).shape == (224, 224, 3)
+    assert load_image(paths[1]) is None
+    md = MultipleDetection(None)
+    model = mocker.Mock()
+    model.predict.side_effect = lambda batch, **kwargs: np.tile([0.2, 0.8], (len(batch), 1))
+    mocker.patch.object(md, 'detection_model', return_value=(model, lambda images, out=None: out[:len(images)]))
+    mocker.patch.object(md, 'result_cache', return_value=(None, None))
+    md.filenames = ["image1.png", "image2.png"]
+    md.table_model.set_filenames(md.filenames)
+    md.detection_rows = [0, 1]
+    # detection goes on, broken file is reported in its row
+    md.run_detection(paths, Event())
+    assert md.table_model.labels.tolist() == [DETECTED, FAILED]
+    assert md.num_of_detections == 1
+
+def test_show_image_opens_gallery(mocker, tmp_path):
+    md = MultipleDetection(None)
+    for name in ("image1.jpg", "image2.jpg"):
+        (tmp_path / name).write_bytes(b"")
+    mocker.patch('app.MultipleDetection.QFileDialog.getExistingDirectory', return_value=str(tmp_path))
+    gallery = mocker.patch('app.MultipleDetection.GalleryViewer')
+    md.browse_for_img()
+    md.table.selectRow(1)
+    md.show_image()
+    items, current = gallery.return_value.set_items.call_args[0]
+    assert [item[0] for item in items] == ["image1.jpg", "image2.jpg"]
+    assert current == 1
+    md.show_image()
+    assert gallery.call_count == 1
+
+def test_stage_breakdown_in_progress_bar(mocker):
+    from script.StageTracer import tracer
+    md = MultipleDetection(None)
+    mocker.patch.object(tracer, 'enabled', True)
+    tracer.reset()
+    tracer.record("predict", 0, 3_000_000)
+    tracer.record("imread", 0, 1_000_000)
+    md.update_detection_progress(5, "10.0 img/s, ETA 0:00:01")
+    assert md.progress_bar.format().endswith("predict 75% · imread 25%")
+    assert "predict" in md.progress_bar.toolTip()
+    tracer.reset()
@@ -0,0 +1,51 @@
+from script.ResultCache import ResultCache, hash_file, model_fingerprint
+from script.batch_inference import predict_batches
+import numpy as np
+from unittest import mock
+
+
+def test_hit_and_miss():
+    cache = ResultCache(":memory:")
+    assert cache.get("image", "model") is None
+    cache.put("image", "model", np.array([0.1, 0.9]))
+    assert np.allclose(cache.get("image", "model"), [0.1, 0.9])
+    # other model does not share results
+    assert cache.get("image", "other model") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_lru_eviction():
+    cache = ResultCache(":memory:", max_entries=2)
+    cache.put("a", "model", [1.0, 0.0])
+    cache.put("b", "model", [1.0, 0.0])
+    cache.get("a", "model")
+    cache.put("c", "model", [1.0, 0.0])
+    assert len(cache) == 2
+    assert cache.get("b", "model") is None
+    assert cache.get("a", "model") is not None
+
+def test_fingerprint_changes_with_model_file(tmp_path):
+    path = tmp_path / "model.keras"
+    path.write_bytes(b"weights")
+    first = model_fingerprint(str(path))
+    assert first != model_fingerprint(str(path), model_is_default=False)
+    path.write_bytes(b"new weights!")
+    assert first != model_fingerprint(str(path))
+
+def test_predict_batches_skips_cached_images(tmp_path):
+    paths = []
+    for name in ("a.png", "b.png"):
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+    cache = ResultCache(":memory:")
+    cache.put(hash_file(paths[0]), "model", [0.2, 0.8])
+    model = mock.Mock()
+    model.predict.side_effect = lambda batch, **kwargs: np.tile([0.9, 0.1], (len(batch), 1))
+    load_image = mock.Mock(return_value=np.ones((1, 224, 224, 3)))
+    [(start, outputs)] = predict_batches(model, paths, load_image, cache=cache, model_fingerprint="model")
+    assert load_image.call_count == 1
+    assert np.allclose(outputs, [[0.2, 0.8], [0.9, 0.1]])
+    # second run is served from the cache only
+    list(predict_batches(model, paths, load_image, cache=cache, model_fingerprint="model"))
+    assert model.predict.call_count == 1
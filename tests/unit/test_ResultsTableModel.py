@@ -0,0 +1,84 @@
+from app.ResultsTableModel import ResultsTableModel, DETECTED, NO_TUMOR, FAILED
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import Qt
+import numpy as np
+
+app = QApplication([])
+
+def filled_model():
+    model = ResultsTableModel()
+    model.set_filenames(["c.png", "a.png", "b.png", "d.png"])
+    model.update_results(0, np.array([[0.2, 0.8], [0.9, 0.1]]), 0.01)
+    model.update_results(2, np.array([[0.4, 0.6], [np.nan, np.nan]]), 0.02)
+    return model
+
+def column(model, col):
+    return [model.data(model.index(row, col)) for row in range(model.rowCount())]
+
+def test_batch_update():
+    model = filled_model()
+    assert column(model, 1) == ["DETECTED", "No Tumor", "DETECTED", "N/A"]
+    assert column(model, 2) == ["0.8000", "0.1000", "0.6000", ""]
+    assert model.labels.tolist() == [DETECTED, NO_TUMOR, DETECTED, FAILED]
+
+def test_sort_and_filter():
+    model = filled_model()
+    model.sort(0, Qt.AscendingOrder)
+    assert column(model, 0) == ["a.png", "b.png", "c.png", "d.png"]
+    model.sort(2, Qt.DescendingOrder)
+    # failed image without probability stays last
+    assert column(model, 0) == ["c.png", "b.png", "a.png", "d.png"]
+    model.set_label_filter(DETECTED)
+    assert column(model, 0) == ["c.png", "b.png"]
+    assert model.storage_row(1) == 2
+    model.set_label_filter(None)
+    model.sort(-1)
+    assert column(model, 0) == ["c.png", "a.png", "b.png", "d.png"]
+
+def test_user_correction():
+    model = filled_model()
+    assert model.setData(model.index(1, 1), "yes")
+    assert not model.setData(model.index(1, 1), "maybe")
+    assert model.rows_with_label(DETECTED) == [0, 1, 2]
+
+def test_append_results():
+    model = filled_model()
+    model.append_results(["e.png", "a.png"], np.array([[0.3, 0.7], [0.1, 0.9]]), 0.01)
+    assert model.rowCount() == 5
+    assert column(model, 0)[-1] == "e.png"
+    assert model.rows_with_label(DETECTED) == [0, 1, 2, 4]
+
+def test_study_result():
+    model = filled_model()
+    model.set_study_result(3, np.array([0.1, 0.9, 0.8]), 0.9, 2, 1.5)
+    assert model.data(model.index(3, 1)) == "DETECTED"
+    assert model.data(model.index(3, 3)) == "2 / 3"
+    assert "0.90" in model.data(model.index(3, 0), Qt.ToolTipRole)
+    assert model.data(model.index(0, 3)) == ""
+
+def test_ensemble_columns():
+    model = filled_model()
+    model.set_members(["EfficientNet", "VGG_16"])
+    assert model.columnCount() == 7
+    assert model.headerData(6, Qt.Horizontal) == "VGG_16 Probability"
+    model.update_results(0, np.array([[0.3, 0.7], [0.8, 0.2]]), 0.01, np.array([[0.6, 0.8], [0.1, 0.3]]))
+    assert column(model, 1)[:2] == ["DETECTED", "No Tumor"]
+    assert column(model, 6) == ["0.8000", "0.3000", "", ""]
+    model.sort(5, Qt.DescendingOrder)
+    assert column(model, 0) == ["c.png", "a.png", "b.png", "d.png"]
+
+def test_filter_resets_model():
+    model = filled_model()
+    resets, layouts = [], []
+    model.modelReset.connect(lambda: resets.append(model.rowCount()))
+    model.layoutChanged.connect(lambda: layouts.append(model.rowCount()))
+    model.set_label_filter(DETECTED)
+    assert resets == [2]
+    # results written while filtering change number of visible rows
+    model.update_results(1, np.array([[0.3, 0.7]]), 0.01)
+    assert resets == [2, 3]
+    # re-sort keeps rows, only their order changes
+    model.sort(2, Qt.AscendingOrder)
+    assert resets == [2, 3]
+    assert layouts == [3]
+    assert column(model, 0) == ["b.png", "a.png", "c.png"]
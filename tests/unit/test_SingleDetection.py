@@ -20,3 +20,40 @@ def test_detect_tumor(mocker):
     sd.original_image = np.ones((224, 224, 3), dtype=np.uint8)
     sd.detect_tumor()
     assert sd.result.text() == "DETECTED"
+
+def test_detect_tumor_computes_heatmap_once(mocker):
+    sd = SingleDetection(None)
+    mocker.patch.object(sd, 'preprocess_image', return_value=np.ones((1, 224, 224, 3)))
+    sd.model = mock.Mock()
+    grad_cam_alg = mock.Mock()
+    grad_cam_alg.predict_with_heatmap.return_value = (np.array([[0.1, 0.9]]), np.array([1]), np.ones((1, 7, 7)))
+    grad_cam_alg.overlay_heatmap_on_image.return_value = np.zeros((224, 224, 3), dtype=np.uint8)
+    sd.grad_cam_alg = grad_cam_alg
+    sd.grad_cam_model = sd.model
+    sd.original_image = np.ones((224, 224, 3), dtype=np.uint8)
+    sd.detect_tumor()
+    assert sd.result.text() == "DETECTED"
+    sd.apply_grad_cam(True)
+    sd.apply_grad_cam(True)
+    # heatmap comes from detection, no second pass through the model
+    sd.model.predict.assert_not_called()
+    grad_cam_alg.generate_heatmap.assert_not_called()
+    assert grad_cam_alg.overlay_heatmap_on_image.call_count == 1
+
+def test_image_decoded_once(mocker):
+    sd = SingleDetection(None)
+    mocker.patch('app.SingleDetection.QFileDialog.getOpenFileName', return_value=("archive/test/Y_new.png", ""))
+    imread = mocker.patch('app.SingleDetection.cv2_imread', return_value=np.zeros((600, 400, 3), dtype=np.uint8))
+    sd.browse_for_img()
+    original = sd.image.pixmap().cacheKey()
+    sd.detection_result = 1
+    sd.heatmap = np.ones((7, 7))
+    sd.grad_cam_alg = mock.Mock()
+    sd.grad_cam_alg.overlay_heatmap_on_image.return_value = np.zeros((600, 400, 3), dtype=np.uint8)
+    sd.grad_cam_model = sd.model
+    sd.apply_grad_cam(True)
+    assert sd.image.pixmap().height() == 480
+    sd.apply_grad_cam(False)
+    # scaled pixmap is reused, file is not read again
+    assert sd.image.pixmap().cacheKey() == original
+    assert imread.call_count == 1
@@ -0,0 +1,53 @@
+from script.StageTracer import StageTracer
+from threading import Thread
+import json
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = StageTracer(enabled=False)
+    with tracer.span("predict"):
+        pass
+    # one shared no-op span, nothing is allocated per block
+    assert tracer.span("imread") is tracer.span("predict")
+    assert tracer.summary() == []
+    assert tracer.breakdown() == ""
+
+def test_summary_and_breakdown():
+    tracer = StageTracer(enabled=True)
+    tracer.record("predict", 0, 3_000_000)
+    tracer.record("predict", 5_000_000, 3_000_000)
+    tracer.record("imread", 0, 2_000_000)
+    name, count, total, mean = tracer.summary()[0]
+    assert (name, count) == ("predict", 2)
+    assert abs(total - 0.006) < 1e-9 and abs(mean - 0.003) < 1e-9
+    assert tracer.breakdown() == "predict 75% · imread 25%"
+    tracer.reset()
+    assert tracer.summary() == []
+
+def test_chrome_trace_export(tmp_path):
+    tracer = StageTracer(enabled=True)
+    def work():
+        with tracer.span("resize", images=4):
+            pass
+    thread = Thread(target=work, name="prefetch_0")
+    thread.start()
+    thread.join()
+    with tracer.span("predict"):
+        pass
+    path = tracer.export_chrome_trace(str(tmp_path / "trace" / "trace.json"))
+    trace = json.loads(open(path).read())
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [event["name"] for event in spans] == ["resize", "predict"]
+    assert spans[0]["args"] == {"images": 4}
+    assert spans[0]["tid"] != spans[1]["tid"]
+    assert all(event["dur"] >= 0 and event["ts"] >= 0 for event in spans)
+    threads = {event["args"]["name"] for event in trace["traceEvents"] if event["ph"] == "M"}
+    assert "prefetch_0" in threads
+
+def test_events_are_bounded():
+    tracer = StageTracer(enabled=True, max_events=3)
+    for idx in range(10):
+        tracer.record("predict", idx, 1)
+    assert len(tracer.chrome_trace()["traceEvents"]) == 3 + 1
+    # totals count every span
+    assert tracer.summary()[0][1] == 10
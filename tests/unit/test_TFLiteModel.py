@@ -0,0 +1,39 @@
+from script.TFLiteModel import TFLiteModel, convert
+import numpy as np
+from unittest import mock
+
+
+def test_float16_matches_keras(small_model):
+    model = small_model()
+    tflite_model = TFLiteModel(model_content=convert(model, "float16"))
+    images = np.random.rand(3, 224, 224, 3).astype(np.float32)
+    outputs = tflite_model.predict(images)
+    assert outputs.shape == (3, 2)
+    assert np.allclose(outputs, model.predict(images, verbose=0), atol=1e-2)
+    # batch size changes between calls
+    assert tflite_model.predict(images[:1]).shape == (1, 2)
+
+def test_tflite_file_loaded_by_registry(tmp_path, small_model):
+    from script.ModelRegistry import ModelRegistry
+    path = tmp_path / "model.tflite"
+    TFLiteModel(model_content=convert(small_model(), "float16")).save(str(path))
+    model = ModelRegistry().get(str(path))
+    assert isinstance(model, TFLiteModel)
+    assert model.predict(np.zeros((2, 224, 224, 3), dtype=np.float32)).shape == (2, 2)
+
+def test_compare_skips_labels_of_unreadable_images(mocker):
+    from script import TFLiteModel as tflite_module
+    paths = ["data/yes/broken.png", "data/no/1.png", "data/yes/2.png"]
+    decoded = {"data/no/1.png": np.zeros((8, 8, 3), dtype=np.uint8), "data/yes/2.png": np.full((8, 8, 3), 255, dtype=np.uint8)}
+    mocker.patch.object(tflite_module, "list_images", return_value=paths)
+    mocker.patch.object(tflite_module, "cv2_imread", side_effect=decoded.get)
+    mocker.patch.object(tflite_module, "preprocess_batch", side_effect=lambda images, model_is_default: np.stack(images).astype(np.float32))
+    # bright image is a tumor, so every prediction is correct when labels follow the decoded images
+    classify = lambda batch, **kwargs: np.stack([1 - batch.mean(axis=(1, 2, 3)) / 255, batch.mean(axis=(1, 2, 3)) / 255], axis=1)
+    keras_model, tflite_model = mock.Mock(), mock.Mock(memory_bytes=0)
+    keras_model.predict.side_effect = classify
+    tflite_model.predict.side_effect = classify
+    report = tflite_module.compare(keras_model, tflite_model, 0)
+    assert report["images"] == 2
+    assert report["keras_accuracy"] == 1.0
+    assert report["tflite_accuracy"] == 1.0
@@ -0,0 +1,63 @@
+from script.ThumbnailCache import ThumbnailCache, make_thumbnail
+from threading import Event
+from os import listdir
+import numpy as np
+import cv2
+
+
+def write_image(path, shape=(400, 200, 3)):
+    cv2.imwrite(str(path), np.full(shape, 120, dtype=np.uint8))
+    return str(path)
+
+def test_make_thumbnail_keeps_aspect():
+    assert make_thumbnail(np.zeros((400, 200, 3), dtype=np.uint8), 128).shape == (128, 64, 3)
+    assert make_thumbnail(np.zeros((50, 60, 3), dtype=np.uint8), 128).shape == (50, 60, 3)
+
+def test_memory_and_disk_cache(tmp_path):
+    path = write_image(tmp_path / "scan.png")
+    cache = ThumbnailCache(directory=str(tmp_path / "thumbs"), workers=1)
+    assert cache.get(path) is None
+    thumbnail = cache.load(path)
+    assert thumbnail.shape == (128, 64, 3)
+    assert cache.get(path) is thumbnail
+    assert len(listdir(tmp_path / "thumbs")) == 1
+    # new cache finds thumbnail on disk without decoding the image
+    decode = lambda path: None
+    assert cache.load(path) is thumbnail
+    assert ThumbnailCache(directory=str(tmp_path / "thumbs"), workers=1).load(path, decode).shape == (128, 64, 3)
+    cache.close()
+
+def test_memory_lru(tmp_path):
+    paths = [write_image(tmp_path / f"scan{idx}.png") for idx in range(3)]
+    cache = ThumbnailCache(directory=None, max_entries=2, workers=1)
+    for path in paths:
+        cache.load(path)
+    assert cache.get(paths[0]) is None
+    assert cache.get(paths[2]) is not None
+    cache.close()
+
+def test_request_calls_back_from_worker(tmp_path):
+    path = write_image(tmp_path / "scan.png")
+    missing = str(tmp_path / "missing.png")
+    cache = ThumbnailCache(directory=None, workers=2)
+    results = {}
+    done = Event()
+    def callback(path, variant, thumbnail):
+        results[path] = thumbnail
+        if len(results) == 2:
+            done.set()
+    cache.request(path, callback)
+    cache.request(missing, callback)
+    assert done.wait(5)
+    assert results[path].shape == (128, 64, 3)
+    assert results[missing] is None
+    cache.close()
+
+def test_prune_disk(tmp_path):
+    paths = [write_image(tmp_path / f"scan{idx}.png") for idx in range(4)]
+    cache = ThumbnailCache(directory=str(tmp_path / "thumbs"), max_disk_entries=2, workers=1)
+    for path in paths:
+        cache.load(path)
+    cache.prune_disk()
+    assert len(listdir(tmp_path / "thumbs")) == 2
+    cache.close()
@@ -0,0 +1,31 @@
+from script.autotune import candidate_grid, tune, write_tuning, environment, TUNING_MARKER
+import runpy
+import os
+from unittest import mock
+
+
+def test_candidate_grid():
+    grid = candidate_grid(intra_op=[1, 4], inter_op=[1, 2])
+    assert len(grid) == 8
+    assert environment(grid[-1]) == {"TF_ENABLE_ONEDNN_OPTS": "1", "TF_NUM_INTRAOP_THREADS": "4",
+                                     "TF_NUM_INTEROP_THREADS": "2"}
+
+def test_tune_picks_fastest():
+    runner = lambda config, *args: {8: 10.0 * config["intra_op_threads"], 32: 25.0}
+    best, measured = tune("model.keras", grid=candidate_grid([1, 2, 4], [1], [False]), batch_sizes=(8, 32), runner=runner)
+    assert len(measured) == 6
+    assert (best["intra_op_threads"], best["batch_size"]) == (4, 8)
+
+def test_write_tuning_replaces_block(tmp_path):
+    settings = tmp_path / "settings.py"
+    settings.write_text("from os import environ\nenviron['TF_ENABLE_ONEDNN_OPTS'] = '0'\n")
+    config = {"intra_op_threads": 4, "inter_op_threads": 1, "onednn": True, "batch_size": 16, "images_per_second": 50.0}
+    write_tuning(config, str(settings))
+    write_tuning({**config, "batch_size": 8}, str(settings))
+    content = settings.read_text()
+    assert content.count(TUNING_MARKER) == 2
+    # block is applied last and overrides defaults above it
+    with mock.patch.dict(os.environ):
+        runpy.run_path(str(settings))
+        assert os.environ["TF_ENABLE_ONEDNN_OPTS"] == "1"
+        assert os.environ["INFERENCE_BATCH_SIZE"] == "8"
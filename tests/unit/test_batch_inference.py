@@ -0,0 +1,29 @@
+from script.batch_inference import iter_batches, predict_batches, ProgressMeter
+import numpy as np
+import pytest
+from unittest import mock
+
+
+def test_iter_batches_tail():
+    batches = list(iter_batches(list(range(5)), 2))
+    assert batches == [(0, [0, 1]), (2, [2, 3]), (4, [4])]
+
+def test_iter_batches_invalid_size():
+    with pytest.raises(ValueError):
+        list(iter_batches([1, 2], 0))
+
+def test_predict_batches():
+    model = mock.Mock()
+    model.predict.side_effect = lambda batch, **kwargs: np.zeros((len(batch), 2))
+    load_image = lambda path: np.ones((1, 224, 224, 3))
+    results = list(predict_batches(model, ["a", "b", "c"], load_image, batch_size=2))
+    assert [start for start, _ in results] == [0, 2]
+    assert [outputs.shape for _, outputs in results] == [(2, 2), (1, 2)]
+
+def test_progress_meter():
+    meter = ProgressMeter(10)
+    assert meter.eta is None
+    meter.update(5)
+    assert meter.done == 5
+    assert meter.throughput > 0
+    assert "img/s" in meter.summary()
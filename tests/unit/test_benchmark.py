@@ -0,0 +1,37 @@
+from script.benchmark import latency_summary, find_regressions, folder_throughput, peak_rss_mb
+import numpy as np
+import cv2
+
+
+class FakeModel():
+    def predict(self, batch, batch_size=None, verbose=0):
+        return np.tile([0.3, 0.7], (len(batch), 1))
+
+
+def test_latency_summary():
+    summary = latency_summary([0.01] * 19 + [0.1])
+    assert summary["p50_ms"] == 10.0
+    assert summary["p95_ms"] > summary["p50_ms"]
+    assert summary["runs"] == 20
+
+def test_find_regressions():
+    baseline = {"single_image_latency": {"p50_ms": 10.0, "runs": 50},
+                "folder_throughput": {"32": {"images_per_second": 100.0}}}
+    current = {"single_image_latency": {"p50_ms": 13.0, "runs": 10},
+               "folder_throughput": {"32": {"images_per_second": 90.0}}}
+    regressions = find_regressions(baseline, current, tolerance=0.2)
+    assert regressions == [("single_image_latency.p50_ms", 10.0, 13.0)]
+
+def test_folder_throughput(tmp_path):
+    paths = []
+    for idx in range(5):
+        path = str(tmp_path / f"{idx}.png")
+        cv2.imwrite(path, np.zeros((64, 64, 3), dtype=np.uint8))
+        paths.append(path)
+    results = folder_throughput(FakeModel(), paths, batch_sizes=(1, 4), workers=0)
+    assert set(results) == {"1", "4"}
+    assert results["4"]["images_per_second"] > 0
+
+def test_peak_rss():
+    peak = peak_rss_mb()
+    assert peak is None or peak > 0
@@ -0,0 +1,35 @@
+import classify
+import numpy as np
+import subprocess
+import sys
+import json
+from unittest import mock
+
+
+def test_import_does_not_pull_qt():
+    code = "import classify, sys; print(any(name.startswith('PyQt5') for name in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert output.stdout.strip().splitlines()[-1] == "False"
+
+def test_classify_directory_csv(mocker, tmp_path):
+    mocker.patch('classify.batch_preprocessor', return_value=lambda images, out=None: np.ones((len(images), 224, 224, 3)))
+    model = mock.Mock()
+    model.predict.side_effect = lambda batch, **kwargs: np.tile([0.1, 0.9], (len(batch), 1))
+    output_path = str(tmp_path / "results.csv")
+    detections, total, errors = classify.classify_directory(model, "archive/test", output_path, batch_size=2)
+    assert (detections, total, errors) == (3, 3, 0)
+    with open(output_path) as file:
+        lines = file.read().splitlines()
+    assert lines[0] == "File Name,Detection Result,Tumor Probability"
+    assert len(lines) == 4
+
+def test_classify_directory_jsonl_with_broken_file(mocker, tmp_path):
+    (tmp_path / "broken.png").write_bytes(b"not an image")
+    mocker.patch('classify.batch_preprocessor', return_value=lambda images, out=None: np.ones((len(images), 224, 224, 3)))
+    model = mock.Mock()
+    model.predict.side_effect = lambda batch, **kwargs: np.tile([0.9, 0.1], (len(batch), 1))
+    output_path = str(tmp_path / "results.jsonl")
+    detections, total, errors = classify.classify_directory(model, str(tmp_path), output_path)
+    assert (detections, total, errors) == (0, 1, 1)
+    with open(output_path) as file:
+        assert json.loads(file.readline())["result"] == "ERROR"
@@ -0,0 +1,50 @@
+from script.folder_watch import FolderIndex, watch_folder
+from threading import Event
+from unittest import mock
+from os import utime
+import numpy as np
+
+
+def test_scan_reports_new_and_changed_images(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"a")
+    (tmp_path / "notes.txt").write_bytes(b"text")
+    index = FolderIndex(str(tmp_path))
+    assert index.scan(require_stable=False) == ["a.png"]
+    assert index.scan(require_stable=False) == []
+    (tmp_path / "b.JPG").write_bytes(b"b")
+    (tmp_path / "a.png").write_bytes(b"changed")
+    utime(tmp_path / "a.png", ns=(0, 10 ** 9))
+    assert index.scan(require_stable=False) == ["a.png", "b.JPG"]
+
+def test_scan_waits_until_file_is_written(tmp_path):
+    index = FolderIndex(str(tmp_path))
+    (tmp_path / "a.png").write_bytes(b"part")
+    assert index.scan() == []
+    (tmp_path / "a.png").write_bytes(b"part and rest")
+    assert index.scan() == []
+    assert index.scan() == ["a.png"]
+
+def test_forget_and_recursive(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.png").write_bytes(b"a")
+    assert FolderIndex(str(tmp_path)).scan(require_stable=False) == []
+    index = FolderIndex(str(tmp_path), recursive=True)
+    names = index.scan(require_stable=False)
+    assert len(names) == 1 and names[0].endswith("a.png")
+    index.forget(names)
+    assert index.scan() == names
+
+def test_watch_folder(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"a")
+    index = FolderIndex(str(tmp_path))
+    model = mock.Mock()
+    model.predict.side_effect = lambda batch, **kwargs: np.tile([0.1, 0.9], (len(batch), 1))
+    stop_event = Event()
+    results = []
+    def on_batch(names, outputs, seconds_per_image):
+        results.extend(names)
+        stop_event.set()
+    watch_folder(model, index, lambda path: np.zeros((224, 224, 3), dtype=np.uint8), on_batch,
+                 preprocess_batch=lambda images, out: np.ones((len(images), 224, 224, 3), dtype=np.float32),
+                 interval=0.01, stop_event=stop_event, workers=0)
+    assert results == ["a.png"]
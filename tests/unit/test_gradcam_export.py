@@ -0,0 +1,32 @@
+from script.gradcam_export import export_overlays, overlay_path
+import numpy as np
+from os import listdir
+from unittest import mock
+
+
+def test_export_overlays(tmp_path):
+    grad_cam = mock.Mock()
+    grad_cam.generate_heatmaps.side_effect = lambda images, class_index: np.zeros((len(images), 7, 7))
+    grad_cam.overlay_heatmap_on_image.side_effect = lambda heatmap, image: image
+    paths = ["archive/test/Y_new.png", "archive/test/N_new.png", "archive/test/no_new.png"]
+    progress = mock.Mock()
+    stats = export_overlays(grad_cam, paths, str(tmp_path), lambda images, out: out[:len(images)],
+                            batch_size=2, progress=progress)
+    assert stats["count"] == 3
+    assert stats["images_per_second"] > 0
+    assert grad_cam.generate_heatmaps.call_count == 2
+    assert sorted(listdir(tmp_path)) == ["N_new_gradcam.png", "Y_new_gradcam.png", "no_new_gradcam.png"]
+    assert progress.call_args[0][0].done == 3
+
+def test_overlay_path():
+    assert overlay_path("out", "scans/Y1.jpg").endswith("Y1_gradcam.png")
+
+def test_export_skips_unreadable_images(tmp_path):
+    grad_cam = mock.Mock()
+    grad_cam.generate_heatmaps.side_effect = lambda images, class_index: np.zeros((len(images), 7, 7))
+    grad_cam.overlay_heatmap_on_image.side_effect = lambda heatmap, image: image
+    paths = ["archive/test/Y_new.png", "archive/test/missing.png", "archive/test/N_new.png"]
+    stats = export_overlays(grad_cam, paths, str(tmp_path / "out"), lambda images, out: out[:len(images)], batch_size=2)
+    assert stats["count"] == 2
+    assert stats["failed"] == 1
+    assert sorted(listdir(tmp_path / "out")) == ["N_new_gradcam.png", "Y_new_gradcam.png"]
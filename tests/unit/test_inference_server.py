@@ -0,0 +1,36 @@
+from script.inference_server import MicroBatcher, decode_image
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+import pytest
+
+
+def test_micro_batching():
+    release = Event()
+    def process(items):
+        # first batch is held until other requests are queued
+        release.wait(5)
+        return [item * 2 for item in items]
+    batcher = MicroBatcher(process, max_batch_size=4, max_delay=0.05)
+    futures = [batcher.submit(idx) for idx in range(6)]
+    release.set()
+    assert [future.result(5) for future in futures] == [0, 2, 4, 6, 8, 10]
+    metrics = batcher.metrics()
+    assert metrics["requests"] == 6
+    assert metrics["batches"] < 6
+    assert metrics["max_queue_depth"] >= 2
+    batcher.close()
+
+def test_batch_error_reaches_every_request():
+    batcher = MicroBatcher(lambda items: 1 / 0, max_delay=0.01)
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(lambda: batcher.submit(None).result(5)) for _ in range(4)]
+    for future in futures:
+        with pytest.raises(ZeroDivisionError):
+            future.result()
+    batcher.close()
+
+def test_decode_rejects_other_files():
+    with pytest.raises(ValueError):
+        decode_image(b"not an image")
+    with open("archive/test/Y_new.png", "rb") as file:
+        assert decode_image(file.read()).ndim == 3
@@ -0,0 +1,35 @@
+from script.prefetch import prefetch
+from threading import Lock
+from time import sleep
+import pytest
+
+
+def test_prefetch_keeps_order():
+    def load(item):
+        # later items finish first
+        sleep(0.01 * (5 - item))
+        return item * 2
+    assert list(prefetch(range(5), load, depth=5, workers=4)) == [0, 2, 4, 6, 8]
+
+def test_prefetch_is_bounded():
+    lock = Lock()
+    loaded = []
+    def load(item):
+        with lock:
+            loaded.append(item)
+        return item
+    results = prefetch(range(100), load, depth=3, workers=2)
+    next(results)
+    sleep(0.05)
+    # first result consumed, so at most depth + 1 items were ever submitted
+    assert len(loaded) <= 4
+    results.close()
+
+def test_prefetch_serial():
+    assert list(prefetch([1, 2, 3], lambda item: item + 1, workers=0)) == [2, 3, 4]
+
+def test_prefetch_reraises():
+    def load(item):
+        raise OSError("broken file")
+    with pytest.raises(OSError):
+        list(prefetch([1], load))
@@ -1,4 +1,5 @@
-from script.preprocess_input_custom import custom_preprocessing
+from script.preprocess_input_custom import custom_preprocessing, custom_preprocessing_batch, handle_batch_io_type
+from script.preprocessing import preprocess_batch, resize_image
 import numpy as np
 from PyQt5.QtWidgets import QApplication
 
@@ -7,4 +8,24 @@ app = QApplication([])
 def test_custom_preprocessing():
     dummy_image = np.ones((256, 256, 3), dtype=np.uint8)
     processed_image = custom_preprocessing(dummy_image)
-    assert processed_image.shape == (1, 224, 224, 3)
\ No newline at end of file
+    assert processed_image.shape == (1, 224, 224, 3)
+
+def test_batch_uses_custom_preprocessing_by_default():
+    # vectorized hook is opt-in, folder runs use the hook of single detection
+    assert custom_preprocessing_batch is None
+    images = [np.random.randint(0, 255, (256, 300, 3), dtype=np.uint8) for _ in range(3)]
+    buffer = np.empty((4, 224, 224, 3), dtype=np.float32)
+    batch = preprocess_batch([resize_image(image) for image in images], False, out=buffer)
+    assert np.shares_memory(batch, buffer)
+    expected = np.concatenate([custom_preprocessing(resize_image(image)) for image in images])
+    assert np.allclose(batch, expected)
+
+def test_custom_preprocessing_batch_example(mocker):
+    from keras.applications.vgg16 import preprocess_input
+    # example of the template, enabled by the user
+    mocker.patch("script.preprocess_input_custom.custom_preprocessing_batch",
+                 handle_batch_io_type(lambda images: preprocess_input(images)))
+    images = [np.random.randint(0, 255, (224, 224, 3), dtype=np.uint8) for _ in range(4)]
+    batch = preprocess_batch(images, False)
+    expected = np.concatenate([custom_preprocessing(image) for image in images])
+    assert np.allclose(batch, expected, atol=1e-4)
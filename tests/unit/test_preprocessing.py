@@ -0,0 +1,29 @@
+from script.preprocessing import preprocess_image, preprocess_batch, resize_image
+import numpy as np
+
+
+def test_preprocess_batch_matches_single_images():
+    images = [np.random.randint(0, 255, (256, 300, 3), dtype=np.uint8) for _ in range(3)]
+    for model_is_default in (True, False):
+        batch = preprocess_batch([resize_image(image) for image in images], model_is_default)
+        single = np.concatenate([preprocess_image(image, model_is_default) for image in images])
+        assert batch.shape == (3, 224, 224, 3)
+        assert np.allclose(batch, single)
+
+def test_preprocess_batch_uses_buffer():
+    buffer = np.empty((8, 224, 224, 3), dtype=np.float32)
+    images = [np.ones((224, 224, 3), dtype=np.uint8)] * 2
+    batch = preprocess_batch(images, out=buffer)
+    assert batch.shape == (2, 224, 224, 3)
+    assert np.shares_memory(batch, buffer)
+
+def test_batch_preprocessor_of_servable_model():
+    from script.preprocessing import batch_preprocessor, is_servable
+    from types import SimpleNamespace
+    servable = SimpleNamespace(inputs=[SimpleNamespace(dtype="uint8")])
+    assert is_servable(servable) and not is_servable(object())
+    images = [np.random.randint(0, 255, (300, 256, 3), dtype=np.uint8) for _ in range(2)]
+    # float32 buffer of predict_batches is not used, raw pixels are only stacked
+    batch = batch_preprocessor(servable)(images, out=np.empty((4, 224, 224, 3), dtype=np.float32))
+    assert batch.dtype == np.uint8
+    assert np.array_equal(batch[1], resize_image(images[1]))
@@ -0,0 +1,50 @@
+from script.servable import build_servable, save_servable, split_servable, InputNormalization
+from script.ModelRegistry import load_model_file
+from script.preprocessing import is_servable, resize_image
+from script.CompiledPredictor import compiled_predictor
+from keras.applications import vgg16, mobilenet, densenet
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("mode, preprocess_input", [("caffe", vgg16.preprocess_input),
+                                                    ("tf", mobilenet.preprocess_input),
+                                                    ("torch", densenet.preprocess_input)])
+def test_normalization_matches_keras_applications(mode, preprocess_input):
+    images = np.random.randint(0, 255, (2, 32, 32, 3), dtype=np.uint8)
+    normalized = np.asarray(InputNormalization(mode)(images))
+    assert np.allclose(normalized, preprocess_input(images.astype(np.float32)), atol=1e-4)
+
+def test_unknown_normalization():
+    with pytest.raises(ValueError):
+        InputNormalization("vgg")
+
+def test_servable_takes_raw_images_of_any_size(small_model):
+    model = small_model(conv=True)
+    servable = build_servable(model, "tf")
+    assert is_servable(servable) and not is_servable(model)
+    image = np.random.randint(0, 255, (300, 260, 3), dtype=np.uint8)
+    expected = model.predict(mobilenet.preprocess_input(resize_image(image)[None].astype(np.float32)), verbose=0)
+    predictor = compiled_predictor(servable)
+    assert np.allclose(predictor.predict(image[None]), expected, atol=0.05)
+    # other size is run by the same trace
+    predictor.predict(np.zeros((2, 180, 200, 3), dtype=np.uint8))
+    assert len(predictor._functions) == 1
+
+def test_saved_as_single_file(tmp_path, small_model):
+    model = small_model(conv=True)
+    path = str(tmp_path / "model.servable.keras")
+    servable = save_servable(model, path, "caffe")
+    loaded = load_model_file(path)
+    images = np.random.randint(0, 255, (2, 224, 224, 3), dtype=np.uint8)
+    assert is_servable(loaded)
+    assert np.allclose(loaded.predict(images, verbose=0), servable.predict(images, verbose=0), atol=1e-5)
+    with pytest.raises(ValueError):
+        save_servable(model, str(tmp_path / "model.h5"))
+
+def test_split_servable(small_model):
+    model = small_model(conv=True)
+    preprocessing, core = split_servable(build_servable(model, "tf"))
+    assert core is model
+    assert preprocessing(np.zeros((1, 100, 120, 3), dtype=np.uint8)).shape == (1, 224, 224, 3)
+    assert split_servable(model) == (None, model)
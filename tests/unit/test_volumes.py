@@ -0,0 +1,43 @@
+from script.volumes import Study, find_studies, predict_study, aggregate_scores
+from unittest import mock
+import numpy as np
+import cv2
+
+
+def test_npy_volume_is_memory_mapped(tmp_path):
+    volume = np.arange(5 * 32 * 32, dtype=np.int16).reshape(5, 32, 32)
+    np.save(tmp_path / "study.npy", volume)
+    study = Study(str(tmp_path / "study.npy"))
+    assert isinstance(study.volume, np.memmap)
+    assert len(study) == 5
+    image = study.slice_image(4)
+    assert image.shape == (32, 32, 3) and image.dtype == np.uint8
+    # volume-wide intensity range - last slice holds maximum
+    assert image.max() == 255
+    assert study.load_slice(0).shape == (224, 224, 3)
+
+def test_slice_folder_and_find_studies(tmp_path):
+    (tmp_path / "study").mkdir()
+    for idx in range(3):
+        cv2.imwrite(str(tmp_path / "study" / f"{idx}.png"), np.zeros((16, 16, 3), dtype=np.uint8))
+    np.save(tmp_path / "volume.npy", np.zeros((2, 16, 16), dtype=np.uint8))
+    (tmp_path / "empty").mkdir()
+    assert find_studies(str(tmp_path)) == ["study", "volume.npy"]
+    assert len(Study(str(tmp_path / "study"))) == 3
+
+def test_predict_study_in_batches(tmp_path):
+    np.save(tmp_path / "study.npy", np.zeros((5, 16, 16), dtype=np.uint8))
+    model = mock.Mock()
+    model.predict.side_effect = lambda batch, **kwargs: np.tile([0.2, 0.8], (len(batch), 1))
+    batches = list(predict_study(model, Study(str(tmp_path / "study.npy")),
+                                 preprocess_batch=lambda images, out: np.ones((len(images), 224, 224, 3), dtype=np.float32),
+                                 batch_size=2, workers=0))
+    assert [start for start, _ in batches] == [0, 2, 4]
+    assert model.predict.call_count == 3
+
+def test_aggregate_scores():
+    scores = np.array([0.1] * 18 + [0.9, 0.95])
+    score, positive = aggregate_scores(scores)
+    assert abs(score - 0.925) < 1e-6
+    assert positive == 2
+    assert np.isnan(aggregate_scores([np.nan])[0])
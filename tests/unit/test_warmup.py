@@ -0,0 +1,19 @@
+from script import warmup
+from unittest import mock
+import numpy as np
+
+
+def test_warm_up_model(mocker):
+    model = mock.Mock()
+    predictor = mock.Mock()
+    mocker.patch.object(warmup.registry, "get", return_value=model)
+    mocker.patch("script.CompiledPredictor.compiled_predictor", return_value=predictor)
+    grad_cam = mock.Mock()
+    mocker.patch("script.GradCAM.shared_grad_cam", return_value=grad_cam)
+    assert warmup.warm_up_model("model.keras") is model
+    dummy = predictor.predict.call_args[0][0]
+    assert dummy.shape == (1, 224, 224, 3)
+    assert dummy.dtype == np.float32
+    # compiled function of DETECT is traced with the same dummy
+    assert grad_cam.predict_with_heatmap.call_args[0][0] is dummy
+    assert {"model_loading", "warm_up", "grad_cam_warm_up"} <= set(warmup.STARTUP_TIMINGS)